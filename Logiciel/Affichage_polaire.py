@@ -23,7 +23,7 @@ def affiche_polaire(vitesses_vent):
     colors = cm.rainbow(norm(vitesses_vent))    
     
     for vitesse, color in zip(vitesses_vent, colors):
-        result = rc.polaire(vitesse)
+        result = rc.polaire_compilée.colonne(vitesse)
         if result is not None:
             angles = np.deg2rad(result.index)  # Conversion en radians
             angles_360 = np.concatenate([angles, 2 * np.pi - angles[::-1]])
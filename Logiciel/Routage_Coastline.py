@@ -3,6 +3,7 @@ import numpy as np
 from shapely.geometry import Polygon
 import rasterio
 from rasterio.features import rasterize
+from scipy import ndimage
 import matplotlib.pyplot as plt
 
 import Routage_Paramètres as p
@@ -70,7 +71,11 @@ resolution = 10
 
 # mask, transform = create_land_sea_mask(lat_min, lat_max, lon_min, lon_max, resolution)
 # save_mask_to_geotiff(mask, transform, "brittany_land_sea_mask.tif")
-mask, transform = load_mask_from_geotiff("brittany_land_sea_mask.tif")
+if p.environnement_partagé():
+    # Processus de calcul : le masque est rattaché depuis la mémoire partagée (Routage_mémoire_partagée)
+    mask, transform = None, None
+else:
+    mask, transform = load_mask_from_geotiff("brittany_land_sea_mask.tif")
 
 def get_point_value(point):
     (lat, lon) = point
@@ -83,6 +88,32 @@ def get_point_value(point):
     else:
         raise ValueError("Le point est en dehors des limites du masque.")
 
+def get_points_values(lats, lons):
+    """
+    Version vectorisée de get_point_value. Les points hors du masque sont considérés
+    comme non navigables (valeur 1) au lieu de lever une erreur.
+    """
+    return lire_raster(mask, transform, lats, lons, 1)
+
+def lire_raster(raster, transformation, lats, lons, hors):
+    # Valeurs d'un raster (masque, carte des distances) aux positions données, hors pour les points en dehors
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    cols, rows = ~transformation * (lons, lats)
+    rows = np.floor(rows).astype(int)
+    cols = np.floor(cols).astype(int)
+
+    dedans = (rows >= 0) & (rows < raster.shape[0]) & (cols >= 0) & (cols < raster.shape[1])
+    valeurs = np.full(lats.shape, hors, dtype=raster.dtype)
+    valeurs[dedans] = raster[rows[dedans], cols[dedans]]
+    return valeurs
+
+def carte_distance(masque, transformation):
+    # Distance (NM) de chaque pixel du masque au pixel de terre le plus proche
+    lat_moyenne = transformation.f + transformation.e * masque.shape[0] / 2
+    pixel_lat = abs(transformation.e) * 60
+    pixel_lon = abs(transformation.a) * 60 * np.cos(np.radians(lat_moyenne))
+    return ndimage.distance_transform_edt(masque == 0, sampling=(pixel_lat, pixel_lon))
 
 
 
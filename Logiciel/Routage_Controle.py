@@ -11,8 +11,23 @@ from copy import copy
 
 points = [(47.51, -3.28), (47.33, -2.9)]
 
-p.points = copy(points)
+# Protection nécessaire pour le pool de processus (expansion_parallèle) : les processus réimportent ce script
+if __name__ == '__main__':
+    p.points = copy(points)
 
-p.enable_prints()
+    p.enable_prints()
 
-chemin = rc.itere_jusqua_dans_enveloppe(points)
\ No newline at end of file
+    if p.reprendre_sauvegarde:
+        import Routage_sauvegarde as rsauv
+        chemin = rsauv.reprendre()
+    elif p.moteur_routage == 'graphe':
+        import Routage_graphe as rg
+        chemin = rg.routage_graphe(points)
+    elif p.moteur_routage == 'corridor':
+        import Routage_corridor as rcor
+        chemin = rcor.routage_corridor(points)
+    elif p.moteur_routage == 'bidirectionnel':
+        import Routage_bidirectionnel as rbi
+        chemin = rbi.routage_bidirectionnel(points)
+    else:
+        chemin = rc.itere_jusqua_dans_enveloppe(points)
\ No newline at end of file
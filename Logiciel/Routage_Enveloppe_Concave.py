@@ -1,5 +1,7 @@
 import numpy as np
 from scipy.spatial import Delaunay
+import shapely
+from shapely.geometry import Polygon
 import matplotlib.pyplot as plt
 from collections import defaultdict
 import random
@@ -22,72 +24,80 @@ def calculate_angles(p1, p2, p3):
     return np.degrees(angle_p1), np.degrees(angle_p2)
 
 
+def triangle_edges(triangles):
+    """
+    Edges of each triangle as a NumPy array (m, 3, 2): (t0, t1), (t1, t2), (t2, t0).
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    return np.stack((triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]), axis=1)
+
+def boundary_mask(triangles):
+    """
+    Boolean mask (m, 3): True for the edges of each triangle that belong to only one triangle.
+    Also returns the sorted edges (m * 3, 2) and their integer keys, in triangle order.
+    """
+    edges = np.sort(triangle_edges(triangles), axis=2).reshape(-1, 2)
+    keys = edges[:, 0] * (edges.max(initial=0) + 1) + edges[:, 1]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    return (counts[inverse] == 1).reshape(-1, 3), edges, keys
+
 def find_boundary_edges(triangles):
     """
     Identify edges that belong to only one triangle (boundary edges).
+    Returns an array (k, 2) of sorted edges, in order of first appearance in triangles.
     """
-    edge_count = defaultdict(int)
-    for tri in triangles:
-        edges = [(tri[0], tri[1]), (tri[1], tri[2]), (tri[2], tri[0])]
-        for edge in edges:
-            edge_count[tuple(sorted(edge))] += 1
-    return {edge for edge, count in edge_count.items() if count == 1}
+    if len(triangles) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    mask, edges, keys = boundary_mask(triangles)
+    # Une arête de bord n'apparaît qu'une fois : l'ordre des triangles donne directement l'ordre des arêtes
+    return edges[mask.ravel()]
 
 def filter_triangles_on_edge(points, triangles, min_angle=20, max_angle=60):
     """
     Remove triangles on the edge with boundary angles not in [min_angle, max_angle].
     """
-    boundary_edges = find_boundary_edges(triangles)
-    retained_triangles = []
-    for tri_indices in triangles:
-        edges = [(tri_indices[0], tri_indices[1]),
-                 (tri_indices[1], tri_indices[2]),
-                 (tri_indices[2], tri_indices[0])]
-
-        is_removed = False
-        for edge in edges:
-            if tuple(sorted(edge)) in boundary_edges:
-                # Calculate the angle opposite to the boundary edge
-                opposite_point = list(set(tri_indices) - set(edge))[0]
-                p1, p2, p3 = points[edge[0]], points[edge[1]], points[opposite_point]
-                angle1, angle2 = calculate_angles(p1, p2, p3)
-                # Si l'angle n'est pas dans l'intervalle [min_angle, max_angle], on retire le triangle
-                if (angle1 < min_angle and angle2 < max_angle) or (angle2 < min_angle and angle1 < max_angle):
-                
-                    is_removed = True
-                    break
-        if not is_removed:
-            retained_triangles.append(tri_indices)
-    return np.array(retained_triangles)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    if len(triangles) == 0:
+        return triangles
+    mask, _, _ = boundary_mask(triangles)
+
+    # Pour chaque arête (p1, p2) de chaque triangle, p3 est le sommet opposé
+    sommets = np.asarray(points, dtype=float)[triangles]
+    p1, p2, p3 = sommets, sommets[:, [1, 2, 0]], sommets[:, [2, 0, 1]]
+    a = np.linalg.norm(p2 - p3, axis=2)  # opposé à p1
+    b = np.linalg.norm(p1 - p3, axis=2)  # opposé à p2
+    c = np.linalg.norm(p1 - p2, axis=2)  # opposé à p3
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle1 = np.degrees(np.arccos(np.clip((b**2 + c**2 - a**2) / (2 * b * c), -1, 1)))
+        angle2 = np.degrees(np.arccos(np.clip((a**2 + c**2 - b**2) / (2 * a * c), -1, 1)))
+    # Angle nul si un côté est nul (comme calculate_angles)
+    nul = (b * c == 0) | (a * c == 0)
+    angle1[nul], angle2[nul] = 0, 0
+
+    # Si l'angle n'est pas dans l'intervalle [min_angle, max_angle] sur une arête de bord, on retire le triangle
+    hors_intervalle = (angle1 < min_angle) & (angle2 < max_angle) | (angle2 < min_angle) & (angle1 < max_angle)
+    return triangles[~(mask & hors_intervalle).any(axis=1)]
 
 def get_outer_shell(points, filtered_triangles):
     """
     Get the outer shell (boundary edges) of the remaining triangles.
     Returns the edges as a list of tuples: [((x1,y1),(x2,y2)), ...]
     """
-    edge_count = defaultdict(int)
-    for tri_indices in filtered_triangles:
-        edges = [(tri_indices[0], tri_indices[1]),
-                 (tri_indices[1], tri_indices[2]),
-                 (tri_indices[2], tri_indices[0])]
-        for edge in edges:
-            edge_count[tuple(sorted(edge))] += 1
-
-    boundary_edges = [edge for edge, count in edge_count.items() if count == 1]
-
-    # Convertir chaque edge en ((x1, y1), (x2, y2)) plutôt que (array([...]), array([...]))
     boundary_coords = []
-    for e in boundary_edges:
-        p1 = points[e[0]]
-        p2 = points[e[1]]
+    for i, j in get_outer_shell_indices(filtered_triangles):
         # Convertir l'array NumPy en tuple
-        p1_tuple = (float(p1[0]), float(p1[1]))
-        p2_tuple = (float(p2[0]), float(p2[1]))
-        boundary_coords.append(p1_tuple)
-        boundary_coords.append(p2_tuple)
+        boundary_coords.append((float(points[i][0]), float(points[i][1])))
+        boundary_coords.append((float(points[j][0]), float(points[j][1])))
 
     return boundary_coords
 
+def get_outer_shell_indices(filtered_triangles):
+    """
+    Même chose que get_outer_shell, mais les arêtes sont données par les indices de leurs sommets.
+    """
+    return [(int(i), int(j)) for i, j in find_boundary_edges(filtered_triangles)]
+
 def order_boundary_points(boundary_coords):
     """
     Trie logiquement les points de l'enveloppe extérieure pour former une boucle ordonnée.
@@ -100,32 +110,37 @@ def order_boundary_points(boundary_coords):
         edge_map[p2].append(p1)
 
     start_point = min(edge_map.keys(), key=lambda p: (p[0], p[1]))
+    return parcourir_bord(edge_map, start_point)
 
-    ordered_points = [start_point]
-    current_point = start_point
-    previous_point = None
+def parcourir_bord(edge_map, start_point):
+    """
+    Parcours de la boucle de bord à partir de start_point (sommets = coordonnées ou indices).
+    Chaque arête n'est parcourue qu'une fois (circuit eulérien) : un sommet pincé, où le bord
+    se touche lui-même (plus de deux arêtes de bord), apparaît une fois par passage.
+    """
+    restantes = {sommet: list(voisins) for sommet, voisins in edge_map.items()}
+    pile = [start_point]
+    circuit = []
 
-    while True:
-        next_points = edge_map[current_point]
-        if len(next_points) == 1:  # Si un seul voisin, éviter l'erreur
-            next_point = next_points[0]
+    while pile:
+        current_point = pile[-1]
+        if restantes[current_point]:
+            next_point = restantes[current_point].pop(0)
+            restantes[next_point].remove(current_point)
+            pile.append(next_point)
         else:
-            next_point = next_points[0] if next_points[0] != previous_point else next_points[1]
+            circuit.append(pile.pop())
 
-        if next_point == start_point:
-            break
+    ordered_points = circuit[::-1]
+    return ordered_points[:-1] if len(ordered_points) > 1 else ordered_points
 
-        ordered_points.append(next_point)
-        previous_point, current_point = current_point, next_point
-
-    return ordered_points
-
-def enveloppe_concave(points):
+def filtrer_triangulation(points):
+    # Triangulation de Delaunay puis retrait des triangles de bord trop aplatis jusqu'à stabilité
     tri = Delaunay(points)
     filtered_triangles = tri.simplices
     stable = False
     triangle = len(filtered_triangles)
-    outer_shell = []  # Initialisation pour éviter une erreur
+    retenus = []  # Initialisation pour éviter une erreur
 
     while not stable:
         filtered_triangles = filter_triangles_on_edge(points, filtered_triangles)
@@ -136,9 +151,91 @@ def enveloppe_concave(points):
             triangle = triangle_new
 
         if len(filtered_triangles) > 0:
-            outer_shell = get_outer_shell(points, filtered_triangles)
+            retenus = filtered_triangles
+
+    return retenus
+
+def enveloppe_concave(points):
+    points = np.asarray(points)
+    return [(float(points[i][0]), float(points[i][1])) for i in enveloppe_concave_indices(points)]
+
+def enveloppe_concave_indices(points):
+    """
+    Enveloppe concave donnée par les indices (dans points) de ses sommets, dans l'ordre de la boucle.
+    """
+    points = np.asarray(points)
+    bord = get_outer_shell_indices(filtrer_triangulation(points))
+    if not bord:
+        return np.array([], dtype=int)
+
+    edge_map = defaultdict(list)
+    for i, j in bord:
+        edge_map[i].append(j)
+        edge_map[j].append(i)
+
+    # Même point de départ que order_boundary_points : le sommet de plus petite latitude (puis longitude)
+    sommets = np.fromiter(edge_map.keys(), dtype=int)
+    start_point = int(sommets[np.lexsort((points[sommets, 1], points[sommets, 0]))[0]])
+    return np.array(parcourir_bord(edge_map, start_point), dtype=int)
+
+def points_dans_polygone(points, polygone):
+    """
+    Vrai pour les points à l'intérieur du polygone (liste ordonnée de sommets), pour tous les points à la fois.
+    """
+    points = np.asarray(points, dtype=float)
+    polygone = Polygon(np.asarray(polygone, dtype=float))
+    shapely.prepare(polygone)
+    return shapely.contains_xy(polygone, points[:, 0], points[:, 1])
+
+def enveloppe_concave_incrementale_indices(points, graines, contour_précédent):
+    """
+    Enveloppe concave construite à partir de l'isochrone précédente.
+
+    graines : masque des points qui forment l'isochrone précédente (toujours triangulés)
+    contour_précédent : sommets ordonnés de l'isochrone précédente
+    Les nouveaux points revenus à l'intérieur du contour précédent ne sont pas triangulés : seuls les
+    graines et les nouveaux points à l'extérieur passent dans Delaunay. Même format de sortie que
+    enveloppe_concave_indices (indices dans points, ordre de la boucle) ; la différence est que les
+    creux du bord qui reviennent derrière l'isochrone précédente ne sont plus suivis.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(contour_précédent) < 3:
+        return enveloppe_concave_indices(points)
+
+    utiles = np.flatnonzero(np.asarray(graines) | ~points_dans_polygone(points, contour_précédent))
+    if len(utiles) < 4: # Pas assez de points pour une triangulation utile
+        return enveloppe_concave_indices(points)
+    return utiles[enveloppe_concave_indices(points[utiles])]
+
+def enveloppe_secteurs(points, origine, nb_secteurs=72, classes=None):
+    points = np.asarray(points, dtype=float)
+    return [(float(lat), float(lon)) for lat, lon in points[enveloppe_secteurs_indices(points, origine, nb_secteurs, classes)]]
+
+def enveloppe_secteurs_indices(points, origine, nb_secteurs=72, classes=None):
+    """
+    Frontière par la méthode classique des isochrones : les points sont répartis en secteurs
+    de relèvement depuis l'origine et seul le plus éloigné de chaque secteur est gardé.
+    Si classes est fourni (entiers, un par point), on garde le plus éloigné par (secteur, classe).
+    Tri en O(n log n) ; renvoie les indices des points gardés, ordonnés par relèvement comme une boucle.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) == 0:
+        return np.array([], dtype=int)
+    lat0, lon0 = origine
+
+    # Distances et relèvements dans le plan tangent local (longitudes corrigées de cos(lat))
+    dx = (points[:, 1] - lon0) * np.cos(np.radians(lat0))
+    dy = points[:, 0] - lat0
+    relèvement = np.arctan2(dx, dy) % (2 * np.pi)
+    distance = np.hypot(dx, dy)
+
+    secteur = np.minimum((relèvement / (2 * np.pi) * nb_secteurs).astype(int), nb_secteurs - 1)
+    if classes is not None:
+        secteur = secteur * 2 + np.asarray(classes, dtype=int)
 
-    return order_boundary_points(outer_shell) if outer_shell else []
+    ordre = np.lexsort((-distance, secteur))
+    _, premiers = np.unique(secteur[ordre], return_index=True)
+    return ordre[premiers]
 
 def concave_random(n):
     points = [(random.randint(0, 100), random.randint(0, 100)) for _ in range(n)]
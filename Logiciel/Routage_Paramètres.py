@@ -41,7 +41,23 @@ loc_nav = [bg[1], hd[1], bg[0], hd[0]]
 points = [position_initiale, position_finale]
 
 pas_temporel = 0.25
+pas_adaptatif = False # Pas temporel agrandi loin de l'arrivée et de la terre quand le vent varie peu (pas_temporel reste le pas minimal)
+pas_temporel_max = 1
+variation_vent_max = 0.2 # Variation relative du vent tolérée sur un pas
+
+élagage_borne = False # Retire les points dont l'heure d'arrivée au mieux (distance / vitesse max) dépasse une arrivée atteinte (eta_max, niveau précédent du routage progressif)
+eta_max = None # ETA connue au dernier point (heure, même échelle que heure_début), par exemple celle d'un routage précédent
+élagage_heuristique = False # Élague aussi avec une ETA estimée (et la carte du temps restant) : plus rapide, mais peut écarter la meilleure route
+marge_élagage = 1.25 # Avec élagage_heuristique : ETA estimée d'après la progression de l'étape, multipliée par cette marge
+délai_élagage = 1 # Heures de progression avant d'estimer l'ETA
+temps_restant = False # Temps restant estimé par la carte de Routage_temps_restant (vent moyen, grille grossière) au lieu de la distance / vitesse max pour l'élagage heuristique
+résolution_temps_restant = None # Pas de la grille de la carte du temps restant (degrés) ; None : déduit du cadre de navigation
+noeuds_temps_restant = 50_000 # Nombre de nœuds visé pour la carte du temps restant quand son pas est déduit du cadre
+facteur_temps_restant = 0.7 # La carte n'est qu'une estimation : le temps restant est multiplié par ce facteur pour l'élagage
 pas_angle = 10
+éventail_adaptatif = False # Caps choisis par rapport au vent : serrés autour des angles de VMG et de vitesse max de la polaire, angles morts ignorés
+nb_angles_éventail = 9 # Nombre d'angles au vent par bord (soit 2 x nb_angles_éventail caps par point)
+pas_angle_fin = 3 # Écart (°) des angles ajoutés à côté des angles de VMG
 
 
 heure_initiale = 12
@@ -49,15 +65,58 @@ date_initiale = "0319" # MMJJ
 
 tolerance = 0.0001
 rayon_elemination = 0.01
+elagage_avant_enveloppe = True # Éclaircissement du nuage de fils (cKDTree) avant l'extraction de la frontière
+rayon_adaptatif = False # rayon_elemination ajusté à chaque itération pour ramener la frontière vers taille_cible_frontière
+taille_cible_frontière = 150
+
+taille_max_frontière = None # Budget : nombre maximal de points de la frontière par itération (None : pas de limite)
+score_frontière = 'progression' # Points gardés par le budget : 'progression' (distance à la cible), 'eta' (ETA au mieux avec le vent local), 'temps_restant' (heure + carte du temps restant) ou 'diversité' (meilleurs points par secteur de relèvement)
+
+extraction_frontière = 'concave' # 'concave' (Delaunay), 'incrémentale' (Delaunay à partir de l'isochrone précédente) ou 'secteurs' (plus éloigné par secteur de relèvement)
+nb_secteurs = 72
+origine_secteurs = 'départ' # 'départ' (point de départ de l'étape) ou 'isochrone' (centre de l'isochrone précédente)
 
 skip = 1
 skip_vect_vent = 1
 
 tolerance_arrivée = 2
+arrivée_interpolée = True # Heure d'arrivée exacte dans la dernière itération (entrée dans le cercle tolerance_arrivée, ou point de passage rejoint en ligne droite) au lieu du pas temporel
+itérations_max_étape = 5000 # Garde-fou : une étape qui n'a pas atteint son point de passage après ce nombre d'itérations s'arrête (ÉtapeImpossible)
+cache_étapes = True # Garde le résultat de chaque étape (d'un point de passage au suivant) : seules les étapes modifiées sont recalculées
+taille_cache_étapes = 64
+cache_résultats = True # Résultats des routages gardés sur disque (Routage_cache) : un routage identique (mêmes données, points et paramètres) est relu
+dossier_cache_résultats = "resultats_cache"
+taille_cache_résultats = 200 # Taille max (Mo) du dossier du cache des résultats, les résultats lus le moins récemment sont supprimés
+
+sauvegarde_routage = False # Sauvegarde régulière de l'état du routage (Routage_sauvegarde), supprimée à la fin du routage
+sauvegarde_tous_les = 10 # Itérations entre deux sauvegardes
+fichier_sauvegarde = "routage_sauvegarde.npz"
+reprendre_sauvegarde = False # Routage_Controle reprend le routage interrompu de fichier_sauvegarde
+
+délai_routage = None # Temps de calcul max (secondes) : le routage est progressif (du plus grossier au plus fin) et renvoie la meilleure route trouvée à l'échéance
+facteurs_progressifs = (4, 2, 1) # Niveaux du routage progressif : pas temporel, pas d'angle et rayon d'élimination multipliés par ces facteurs
+corridor_progressif = True # Chaque niveau du routage progressif est limité au corridor (largeur_corridor) autour de la meilleure route
 
 land_contact = True
+fichier_zones = None # GeoJSON des zones interdites (Routage_zones) : DST, zones militaires, portes des glaces, actives entre leurs propriétés 'début' et 'fin'
 courant = True
 
+expansion_parallèle = False # Répartit l'expansion sur un pool de processus conservé pendant tout le routage
+nb_processus = os.cpu_count()
+mémoire_partagée = True # Vent, masque terre/mer et courants publiés une seule fois en mémoire partagée pour le pool
+
+moteur_routage = 'isochrones' # 'isochrones', 'graphe' (A* sur une grille précalculée, gardée en cache), 'corridor' (routage grossier puis fin autour de la route grossière) ou 'bidirectionnel' (isochrones depuis le départ et à rebours depuis l'arrivée)
+résolution_graphe = 0.005 # Pas de la grille du graphe en degrés
+dossier_graphe = "graphe_cache"
+pas_temporel_grossier = 0.5 # Moteur 'corridor' : pas temporel et pas d'angle du routage grossier
+pas_angle_grossier = 15
+largeur_corridor = 3 # Demi-largeur (NM) du corridor autour de la route grossière
+itérations_bidirectionnel = 3 # Moteur 'bidirectionnel' : nombre max de fronts arrière (corrections de l'heure d'arrivée supposée)
+tolérance_bidirectionnel = 0.5 # Écart (h) accepté entre l'heure d'arrivée supposée et celle trouvée à la rencontre des fronts
+itérations_après_rencontre = 2 # Itérations des fronts après leur première rencontre, pour chercher une rencontre plus tôt
+
+critère_départ = 'eta' # Fenêtre de départ (Routage_départs) : 'eta' (arrivée la plus tôt) ou 'durée' (traversée la plus courte)
+
 enregistrement = False
 enregistrement_live = False
 
@@ -75,6 +134,7 @@ new = False
 nb_step = 0
 
 excel_wind = r'Logiciel\Données_vent\Vent.xlsx'
+fichiers_ensemble = r"Données_vent\*_VENT_*_Gascogne.grb" # Runs GRIB du routage d'ensemble (Routage_ensemble), motif glob
 
 type = 'grib'
 
@@ -105,6 +165,10 @@ def disable_prints():
 
 def enable_prints():
     sys.stdout = sys.__stdout__
+
+def environnement_partagé():
+    # Vrai dans les processus du pool de calcul : le vent, la terre et les courants y sont lus en mémoire partagée
+    return os.environ.get("ROUTAGE_ENV_PARTAGE") is not None
     
 # Extraction de l'heure et de la date du GRIB
 match = re.search(r'(\d+)Z.*?_(\d{4})_', vent)
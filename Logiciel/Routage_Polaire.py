@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+def charger_polaire(fichier, delimiter):
+    # Lecture d'un fichier .pol : angles au vent (TWA) en lignes, vitesses de vent (TWS) en colonnes
+    return pd.read_csv(fichier, delimiter=delimiter, index_col=0)
+
+class PolaireCompilée:
+    """
+    Polaire précompilée à partir du fichier .pol, lue directement sur des tableaux NumPy.
+
+    Les vitesses sont interpolées (bilinéaire) entre les nœuds du fichier .pol eux-mêmes, en float64 : les
+    valeurs aux nœuds et entre eux ne dépendent pas d'un rééchantillonnage. La grille régulière (TWS x TWA)
+    en float32 ne sert qu'aux tables d'angles remarquables et d'éventail, calculées une seule fois.
+    """
+
+    def __init__(self, polaire_df, pas_tws=1.0, pas_twa=1.0):
+        self.tws_noeuds = polaire_df.columns.astype(float).values
+        self.twa_noeuds = polaire_df.index.astype(float).values
+        valeurs = polaire_df.values.astype(float)
+        self.valeurs = valeurs.T  # Shape: (nb_tws_noeuds, nb_twa_noeuds)
+
+        self.pas_tws = pas_tws
+        self.pas_twa = pas_twa
+        self.tws = np.arange(0, self.tws_noeuds[-1] + pas_tws / 2, pas_tws)
+        self.twa = np.arange(0, 180 + pas_twa / 2, pas_twa)
+
+        # Rééchantillonnage séparable : d'abord selon le TWA pour chaque colonne du fichier, puis selon le TWS
+        par_twa = np.array([np.interp(self.twa, self.twa_noeuds, valeurs[:, k]) for k in range(len(self.tws_noeuds))])
+        self.grille = np.array([np.interp(self.tws, self.tws_noeuds, par_twa[:, j]) for j in range(len(self.twa))],
+                               dtype=np.float32).T  # Shape: (nb_tws, nb_twa)
+
+        self.vitesse_max = float(self.grille.max())
+
+        # Angles remarquables par TWS (une ligne de la grille) : meilleure VMG au près et au portant, vitesse max
+        vmg = self.grille * np.cos(np.radians(self.twa))[None, :]
+        près = self.twa <= 90
+        self.angle_près = self.twa[près][np.argmax(vmg[:, près], axis=1)]
+        self.angle_portant = self.twa[~près][np.argmin(vmg[:, ~près], axis=1)]
+        self.angle_vitesse_max = self.twa[np.argmax(self.grille, axis=1)]
+        self._éventails = {}
+
+    def vitesse(self, vitesses_vent, angles):
+        """
+        Vitesse du bateau (knt) pour des vitesses de vent (knt) et des angles au vent (°).
+        Les angles sont ramenés dans [0, 180] ; les entrées peuvent être des scalaires ou des tableaux.
+        """
+        angles = np.abs((np.asarray(angles, dtype=float) + 180) % 360 - 180)
+        i, t = self._encadrement(self.tws_noeuds, np.asarray(vitesses_vent, dtype=float))
+        j, u = self._encadrement(self.twa_noeuds, angles)
+
+        g = self.valeurs
+        return ((1 - t) * (1 - u) * g[i, j] + t * (1 - u) * g[i + 1, j]
+                + (1 - t) * u * g[i, j + 1] + t * u * g[i + 1, j + 1])
+
+    @staticmethod
+    def _encadrement(noeuds, valeurs):
+        # Nœud inférieur et poids du nœud supérieur de chaque valeur, bornées aux nœuds extrêmes (comme np.interp)
+        valeurs = np.clip(valeurs, noeuds[0], noeuds[-1])
+        i = np.clip(np.searchsorted(noeuds, valeurs, side='right') - 1, 0, len(noeuds) - 2)
+        return i, (valeurs - noeuds[i]) / (noeuds[i + 1] - noeuds[i])
+
+    def colonne(self, vitesse_vent):
+        # Équivalent de l'ancienne fonction polaire() : vitesses du bateau aux angles du fichier .pol
+        return pd.Series(self.vitesse(vitesse_vent, self.twa_noeuds), index=self.twa_noeuds)
+
+    def éventail(self, nb_angles, pas_fin=3.0):
+        """
+        Table (nb_tws, nb_angles) des angles au vent à essayer pour chaque TWS de la grille, sur un bord.
+        Les angles sont serrés autour des angles de VMG (près et portant) et de vitesse max ; la moitié des angles
+        restants va aux nœuds de TWA du fichier .pol où la courbe de vitesse de ce TWS plie le plus (la vitesse
+        optimale peut y être), les autres sont répartis régulièrement. Les angles plus près du vent que la VMG
+        au près ou plus abattus que la VMG au portant ne sont jamais utiles (on tire des bords) et ne sont pas générés.
+        """
+        clé = (nb_angles, pas_fin)
+        if clé not in self._éventails:
+            table = np.empty((len(self.tws), nb_angles))
+            for i, (près, portant, v_max) in enumerate(zip(self.angle_près, self.angle_portant, self.angle_vitesse_max)):
+                repères = np.clip([près, près + pas_fin, v_max, portant - pas_fin, portant], près, portant)
+                angles = np.unique(repères)
+                angles = np.union1d(angles, self._noeuds_coudés(self.tws[i], angles, près, portant,
+                                                               (nb_angles - len(angles) + 1) // 2, pas_fin))
+                nb_réguliers = nb_angles - len(angles)
+                while True:
+                    réguliers = np.linspace(près, portant, nb_réguliers + 2)[1:-1]
+                    tous = np.unique(np.concatenate((angles, réguliers)))
+                    if len(tous) >= nb_angles or nb_réguliers > 4 * nb_angles:
+                        break
+                    nb_réguliers += 1 # Des angles réguliers tombent sur les repères
+                tous = tous[:nb_angles] if len(tous) >= nb_angles else np.pad(tous, (0, nb_angles - len(tous)), mode='edge')
+                table[i] = np.sort(tous)
+            self._éventails[clé] = table
+        return self._éventails[clé]
+
+    def _noeuds_coudés(self, vitesse_vent, angles, près, portant, nombre, écart_min):
+        # Nœuds de TWA entre près et portant, à plus de écart_min des angles déjà pris, où la pente de la
+        # vitesse change le plus pour ce TWS (les nombre premiers)
+        if nombre <= 0:
+            return np.empty(0)
+        noeuds = self.twa_noeuds
+        pentes = np.diff(self.vitesse(vitesse_vent, noeuds)) / np.diff(noeuds)
+        coudes = np.abs(np.diff(pentes))  # Changement de pente aux nœuds intérieurs noeuds[1:-1]
+        intérieurs = noeuds[1:-1]
+        candidats = (intérieurs > près) & (intérieurs < portant)
+        candidats &= np.abs(intérieurs[:, None] - np.asarray(angles)[None, :]).min(axis=1) >= écart_min
+        ordre = np.argsort(-coudes[candidats], kind='stable')
+        return intérieurs[candidats][ordre[:nombre]]
+
+    def angles_éventail(self, vitesses_vent, nb_angles, pas_fin=3.0):
+        # Angles au vent à essayer (n, nb_angles) pour des vitesses de vent (knt), ligne de TWS la plus proche
+        i = np.clip(np.rint(np.asarray(vitesses_vent, dtype=float) / self.pas_tws).astype(int), 0, len(self.tws) - 1)
+        return self.éventail(nb_angles, pas_fin)[i]
@@ -4,6 +4,8 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import pandas as pd
 import os
+import re
+from datetime import datetime, timedelta
 import Routage_Paramètres as p
 from cartopy import crs as ccrs, feature as cfeature
 import xarray as xr
@@ -246,7 +248,9 @@ def plot_wind_tk(ax, canvas, loc, step_indices=[1], chemin_x=None, chemin_y=None
     # Mettre à jour l'affichage en live dans Tkinter
     canvas.draw()
 
-def plot_grib(heure, position=None, route=None, context=None, skip = p.skip, skip_vect_vent = p.skip_vect_vent, loc_nav = p.loc_nav):
+def plot_grib(heure, position=None, route=None, context=None, skip = p.skip, skip_vect_vent = p.skip_vect_vent, loc_nav = p.loc_nav,
+              vent=None):
+    # vent : vent affiché, dans le format de charger_vent (celui du contexte d'un routage), celui du module par défaut
     if not isinstance(heure, list):
         heure = [heure]
 
@@ -286,10 +290,16 @@ def plot_grib(heure, position=None, route=None, context=None, skip = p.skip, ski
 
             if p.type == "grib":
                 try:
-                    u10_specific = ds['u10'].isel(step=int(h)).values
-                    v10_specific = ds['v10'].isel(step=int(h)).values
-                    latitudes = ds['latitude'].values
-                    longitudes = ds['longitude'].values
+                    if vent is not None:
+                        u10_specific = np.asarray(vent['u10_values'][int(h)])
+                        v10_specific = np.asarray(vent['v10_values'][int(h)])
+                        latitudes = np.asarray(vent['latitudes'])
+                        longitudes = np.asarray(vent['longitudes'])
+                    else:
+                        u10_specific = ds['u10'].isel(step=int(h)).values
+                        v10_specific = ds['v10'].isel(step=int(h)).values
+                        latitudes = ds['latitude'].values
+                        longitudes = ds['longitude'].values
                     
                     print(u10_specific.size, v10_specific.size, latitudes.size, longitudes.size)
                     
@@ -413,8 +423,53 @@ def get_wind_at_position(lat, lon, time_step=0):
         
     except Exception as e:
         return get_wind_at_position(lat, lon, -1)
-    
-def enregistrement_route(chemin_lon, chemin_lat, pas_temporel, output_dir='./'):
+
+def get_wind_at_positions(lats, lons, time_step=0):
+    """
+    Version vectorisée de get_wind_at_position : renvoie la vitesse (knt) et la direction (°) du vent
+    pour des tableaux de latitudes et longitudes, au point de grille le plus proche.
+    """
+    return vent_aux_positions(vent_actuel(), lats, lons, time_step)
+
+def indice_grille(axe, valeurs):
+    # Indice du point le plus proche sur un axe régulier (croissant ou décroissant), borné aux extrémités de l'axe
+    axe = np.asarray(axe, dtype=float)
+    if len(axe) < 2:
+        return np.zeros(len(valeurs), dtype=int)
+    pas = (axe[-1] - axe[0]) / (len(axe) - 1)
+    return np.clip(np.rint((valeurs - axe[0]) / pas).astype(int), 0, len(axe) - 1)
+
+def vent_aux_positions(vent, lats, lons, time_step=0):
+    """
+    get_wind_at_positions pour un vent donné (format de charger_vent) au lieu du vent chargé dans le module.
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float) % 360
+
+    u10, v10 = vent['u10_values'], vent['v10_values']
+    # Même comportement que get_wind_at_position : hors de l'horizon du GRIB on prend la dernière échéance
+    if not -len(u10) <= time_step < len(u10):
+        time_step = -1
+    u_time_step = u10[time_step]
+    v_time_step = v10[time_step]
+
+    latitudes = vent['latitudes']
+    longitudes = vent['longitudes']
+
+    # Les grilles sont régulières en 1D : l'indice du point le plus proche se calcule axe par axe
+    i_lat = indice_grille(latitudes, lats.ravel())
+    i_lon = indice_grille(longitudes, lons.ravel())
+
+    u = u_time_step[i_lat, i_lon].reshape(lats.shape)
+    v = v_time_step[i_lat, i_lon].reshape(lats.shape)
+
+    v_vent = 1.852 * np.sqrt(u**2 + v**2)
+    a_vent = (np.degrees(np.arctan2(-u, -v))) % 360
+
+    return v_vent, a_vent
+
+def enregistrement_route(chemin_lon, chemin_lat, pas_temporel, output_dir='./', heures=None):
+    # heures : heure de passage à chaque point de la route (pas temporel variable), sinon un point tous les pas_temporel
     # Créer le répertoire de sortie s'il n'existe pas
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -423,6 +478,9 @@ def enregistrement_route(chemin_lon, chemin_lat, pas_temporel, output_dir='./'):
     heure = 0
 
     for _ in range(0, len(chemin_lon)):
+        if heures is not None:
+            heure = heures[point]
+
         # Définir la position actuelle
         position_actuelle = (chemin_lat[point], chemin_lon[point])
 
@@ -497,27 +555,73 @@ def point_ini_fin(loc):
         print("Sélection incomplète. Veuillez sélectionner au moins deux points (départ et arrivée).")
         return None
 
-#Chemin d'accès du fichier GRIB vent
-file_path = p.vent
-
-if p.type == 'grib':
-    ds = xr.open_dataset(file_path, engine='cfgrib')
-    p.nb_step = ds.sizes["step"]
-    if p.new:
-        u10_values = [ds.u10.isel(step=int(step)).values for step in range(ds.dims['step'])]
-        v10_values = [ds.v10.isel(step=int(step)).values for step in range(ds.dims['step'])]
-
-        # Sauvegarder les variables sous forme de fichiers Pickle
-        with open("u10_values.pkl", "wb") as f:
-            pickle.dump(u10_values, f)
-        with open("v10_values.pkl", "wb") as f:
-            pickle.dump(v10_values, f)
-        
-    else:        
+def charger_vent(fichier, cache_pickle=False):
+    """
+    Charge le vent d'un fichier GRIB : {'ds', 'u10_values', 'v10_values', 'latitudes', 'longitudes', 'nb_step'}.
+    cache_pickle : relit (ou écrit si p.new) les composantes dans u10_values.pkl / v10_values.pkl, comme pour p.vent
+    """
+    ds = xr.open_dataset(fichier, engine='cfgrib')
+    nb_step = ds.sizes["step"]
+    if cache_pickle and not p.new:
         with open("u10_values.pkl", "rb") as f:
             u10_values = pickle.load(f)
         with open("v10_values.pkl", "rb") as f:
             v10_values = pickle.load(f)
+    else:
+        u10_values = [ds.u10.isel(step=int(step)).values for step in range(nb_step)]
+        v10_values = [ds.v10.isel(step=int(step)).values for step in range(nb_step)]
+
+        if cache_pickle:
+            # Sauvegarder les variables sous forme de fichiers Pickle
+            with open("u10_values.pkl", "wb") as f:
+                pickle.dump(u10_values, f)
+            with open("v10_values.pkl", "wb") as f:
+                pickle.dump(v10_values, f)
+
+    return {'ds': ds, 'u10_values': u10_values, 'v10_values': v10_values,
+            'latitudes': ds.latitude.values, 'longitudes': ds.longitude.values, 'nb_step': nb_step}
+
+def installer_vent(vent):
+    # Le vent chargé par charger_vent devient celui de get_wind_at_positions (None : aucun vent chargé)
+    global ds, u10_values, v10_values, latitudes_grille, longitudes_grille
+    if vent is None:
+        ds = u10_values = v10_values = latitudes_grille = longitudes_grille = None
+        return
+    ds, u10_values, v10_values = vent['ds'], vent['u10_values'], vent['v10_values']
+    latitudes_grille, longitudes_grille = vent['latitudes'], vent['longitudes']
+
+def vent_actuel():
+    # Vent actuellement utilisé, dans le format de charger_vent (pour le remettre après un autre GRIB)
+    if p.type == 'excel':
+        # Le vent Excel n'a qu'une échéance
+        return {'ds': None, 'u10_values': u_xl[:1], 'v10_values': v_xl[:1],
+                'latitudes': latitudes_grille, 'longitudes': longitudes_grille, 'nb_step': 1}
+    if p.type != 'grib':
+        raise ValueError("La source spécifiée doit être 'grib' ou 'excel'.")
+    return {'ds': ds, 'u10_values': u10_values, 'v10_values': v10_values,
+            'latitudes': latitudes_grille, 'longitudes': longitudes_grille, 'nb_step': p.nb_step}
+
+def date_grib(fichier):
+    # Date et heure du run d'après le nom du fichier (METEOCONSULT12Z_VENT_0326_...), None si le nom ne la donne pas
+    match = re.search(r'(\d+)Z.*?_(\d{4})_', os.path.basename(fichier))
+    if match is None:
+        return None
+    return datetime.strptime(match.group(2), "%m%d") + timedelta(hours=int(match.group(1)))
+
+#Chemin d'accès du fichier GRIB vent
+file_path = p.vent
+
+if p.environnement_partagé():
+    # Processus de calcul : le vent est rattaché depuis la mémoire partagée (Routage_mémoire_partagée)
+    ds = None
+    u10_values = v10_values = None
+    u_xl = v_xl = lat_xl = lon_xl = None
+    latitudes_grille = longitudes_grille = None
+
+elif p.type == 'grib':
+    vent_initial = charger_vent(file_path, cache_pickle=True)
+    p.nb_step = vent_initial['nb_step']
+    installer_vent(vent_initial)
             
 else:
     u_xl, v_xl, lat_xl, lon_xl = excel_to_uv_components(p.excel_wind)
@@ -526,6 +630,9 @@ else:
     print("Dimensions de u :", u_xl.shape)
     print("Dimensions de v :", v_xl.shape)
 
+    latitudes_grille = lat_xl
+    longitudes_grille = lon_xl
+
 if __name__ == '__main__':
 
     bg = (47.25980827350693, -3.3287929957100237)
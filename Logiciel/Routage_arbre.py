@@ -0,0 +1,107 @@
+import numpy as np
+
+class ArbreIsochrones:
+    """
+    Arbre des isochrones stocké en colonnes NumPy préallouées (une ligne par nœud).
+
+    Chaque nœud garde l'indice entier de son parent (-1 pour une racine), l'itération et l'heure
+    à laquelle il a été atteint et les données de la branche qui y mène : cap suivi, vent réel (vitesse,
+    direction), angle au vent et vitesse du bateau. Seuls les points retenus dans la frontière
+    (et le point d'arrivée) sont ajoutés ; les colonnes doublent de taille quand elles sont pleines.
+    """
+
+    COLONNES = {
+        'lat': np.float64,
+        'lon': np.float64,
+        'parent': np.int32,
+        'iteration': np.int32,
+        'heure': np.float64,
+        'cap': np.float32,
+        'v_vent': np.float32,
+        'd_vent': np.float32,
+        'twa': np.float32,
+        'v_bateau': np.float32,
+    }
+
+    def __init__(self, capacité=1024):
+        self.taille = 0
+        self.données = {nom: np.empty(capacité, dtype=dtype) for nom, dtype in self.COLONNES.items()}
+
+    @classmethod
+    def depuis_colonnes(cls, colonnes):
+        # Arbre reconstruit à partir de colonnes remplies (par exemple relues dans une sauvegarde)
+        taille = len(colonnes['lat'])
+        arbre = cls(capacité=max(2 * taille, 1024))
+        for nom, dtype in cls.COLONNES.items():
+            arbre.données[nom][:taille] = np.asarray(colonnes[nom], dtype=dtype)
+        arbre.taille = taille
+        return arbre
+
+    def __len__(self):
+        return self.taille
+
+    def __getattr__(self, nom):
+        # Accès en lecture aux colonnes remplies : arbre.lat, arbre.parent, ...
+        données = self.__dict__.get('données')
+        if données is not None and nom in données:
+            return données[nom][:self.taille]
+        raise AttributeError(nom)
+
+    def _agrandir(self, nécessaire):
+        capacité = len(self.données['lat'])
+        if nécessaire <= capacité:
+            return
+        while capacité < nécessaire:
+            capacité *= 2
+        for nom, colonne in self.données.items():
+            nouvelle = np.empty(capacité, dtype=colonne.dtype)
+            nouvelle[:self.taille] = colonne[:self.taille]
+            self.données[nom] = nouvelle
+
+    def ajouter(self, lat, lon, parent, iteration, **colonnes):
+        """
+        Ajoute des nœuds (tableaux ou scalaires) et renvoie leurs indices.
+        Les colonnes non fournies (heure, cap, vent, ...) sont mises à NaN.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        n = len(lat)
+        début, fin = self.taille, self.taille + n
+        self._agrandir(fin)
+
+        self.données['lat'][début:fin] = lat
+        self.données['lon'][début:fin] = lon
+        self.données['parent'][début:fin] = parent
+        self.données['iteration'][début:fin] = iteration
+        for nom in ('heure', 'cap', 'v_vent', 'd_vent', 'twa', 'v_bateau'):
+            self.données[nom][début:fin] = colonnes.get(nom, np.nan)
+
+        self.taille = fin
+        return np.arange(début, fin)
+
+    def ajouter_racine(self, point, iteration=0, heure=np.nan):
+        return int(self.ajouter(point[0], point[1], -1, iteration, heure=heure)[0])
+
+    def point(self, indice):
+        return (float(self.données['lat'][indice]), float(self.données['lon'][indice]))
+
+    def points(self, indices):
+        # Liste de tuples (lat, lon), format utilisé par l'affichage et l'enveloppe concave
+        return list(zip(self.données['lat'][indices].tolist(), self.données['lon'][indices].tolist()))
+
+    def chemin(self, indice):
+        """
+        Indices des nœuds de la racine jusqu'au nœud indice (remontée des indices de parents).
+        La remontée reste une boucle : le chemin n'a qu'un nœud par itération (quelques centaines au plus),
+        alors qu'une remontée en NumPy (sauts de pointeurs) parcourrait toute la colonne des parents à chaque appel.
+        """
+        parents = self.données['parent']
+        chemin = []
+        indice = int(indice)
+        while indice >= 0:
+            chemin.append(indice)
+            indice = parents.item(indice)
+        return np.array(chemin[::-1], dtype=np.int64)
+
+    def colonnes(self, indices):
+        """Toutes les colonnes pour les nœuds demandés, en une seule indexation par colonne."""
+        return {nom: colonne[indices] for nom, colonne in self.données.items()}
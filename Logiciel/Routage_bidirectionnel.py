@@ -0,0 +1,197 @@
+"""
+Routage bidirectionnel : isochrones depuis le départ et, à rebours du temps, depuis l'arrivée pour une heure
+d'arrivée supposée. Les deux fronts avancent à tour de rôle (celui qui a couvert le moins de temps avance)
+avec l'expansion et l'extraction de frontière de Routage_calcul, jusqu'à ce qu'ils se rencontrent. Chaque front
+ne couvre qu'environ la moitié de la durée du parcours, ce qui réduit la surface balayée sur les longues traversées.
+
+À la rencontre, l'écart entre l'heure du front avant et celle du front arrière est l'erreur sur l'heure d'arrivée
+supposée : elle est corrigée et le front arrière est recalculé (le front avant ne dépend pas de cette heure et
+continue), jusqu'à ce que l'écart soit inférieur à p.tolérance_bidirectionnel. L'heure supposée du premier front
+arrière vient de la carte du temps restant (Routage_temps_restant), en général à moins d'une heure près.
+"""
+
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+import Routage_calcul as rc
+import Routage_contexte as rctx
+import Routage_parallèle as rpar
+
+NM_PAR_DEGRÉ = 60
+
+class Front:
+    """
+    Isochrones d'un des deux fronts dans son arbre, depuis le nœud racine :
+    vers l'avant (arrière=False) de la racine vers point_visé, ou à rebours du temps depuis la racine
+    (les nœuds sont alors les positions d'où le bateau atteint leur parent).
+    """
+
+    def __init__(self, arbre, racine, point_visé, arrière, contexte):
+        self.arbre = arbre
+        self.racine = racine
+        self.origine = arbre.point(racine)
+        self.point_visé = point_visé
+        self.arrière = arrière
+        self.contexte = contexte
+        self.frontière = np.array([racine])
+        self.heure = self.heure_départ = float(arbre.heure[racine])
+        self.iteration = int(arbre.iteration[racine])
+        self.rayon = contexte.rayon_elemination
+        self._kd = (None, None) # (taille de l'arbre, cKDTree des nœuds du front)
+
+    def écoulé(self):
+        # Durée couverte par le front depuis sa racine
+        return abs(self.heure - self.heure_départ)
+
+    def avancer(self, pool=None):
+        """Une itération d'isochrone ; renvoie le pas, les parents, les candidats et les fils (comme router_étape)."""
+        contexte = self.contexte
+        arbre, parents = self.arbre, self.frontière
+        self.iteration += 1
+        pas = rc.pas_adaptatif(arbre.lat[parents], arbre.lon[parents], self.point_visé, self.heure, contexte)
+        eta = np.inf
+        if contexte.élagage_borne and not self.arrière:
+            eta = rc.eta_référence(arbre.lat[parents], arbre.lon[parents], self.origine, self.point_visé, 0.0,
+                                   self.heure_départ, self.heure, contexte)
+        self.frontière, candidats, enfants = rc.étape_isochrone(arbre, parents, self.origine, self.point_visé, self.heure, pas,
+                                                                self.iteration, pool, eta, 0.0, contexte, self.rayon,
+                                                                arrière=self.arrière)
+        self.heure += -pas if self.arrière else pas
+        if contexte.rayon_adaptatif:
+            self.rayon = rc.rayon_adapté(self.rayon, len(self.frontière), contexte)
+        return pas, parents, candidats, enfants
+
+    def noeuds(self):
+        # Nœuds du front : ceux ajoutés à l'arbre depuis la racine (les étapes précédentes sont avant elle)
+        return np.arange(self.racine, len(self.arbre))
+
+    def kd(self, cos_lat):
+        # cKDTree des nœuds du front en coordonnées planes locales, refait seulement si le front a avancé
+        taille, arbre_kd = self._kd
+        if taille != len(self.arbre):
+            noeuds = self.noeuds()
+            arbre_kd = cKDTree(np.column_stack((self.arbre.lat[noeuds], self.arbre.lon[noeuds] * cos_lat)))
+            self._kd = (len(self.arbre), arbre_kd)
+        return arbre_kd
+
+    def rencontre(self, autre, seuil, cos_lat):
+        """
+        Couples (point de la frontière, nœud de l'autre front) à moins de seuil NM l'un de l'autre, rangés
+        en (nœuds du front avant, nœuds du front arrière). Renvoie ce couple, sa jonction (voir jonction) et le
+        décalage de l'heure d'arrivée pour le couple à l'heure d'arrivée la plus tôt, ou None.
+        """
+        if len(self.frontière) == 0:
+            return None
+        noeuds_autre = autre.noeuds()
+        k = min(8, len(noeuds_autre))
+        lats, lons = self.arbre.lat[self.frontière], self.arbre.lon[self.frontière]
+        _, proches = autre.kd(cos_lat).query(np.column_stack((lats, lons * cos_lat)), k=k,
+                                            distance_upper_bound=seuil / NM_PAR_DEGRÉ)
+        proches = proches.reshape(len(lats), k)
+        i, j = np.nonzero(proches < len(noeuds_autre))
+        if len(i) == 0:
+            return None
+        couple = (self.frontière[i], noeuds_autre[proches[i, j]])
+        avant, arrière = (autre, self) if self.arrière else (self, autre)
+        noeuds_avant, noeuds_arrière = couple[::-1] if self.arrière else couple
+        liaison = jonction(avant.arbre, noeuds_avant, arrière.arbre, noeuds_arrière, self.contexte)
+        # L'écart d'heures entre les deux fronts, jonction comprise, décale l'heure d'arrivée supposée
+        décalages = avant.arbre.heure[noeuds_avant] + liaison['durée'] - arrière.arbre.heure[noeuds_arrière]
+        if not np.isfinite(décalages).any():
+            return None
+        meilleur = int(np.argmin(décalages))
+        return (int(noeuds_avant[meilleur]), int(noeuds_arrière[meilleur]),
+                {nom: float(valeurs[meilleur]) for nom, valeurs in liaison.items()}, float(décalages[meilleur]))
+
+def jonction(arbre_avant, noeuds_avant, arbre_arrière, noeuds_arrière, contexte):
+    # Branche directe de chaque nœud avant au nœud arrière correspondant, partie à l'heure du nœud avant
+    return rc.branches_directes(arbre_avant.lat[noeuds_avant], arbre_avant.lon[noeuds_avant], arbre_arrière.lat[noeuds_arrière],
+                                arbre_arrière.lon[noeuds_arrière], arbre_avant.heure[noeuds_avant], contexte)
+
+def heure_arrivée_estimée(point1, point2, heure, contexte):
+    # Heure d'arrivée supposée du premier front arrière, d'après la carte du temps restant (Routage_temps_restant)
+    return heure + float(rc.temps_restant_estimé(np.array([point1[0]]), np.array([point1[1]]), point2, contexte)[0])
+
+def raccorder(arbre, noeud_avant, arbre_arrière, noeud_arrière, liaison, décalage):
+    """
+    Ajoute à la suite de noeud_avant la jonction (liaison) jusqu'à noeud_arrière puis la route du front arrière
+    jusqu'à l'arrivée, heures décalées de décalage. Chaque nœud arrière garde le cap et le vent de la branche
+    qui mène à son parent : dans l'arbre avant, ils vont au nœud suivant. Renvoie le nœud d'arrivée.
+    """
+    chemin = arbre_arrière.chemin(noeud_arrière)[::-1] # Du point de rencontre à l'arrivée
+    colonnes = arbre_arrière.colonnes(chemin)
+    n = len(chemin)
+    branches = {nom: np.concatenate(([liaison[nom]], colonnes[nom][:-1])) for nom in ('cap', 'v_vent', 'd_vent', 'twa', 'v_bateau')}
+    parents = np.concatenate(([noeud_avant], len(arbre) + np.arange(n - 1)))
+    indices = arbre.ajouter(colonnes['lat'], colonnes['lon'], parents, arbre.iteration[noeud_avant] + 1 + np.arange(n),
+                            heure=colonnes['heure'] + décalage, **branches)
+    return int(indices[-1])
+
+def router_étape_bidirectionnelle(arbre, départ, point2, pool=None, contexte=None, dernière=True):
+    """
+    Étape de départ (nœud de l'arbre, à son heure) à point2 par les deux fronts (dernière : dernière étape du parcours).
+    Le front avant est construit dans arbre, le front arrière dans un arbre à part, et la route du front arrière
+    est raccordée dans arbre au point de rencontre. Renvoie le nœud d'arrivée, comme Routage_calcul.router_étape.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    point1 = arbre.point(départ)
+    cos_lat = math.cos(math.radians((point1[0] + point2[0]) / 2))
+    avant = Front(arbre, départ, point2, False, contexte)
+    arrivée = heure_arrivée_estimée(point1, point2, avant.heure_départ, contexte)
+
+    for essai in range(contexte.itérations_bidirectionnel):
+        arbre_arrière = rc.ra.ArbreIsochrones()
+        arrière = Front(arbre_arrière, arbre_arrière.ajouter_racine(point2, heure=arrivée), point1, True, contexte)
+        # Après la première rencontre, les fronts avancent encore quelques itérations : en se croisant,
+        # ils peuvent trouver une rencontre plus tôt
+        rencontre, après = None, 0
+        while rencontre is None or après < contexte.itérations_après_rencontre:
+            # Le front qui a couvert le moins de temps avance
+            front, autre = (avant, arrière) if avant.écoulé() <= arrière.écoulé() or len(arrière.frontière) == 0 else (arrière, avant)
+            pas, parents, candidats, enfants = front.avancer(pool)
+            rc.vérifier_itérations(front.iteration, int(front.arbre.iteration[front.racine]), front.point_visé, contexte)
+            if front is avant and rc.arrivée_atteinte(arbre, parents, avant.frontière, enfants, point2, contexte.tolerance_arrivée):
+                # Le front avant atteint l'arrivée sans avoir rencontré le front arrière
+                return rc.noeud_arrivée(arbre, parents, candidats, enfants, point2, avant.iteration, avant.heure - pas, pas,
+                                        dernière, contexte)
+            # Seuil de rencontre : la distance d'un pas à la vitesse max, les fronts ne peuvent pas se croiser entre deux itérations
+            nouvelle = front.rencontre(autre, rc.vitesse_borne(contexte) * pas, cos_lat)
+            if rencontre is not None:
+                après += 1
+            if nouvelle is not None and (rencontre is None or nouvelle[3] < rencontre[3]):
+                rencontre = nouvelle
+
+        noeud_avant, noeud_arrière, liaison, décalage = rencontre
+        if contexte.print_données:
+            print(f"Rencontre des fronts (essai {essai + 1}) : arrivée supposée {round(arrivée, 2)}, "
+                  f"écart {round(décalage, 2)} h, jonction {round(liaison['durée'], 2)} h")
+        if abs(décalage) <= contexte.tolérance_bidirectionnel:
+            break
+        arrivée += décalage
+
+    return raccorder(arbre, noeud_avant, arbre_arrière, noeud_arrière, liaison, décalage)
+
+def routage_bidirectionnel(points, contexte=None):
+    """
+    Routage bidirectionnel entre les points de passage, une étape après l'autre dans le même arbre.
+    Renvoie {'lat', 'lon', 'heure'} de la route.
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    """
+    contexte = contexte or rctx.contexte_modules()
+    points = [tuple(point) for point in points]
+    arbre = rc.ra.ArbreIsochrones()
+    noeud = arbre.ajouter_racine(points[0], heure=contexte.heure_début)
+
+    pool = rpar.PoolExpansion(contexte.nb_processus, contexte=contexte) if contexte.expansion_parallèle else None
+    try:
+        for k in range(1, len(points)):
+            noeud = router_étape_bidirectionnelle(arbre, noeud, points[k], pool, contexte, dernière=k == len(points) - 1)
+    finally:
+        if pool is not None:
+            pool.fermer()
+
+    chemin = arbre.chemin(noeud)
+    if contexte.print_données:
+        print(f"Route bidirectionnelle : {round(float(arbre.heure[chemin[-1]] - arbre.heure[chemin[0]]), 2)} h")
+    return {'lat': arbre.lat[chemin].tolist(), 'lon': arbre.lon[chemin].tolist(), 'heure': arbre.heure[chemin].tolist()}
@@ -0,0 +1,110 @@
+"""
+Cache sur disque des résultats de routage, adressé par leur contenu.
+
+La clé d'un routage est l'empreinte (sha256) de tout ce dont dépend son résultat : points de passage, vent (GRIB),
+polaire, masque terre/mer, atlas des courants et paramètres du routage. Le résultat (arbre des isochrones avec
+le vent, le cap et la vitesse de chaque nœud, et nœud d'arrivée) est écrit au format .npz compressé, un fichier
+par clé : relancer le même routage (Routage_Controle, nouvelle exécution de l'interface Streamlit, ...) relit
+le fichier au lieu de tout recalculer. Au-delà de taille_max Mo, les résultats lus le moins récemment sont supprimés.
+"""
+
+import os
+import hashlib
+import numpy as np
+
+import Routage_Paramètres as p
+import Routage_arbre as ra
+
+# Paramètres sans effet sur la route calculée (affichage, sorties, caches, moyens de calcul)
+PARAMÈTRES_SANS_EFFET = ('live', 'print_données', 'enregistrement', 'enregistrement_live', 'data_route', 'enveloppe',
+                         'points', 'cache_étapes', 'taille_cache_étapes', 'sauvegarde_routage', 'sauvegarde_tous_les',
+                         'fichier_sauvegarde', 'reprendre_sauvegarde', 'expansion_parallèle', 'nb_processus',
+                         'mémoire_partagée', 'cache_résultats', 'dossier_cache_résultats', 'taille_cache_résultats',
+                         'délai_routage', 'facteurs_progressifs', 'corridor_progressif')
+
+class CacheRésultats:
+    """
+    Résultats de routage gardés dans dossier (un fichier .npz par clé). L'heure de modification d'un fichier
+    est mise à jour à chaque lecture : ce sont les fichiers les plus anciens qui sont supprimés en premier.
+    L'écriture passe par un fichier temporaire : plusieurs routages (threads, processus) peuvent partager le dossier.
+    """
+
+    def __init__(self, dossier=None, taille_max=None):
+        self.dossier = dossier or p.dossier_cache_résultats
+        self.taille_max = taille_max or p.taille_cache_résultats
+
+    @classmethod
+    def depuis_contexte(cls, contexte):
+        return cls(contexte.dossier_cache_résultats, contexte.taille_cache_résultats)
+
+    def fichier(self, clé):
+        return os.path.join(self.dossier, f"{clé}.npz")
+
+    def clé(self, points, contexte):
+        """
+        Empreinte du routage de points dans contexte, None si le routage ne peut pas être mis en cache
+        (filtres des fils : ce sont des fonctions Python, leur contenu n'a pas d'empreinte).
+        """
+        if contexte.filtres_fils:
+            return None
+        environnement = contexte.environnement
+        paramètres = sorted((nom, valeur) for nom, valeur in contexte.paramètres.items() if nom not in PARAMÈTRES_SANS_EFFET)
+        h = hashlib.sha256(environnement.empreinte().encode())
+        h.update(environnement.empreinte_courants().encode())
+        h.update(repr([(float(point[0]), float(point[1])) for point in points]).encode())
+        h.update(repr(paramètres).encode())
+        return h.hexdigest()
+
+    def lire(self, clé):
+        """Renvoie (arbre, noeud d'arrivée) du routage de clé, ou None s'il n'est pas dans le cache."""
+        fichier = self.fichier(clé)
+        try:
+            with np.load(fichier) as données:
+                arbre = ra.ArbreIsochrones.depuis_colonnes({nom: données[f"arbre_{nom}"] for nom in ra.ArbreIsochrones.COLONNES})
+                noeud = int(données['noeud'])
+            os.utime(fichier)
+        except (OSError, KeyError, ValueError):
+            # Absent, supprimé par un autre routage ou illisible : le routage est recalculé
+            return None
+        return arbre, noeud
+
+    def enregistrer(self, clé, arbre, noeud):
+        os.makedirs(self.dossier, exist_ok=True)
+        fichier = self.fichier(clé)
+        temporaire = f"{fichier}.{os.getpid()}.tmp"
+        try:
+            colonnes = arbre.colonnes(slice(0, len(arbre)))
+            with open(temporaire, "wb") as f:
+                np.savez_compressed(f, noeud=noeud, **{f"arbre_{nom}": colonne for nom, colonne in colonnes.items()})
+            os.replace(temporaire, fichier)
+        except OSError as e:
+            print(f"Erreur d'écriture du cache des résultats : {e}")
+            return
+        self.réduire()
+
+    def réduire(self):
+        # Supprime les résultats lus le moins récemment jusqu'à revenir sous taille_max Mo (le plus récent est gardé)
+        fichiers = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".npz"):
+                try:
+                    état = os.stat(os.path.join(self.dossier, nom))
+                except OSError:
+                    continue
+                fichiers.append((état.st_mtime, état.st_size, nom))
+        fichiers.sort()
+        total = sum(taille for _, taille, _ in fichiers)
+        for _, taille, nom in fichiers[:-1]:
+            if total <= self.taille_max * 1e6:
+                break
+            try:
+                os.remove(os.path.join(self.dossier, nom))
+            except OSError:
+                pass
+            total -= taille
+
+    def vider(self):
+        if os.path.isdir(self.dossier):
+            for nom in os.listdir(self.dossier):
+                if nom.endswith(".npz"):
+                    os.remove(os.path.join(self.dossier, nom))
@@ -1,19 +1,26 @@
 import numpy as np
 import pandas as pd
 import math
+import time
+import threading
 from copy import copy
+from collections import OrderedDict
 
 import matplotlib.pyplot as plt
 from cartopy import crs as ccrs, feature as cfeature
-from scipy.spatial import ConvexHull
+from scipy.spatial import ConvexHull, cKDTree
 
 import Routage_Vent as rv
 import Routage_Paramètres as p
 import Routage_Enveloppe_Concave as envconc
 import Routage_Coastline as rc
 import Routage_courant as rcourant
-
-from concurrent.futures import ThreadPoolExecutor
+import Routage_Polaire as rpol
+import Routage_parallèle as rpar
+import Routage_arbre as ra
+import Routage_sauvegarde as rsauv
+import Routage_cache as rcache
+import Routage_contexte as rctx
 
 "Constantes"
 R = 6371.0 # KM
@@ -38,13 +45,33 @@ def projection(position, cap, distance_NM):
     
     return (lat_rad, lon_rad)
 
-def prochains_points(parent_point, pol_v_vent, d_vent, pas_temporel, pas_angle):
+def projection_vect(lats, lons, caps, distances_NM):
+    """
+    Version vectorisée de projection : les tableaux sont diffusés (broadcast) entre eux,
+    par exemple lats (n, 1) et caps (1, m) donnent des résultats (n, m).
+    """
+    lat_rad = np.radians(lats)
+    cap_rad = np.radians(caps)
+    distance_ratio = np.asarray(distances_NM) * 1.852 / R
+
+    sin_lat = np.sin(lat_rad)
+    cos_lat = np.cos(lat_rad)
+    sin_d = np.sin(distance_ratio)
+    cos_d = np.cos(distance_ratio)
+
+    new_lat_rad = np.arcsin(sin_lat * cos_d + cos_lat * sin_d * np.cos(cap_rad))
+    new_lon_rad = np.radians(lons) + np.arctan2(np.sin(cap_rad) * sin_d * cos_lat,
+                                                cos_d - sin_lat * np.sin(new_lat_rad))
+
+    return np.degrees(new_lat_rad), np.degrees(new_lon_rad)
+
+def prochains_points(parent_point, v_vent, d_vent, pas_temporel, pas_angle):
     
     liste_points = [] # Liste qui va contenir les fils du père
 
     angles_concervés = list(range(0, 360, pas_angle)) # On sélectionne tout les pas_angles pour limiter le nombre de points 
-    for angle in angles_concervés:
-        v_bateau = recup_vitesse_fast(pol_v_vent, d_vent - angle)
+    v_bateaux = polaire_compilée.vitesse(v_vent, d_vent - np.array(angles_concervés)) # Une seule lecture de la polaire pour tous les caps
+    for angle, v_bateau in zip(angles_concervés, v_bateaux):
         liste_points.append(projection(parent_point, angle, v_bateau * pas_temporel))
     
     if p.courant:
@@ -57,43 +84,155 @@ def prochains_points(parent_point, pol_v_vent, d_vent, pas_temporel, pas_angle):
 
     return liste_points
 
-def traiter_point(lat, lon, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance):
-    parent_point = (lat, lon)
-        
-    v_vent, d_vent = rv.get_wind_at_position(lat, lon, heure)
-    pol_v_vent = polaire(v_vent)
-
-    enfants = prochains_points(parent_point, pol_v_vent, d_vent, pas_temporel, pas_angle)
+def prochains_points_vect(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance=True, contexte=None,
+                          arrière=False):
+    """
+    Expansion de toute la frontière en un seul calcul NumPy (n_parents x n_caps), filtrage des fils compris.
+    arrière : expansion à rebours du temps, chaque fils est la position d'où le bateau atteint son parent
+        en pas_temporel en suivant le cap 'cap' (vent du parent à heure, courant inversé)
+
+    Retour : dictionnaire de tableaux à plat, un élément par fils conservé
+        'lat', 'lon' : position du fils
+        'parent' : indice du parent dans (lats, lons)
+        'cap', 'v_vent', 'd_vent', 'twa', 'v_bateau' : cap suivi, vent réel et vitesse du bateau
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    """
+    contexte = contexte or rctx.contexte_modules()
+    environnement = contexte.environnement
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    n = len(lats)
+
+    v_vent, d_vent = environnement.vent_aux_positions(lats, lons, heure)
+
+    if contexte.éventail_adaptatif:
+        # Caps relatifs au vent de chaque parent : angles utiles de la polaire pour ce TWS, sur les deux bords
+        angles = environnement.polaire.angles_éventail(v_vent, contexte.nb_angles_éventail, contexte.pas_angle_fin)
+        twa = np.concatenate((angles, angles), axis=1)
+        caps = np.concatenate((d_vent[:, None] - angles, d_vent[:, None] + angles), axis=1) % 360
+    else:
+        caps = np.broadcast_to(np.arange(0, 360, pas_angle, dtype=float)[None, :], (n, len(range(0, 360, pas_angle))))
+        twa = np.abs((d_vent[:, None] - caps + 180) % 360 - 180)
+    v_vent = np.broadcast_to(v_vent[:, None], twa.shape)
+    d_vent = np.broadcast_to(d_vent[:, None], twa.shape)
+    v_bateau = environnement.polaire.vitesse(v_vent, twa)
+
+    lat_e, lon_e = projection_vect(lats[:, None], lons[:, None], (caps + 180) % 360 if arrière else caps, v_bateau * pas_temporel)
+
+    enfants = {
+        'lat': lat_e.ravel(),
+        'lon': lon_e.ravel(),
+        'parent': np.repeat(np.arange(n), caps.shape[1]),
+        'cap': caps.ravel(),
+        'v_vent': v_vent.ravel(),
+        'd_vent': d_vent.ravel(),
+        'twa': twa.ravel(),
+        'v_bateau': v_bateau.ravel(),
+    }
+
+    if contexte.courant:
+        u, v = environnement.courant_aux_positions(enfants['lat'], enfants['lon'], 3)
+        if arrière:
+            u, v = -u, -v
+        enfants['lat'], enfants['lon'] = rcourant.position_courant_vect(enfants['lat'], enfants['lon'], u, v, pas_temporel)
 
     if filtrer_par_distance:
-        # Différents filtrages en fonction des paramètres
-        
         # On interdit tous les fils de sortir de la zone de navigation
-        enfants = [enfant for enfant in enfants if (enfant[1] <= p.cadre_navigation[1][1] 
-                                                    and enfant[1] >= p.cadre_navigation[0][1]
-                                                    and enfant[0] <= p.cadre_navigation[1][0]
-                                                    and enfant[0] >= p.cadre_navigation[0][0])]
-        # Si le paramètre land_contact est True alors on interdit les fils qui arrivent sur la terre
-        if p.land_contact:
-            enfants = [enfant for enfant in enfants if rc.get_point_value(enfant) == 0]
-        # Sinon on supprime les fils plus loin que le père du point final pour optimiser les calculs. Dans le cas où les contacts terrestres 
-        # sont activés, ce mode ne nous interresse pas car on souhaite potentiellement faire le tour d'un bout de terre pour arriver à destination
+        (lat_min, lon_min), (lat_max, lon_max) = contexte.cadre_navigation
+        garde = ((enfants['lon'] <= lon_max) & (enfants['lon'] >= lon_min)
+                 & (enfants['lat'] <= lat_max) & (enfants['lat'] >= lat_min))
+
+        if contexte.land_contact:
+            dans_cadre = np.flatnonzero(garde)
+            garde[dans_cadre] = environnement.terre(enfants['lat'][dans_cadre], enfants['lon'][dans_cadre]) == 0
         else:
-            enfants = [enfant for enfant in enfants if plus_proche_que_parent(point_suivant, parent_point, enfant)] 
-        # On retourne une liste avec le père comme premier élément et une liste de tous ss fils --> permet de déterminer plus tard le chemin idéal
-    return [parent_point, enfants]
+            idx = enfants['parent']
+            distance_parent = distance_2_points_vect(lats[idx], lons[idx], *point_suivant)
+            distance_enfant = distance_2_points_vect(enfants['lat'], enfants['lon'], *point_suivant)
+            garde &= distance_enfant < distance_parent
 
-def prochains_points_liste_parent_enfants(liste, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance=True):
-    # Utilisation d’un ThreadPoolExecutor pour paralléliser les opérations --> optimisation du temps de calcul
-    with ThreadPoolExecutor() as executor:
-        # On lance en parallèle le traitement de chaque point de la liste
-        futures = [executor.submit(traiter_point, lat, lon, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance) 
-                   for lat, lon in liste]
+        enfants = {cle: valeurs[garde] for cle, valeurs in enfants.items()}
 
-        # On récupère les résultats quand ils sont prêts
-        liste_rendu = [f.result() for f in futures]
+    return enfants
 
-    return liste_rendu
+def expansion_frontière(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance=True, pool=None, contexte=None,
+                        arrière=False):
+    # Expansion de la frontière par le noyau vectorisé, réparti sur le pool de processus du routage s'il existe
+    if pool is not None:
+        return pool.expansion(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance, arrière, contexte)
+    return prochains_points_vect(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance, contexte, arrière)
+
+def filtrer_fils(lats, lons, enfants, heure, contexte=None, heure_parents=None):
+    """
+    Applique les filtres du contexte (filtres_fils par défaut) aux fils de l'expansion (avant l'extraction de la frontière).
+    Chaque filtre est une fonction (lat_parent, lon_parent, lat_fils, lon_fils, heure) -> masque des fils gardés,
+    heure étant l'heure à laquelle les fils sont atteints.
+    Les fils dont la branche coupe une zone interdite active entre heure_parents et heure (Routage_zones) sont
+    ensuite retirés, même s'il n'en reste aucun : la frontière garde alors ses parents, qui attendent la fin
+    de la zone. Si toutes les branches coupent une zone active pour toujours, l'étape est impossible (ÉtapeImpossible).
+    """
+    contexte = contexte or rctx.contexte_modules()
+    filtres, zones = contexte.filtres_fils, contexte.environnement.zones
+    if not (filtres or zones) or len(enfants['lat']) == 0:
+        return enfants
+    idx = enfants['parent']
+    garde = np.ones(len(idx), dtype=bool)
+    for filtre in filtres:
+        garde &= filtre(lats[idx], lons[idx], enfants['lat'], enfants['lon'], heure)
+    if not garde.any():
+        # Aucun fils ne passe les filtres : on les garde tous plutôt que de perdre la frontière
+        garde[:] = True
+    if zones is not None:
+        heure_parents = heure if heure_parents is None else heure_parents
+        coupés = zones.coupés(lats[idx], lons[idx], enfants['lat'], enfants['lon'], heure_parents, heure)
+        if garde.any() and not (garde & ~coupés).any():
+            bloqués = zones.bloqués(lats[idx][garde], lons[idx][garde], enfants['lat'][garde], enfants['lon'][garde],
+                                    min(heure, heure_parents))
+            if bloqués.all():
+                raise ÉtapeImpossible("Toutes les branches de la frontière coupent une zone interdite permanente")
+        garde &= ~coupés
+    return {clé: valeurs[garde] for clé, valeurs in enfants.items()}
+
+def candidats_frontière(arbre, frontière, enfants):
+    """
+    Nuage de points candidats pour la prochaine frontière : les parents (nœuds déjà dans l'arbre)
+    et leurs fils (lignes de enfants, pas encore dans l'arbre).
+    L'ordre est celui de l'ancien applatissement de [[parent, [fils]], ...] (fils avant parents,
+    derniers parents en premier), dont dépend l'élagage glouton.
+
+    Retour : dictionnaire de tableaux
+        'coords' : (n, 2) lat, lon
+        'noeud' : indice du nœud dans l'arbre, -1 pour un fils
+        'ligne' : indice du fils dans enfants, -1 pour un parent
+    """
+    n_parents, n_enfants = len(frontière), len(enfants['lat'])
+    nb_fils = np.bincount(enfants['parent'], minlength=n_parents)
+
+    # Positions dans la séquence [parent 0, fils de 0, parent 1, fils de 1, ...]
+    pos_parents = np.arange(n_parents) + np.concatenate(([0], np.cumsum(nb_fils)[:-1]))
+    pos_enfants = enfants['parent'] + 1 + np.arange(n_enfants)
+
+    total = n_parents + n_enfants
+    coords = np.empty((total, 2))
+    noeud = np.full(total, -1, dtype=np.int64)
+    ligne = np.full(total, -1, dtype=np.int64)
+
+    coords[pos_parents, 0], coords[pos_parents, 1] = arbre.lat[frontière], arbre.lon[frontière]
+    coords[pos_enfants, 0], coords[pos_enfants, 1] = enfants['lat'], enfants['lon']
+    noeud[pos_parents] = frontière
+    ligne[pos_enfants] = np.arange(n_enfants)
+
+    return {'coords': coords[::-1], 'noeud': noeud[::-1], 'ligne': ligne[::-1]}
+
+def insérer_candidats(arbre, candidats, sélection, frontière, enfants, iteration, heure):
+    # Ajoute dans l'arbre les fils sélectionnés (atteints à heure) et renvoie les indices de nœuds de toute la sélection
+    noeuds = candidats['noeud'][sélection].copy()
+    nouveaux = noeuds < 0
+    lignes = candidats['ligne'][sélection][nouveaux]
+    noeuds[nouveaux] = arbre.ajouter(enfants['lat'][lignes], enfants['lon'][lignes],
+                                     np.asarray(frontière)[enfants['parent'][lignes]], iteration, heure=heure,
+                                     **{nom: enfants[nom][lignes] for nom in ('cap', 'v_vent', 'd_vent', 'twa', 'v_bateau')})
+    return noeuds
 
 def plus_proche_que_parent(point_arrivee, pos_parent, pos_enfant):
     distance_parent = distance_2_points(point_arrivee, pos_parent)
@@ -101,56 +240,17 @@ def plus_proche_que_parent(point_arrivee, pos_parent, pos_enfant):
     return distance_enfant < distance_parent
 
 def polaire(vitesse_vent): # A partir d'un fichier polaire, on récupère que la vitesse du bateau pour une vitesse de vent vitesse_vent pour chaque angle
-    liste_vitesse = polaire_df.columns
-
-    i = 0
-    while i < len(liste_vitesse):
-        vitesse = float(liste_vitesse[i])
-        if vitesse == vitesse_vent:
-            return polaire_df[liste_vitesse[i]]
-        elif vitesse > vitesse_vent:
-            inf = i - 1
-            sup = i
-            t = (vitesse_vent - float(liste_vitesse[inf])) / (float(liste_vitesse[sup]) - float(liste_vitesse[inf]))
-            return t * polaire_df[liste_vitesse[inf]] + (1 - t) * polaire_df[liste_vitesse[sup]]
-        i += 1
-    print('Erreur vitesse de vent')
-    return None
+    return polaire_compilée.colonne(vitesse_vent)
 
 def recup_vitesse_fast(pol_v_vent, angle): # Donne la vitesse du bateau pour un angle donné
     if pol_v_vent is None:
         raise ValueError("Erreur : pol_v_vent est None, vérifiez la vitesse du vent")
-    
+
     angle = abs(angle)
     if angle > 180:
         angle = 360 - angle
 
-    i = 0
-    while i < len(pol_v_vent):
-        angle_vent = float(liste_angle[i])
-        if angle == angle_vent:
-            return pol_v_vent[liste_angle[i]]
-        elif angle_vent > angle:
-            inf = i - 1
-            sup = i
-            t = (angle - float(liste_angle[inf])) / (float(liste_angle[sup]) - float(liste_angle[inf]))
-            return t * pol_v_vent[liste_angle[inf]] + (1 - t) * pol_v_vent[liste_angle[sup]]
-        i += 1
-    print("Erreur angle")
-    return None
-
-def applatissement_liste(listes_emboitées):
-    liste_applaitie = []
-    pile = [listes_emboitées]
-
-    while pile:
-        lst = pile.pop()
-        if isinstance(lst, list):  # Si c'est une liste, on ajoute ses éléments à la pile
-            pile.extend(lst)
-        elif isinstance(lst, tuple):  # Si c'est un tuple, on l'ajoute au résultat
-            liste_applaitie.append(lst)
-    
-    return liste_applaitie
+    return float(np.interp(angle, pol_v_vent.index, pol_v_vent.values))
 
 def distance_2_points(point1, point2):
     """
@@ -174,20 +274,31 @@ def distance_2_points(point1, point2):
 
     return (R * c) / 1.852  # Distance en miles nautiques
 
-def dist_bateau_point(points, point_final, tolérance):
-    for point in points:
-        distance = distance_2_points(point, point_final)
-        if distance <= tolérance:
-            return True    
-    return False
+def distance_2_points_vect(lat1, lon1, lat2, lon2):
+    """
+    Version vectorisée de distance_2_points (même formule), en miles nautiques.
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
 
-def midpoint_on_water(pt1, pt2):
+    sin_dlat2 = np.sin((lat2 - lat1) / 2)
+    sin_dlon2 = np.sin((lon2 - lon1) / 2)
+
+    a = sin_dlat2 * sin_dlat2 + np.cos(lat1) * np.cos(lat2) * sin_dlon2 * sin_dlon2
+    c = 2 * np.arctan2(np.sqrt(a), np.hypot(1 - a, np.sqrt(a)))
+
+    return (R * c) / 1.852
+
+def midpoint_on_water(pt1, pt2, contexte=None):
     # Calculer le point médian
     mid = ((pt1[0] + pt2[0]) / 2, (pt1[1] + pt2[1]) / 2)
-    # Vérifier si ce point est sur l'eau (get_point_value renvoie 0 pour l'eau)
-    return rc.get_point_value(mid) == 0
- 
-def plot_points_live(ax, enveloppe_concave, parent_map, position_initiale, position_finale, route, step_index, loc, couleur='blue'):
+    # Vérifier si ce point est sur l'eau (le masque vaut 0 pour l'eau)
+    environnement = (contexte or rctx.contexte_modules()).environnement
+    return environnement.terre(np.array([mid[0]]), np.array([mid[1]]))[0] == 0
+
+def plot_points_live(ax, arbre, frontière, position_finale, step_index, loc, couleur='blue', points=None, contexte=None):
+    # points : points de passage de la route (départ, intermédiaires, arrivée), ceux du contexte par défaut
+    contexte = contexte or rctx.contexte_modules()
+    points = points if points is not None else contexte.points
     # Effacer uniquement les vecteurs de vent et les chemins, mais garder les enveloppes
     for artist in ax.collections:
         if artist.get_label() != 'Enveloppe actuelle':  # Ne pas supprimer l'enveloppe
@@ -199,18 +310,20 @@ def plot_points_live(ax, enveloppe_concave, parent_map, position_initiale, posit
 
     rv.plot_wind(ax, loc, step_indices=[step_index])
 
+    enveloppe_concave = arbre.points(frontière)
+
     # Vérifier que l'enveloppe est bien une liste de points valides
     if not isinstance(enveloppe_concave, list) or not all(isinstance(point, (list, tuple)) and len(point) == 2 for point in enveloppe_concave):
         print(f"L'enveloppe est invalide : {enveloppe_concave}")
         return
 
     # Tracer l'enveloppe concave    
-    if p.land_contact:
+    if contexte.land_contact:
         # Parcourir les points de l'enveloppe et tracer les segments si le point médian est sur l'eau
         for i in range(len(enveloppe_concave)):
             pt1 = enveloppe_concave[i]
             pt2 = enveloppe_concave[(i + 1) % len(enveloppe_concave)]
-            if midpoint_on_water(pt1, pt2):
+            if midpoint_on_water(pt1, pt2, contexte):
                 ax.plot([pt1[1], pt2[1]], [pt1[0], pt2[0]], color=couleur, linestyle='-', linewidth=1, transform=ccrs.PlateCarree())
     else:
         hull_lat, hull_lon = zip(*enveloppe_concave)
@@ -219,31 +332,21 @@ def plot_points_live(ax, enveloppe_concave, parent_map, position_initiale, posit
     # Affichage des points de l'enveloppe
     hull_lat, hull_lon = zip(*enveloppe_concave)
    
-    if p.enveloppe:
+    if contexte.enveloppe:
         ax.scatter(hull_lon, hull_lat, color='red', s=10, transform=ccrs.PlateCarree(), label='Enveloppe actuelle')
     ax.scatter(hull_lon, hull_lat, color='red', s=10, transform=ccrs.PlateCarree(), label='Enveloppe actuelle')
 
-    # Déterminer le point le plus proche de la destination
-    closest_point = min(enveloppe_concave, key=lambda point: distance_2_points(point, position_finale))
-
-    # Remonter la relation parent-enfant pour construire le chemin idéal
-    chemin_ideal = []
-    current_point = closest_point
-    while current_point is not None:
-        chemin_ideal.append(current_point)
-        current_point = parent_map[current_point]
-
-    chemin_ideal.reverse()
-    
-    chemin_ideal = route + chemin_ideal
+    # Déterminer le point le plus proche de la destination et remonter l'arbre pour construire le chemin idéal
+    closest_node = frontière[np.argmin(distance_2_points_vect(arbre.lat[frontière], arbre.lon[frontière], *position_finale))]
+    chemin_ideal = arbre.points(arbre.chemin(closest_node))
 
     if chemin_ideal:
         chemin_lat, chemin_lon = zip(*chemin_ideal)
         ax.plot(chemin_lon, chemin_lat, color='black', linestyle='-', linewidth=2, label='Route', transform=ccrs.PlateCarree())
         p_r = ax.scatter(chemin_lon, chemin_lat, color='black', s=50, transform=ccrs.PlateCarree())
-        p_f = ax.scatter(p.points[-1][1], p.points[-1][0], color='red', s=100, marker='o', label='Position finale')
-        p_i = ax.scatter(p.points[0][1], p.points[0][0], color='green', s=100, marker='o', label='Position initiale')
-        for point in p.points[1:-1]:
+        p_f = ax.scatter(points[-1][1], points[-1][0], color='red', s=100, marker='o', label='Position finale')
+        p_i = ax.scatter(points[0][1], points[0][0], color='green', s=100, marker='o', label='Position initiale')
+        for point in points[1:-1]:
             ax.scatter(point[1], point[0], color = 'black', s= 70, marker = 'o', label = 'point intermédiare')
     else:
         print("Chemin idéal vide : impossible de tracer la route.")
@@ -252,7 +355,10 @@ def plot_points_live(ax, enveloppe_concave, parent_map, position_initiale, posit
     plt.legend(handles = [p_f, p_i]) # Car je veux pas afficher en légende l'enveloppe concave
     plt.pause(0.05)
 
-def plot_points_live_tk(ax, canvas, enveloppe_concave, parent_map, position_initiale, position_finale, route, step_index, loc, couleur='blue'):
+def plot_points_live_tk(ax, canvas, arbre, frontière, position_finale, step_index, loc, couleur='blue', points=None, contexte=None):
+    # points : points de passage de la route (départ, intermédiaires, arrivée), ceux du contexte par défaut
+    contexte = contexte or rctx.contexte_modules()
+    points = points if points is not None else contexte.points
 
     # Effacer uniquement les vecteurs de vent et les chemins, mais garder les enveloppes
     for artist in ax.collections:
@@ -265,18 +371,20 @@ def plot_points_live_tk(ax, canvas, enveloppe_concave, parent_map, position_init
 
     rv.plot_wind_tk(ax, canvas, loc, step_indices=[step_index])
 
+    enveloppe_concave = arbre.points(frontière)
+
     # Vérifier que l'enveloppe est bien une liste de points valides
     if not isinstance(enveloppe_concave, list) or not all(isinstance(point, (list, tuple)) and len(point) == 2 for point in enveloppe_concave):
         print(f"L'enveloppe est invalide : {enveloppe_concave}")
         return
 
     # Tracer l'enveloppe concave    
-    if p.land_contact:
+    if contexte.land_contact:
         # Parcourir les points de l'enveloppe et tracer les segments si le point médian est sur l'eau
         for i in range(len(enveloppe_concave)):
             pt1 = enveloppe_concave[i]
             pt2 = enveloppe_concave[(i + 1) % len(enveloppe_concave)]
-            if midpoint_on_water(pt1, pt2):
+            if midpoint_on_water(pt1, pt2, contexte):
                 ax.plot([pt1[1], pt2[1]], [pt1[0], pt2[0]], color='red', linestyle='-', linewidth=1, transform=ccrs.PlateCarree())
     else:
         hull_lat, hull_lon = zip(*enveloppe_concave)
@@ -285,30 +393,21 @@ def plot_points_live_tk(ax, canvas, enveloppe_concave, parent_map, position_init
     # Affichage des points de l'enveloppe
     hull_lat, hull_lon = zip(*enveloppe_concave)
     
-    if p.enveloppe:
+    if contexte.enveloppe:
         ax.plot(hull_lon, hull_lat, color=couleur, linestyle='-', linewidth=1, transform=ccrs.PlateCarree())
     ax.scatter(hull_lon, hull_lat, color='red', s=10, transform=ccrs.PlateCarree(), label='Enveloppe actuelle')
 
-    # Déterminer le point le plus proche de la destination
-    closest_point = min(enveloppe_concave, key=lambda point: distance_2_points(point, position_finale))
-
-    # Remonter la relation parent-enfant pour construire le chemin idéal
-    chemin_ideal = []
-    current_point = closest_point
-    while current_point is not None:
-        chemin_ideal.append(current_point)
-        current_point = parent_map[current_point]
-
-    chemin_ideal.reverse()
-    chemin_ideal = route + chemin_ideal
+    # Déterminer le point le plus proche de la destination et remonter l'arbre pour construire le chemin idéal
+    closest_node = frontière[np.argmin(distance_2_points_vect(arbre.lat[frontière], arbre.lon[frontière], *position_finale))]
+    chemin_ideal = arbre.points(arbre.chemin(closest_node))
 
     if chemin_ideal:
         chemin_lat, chemin_lon = zip(*chemin_ideal)
         ax.plot(chemin_lon, chemin_lat, color='black', linestyle='-', linewidth=2, label='Route', transform=ccrs.PlateCarree())
         p_r = ax.scatter(chemin_lon, chemin_lat, color='black', s=50, transform=ccrs.PlateCarree())
-        p_f = ax.scatter(p.points[-1][1], p.points[-1][0], color='red', s=100, marker='o', label='Position finale')
-        p_i = ax.scatter(p.points[0][1], p.points[0][0], color='green', s=100, marker='o', label='Position initiale')
-        for point in p.points[1:-1]:
+        p_f = ax.scatter(points[-1][1], points[-1][0], color='red', s=100, marker='o', label='Position finale')
+        p_i = ax.scatter(points[0][1], points[0][0], color='green', s=100, marker='o', label='Position initiale')
+        for point in points[1:-1]:
             ax.scatter(point[1], point[0], color='black', s=70, marker='o', label='point intermédiaire')
     else:
         print("Chemin idéal vide : impossible de tracer la route.")
@@ -329,6 +428,31 @@ def elaguer_enveloppe(points, distance):
     
     return points_elagués
 
+def elaguer_points(points, distance):
+    """
+    Même résultat que elaguer_enveloppe (un point est gardé si aucun point déjà gardé n'est
+    à moins de distance), mais les voisins sont cherchés avec un cKDTree : coût quasi linéaire
+    au lieu de quadratique, utilisable sur tout le nuage de fils avant l'extraction de l'enveloppe.
+    """
+    return [points[i] for i in elaguer_points_indices(points, distance)]
+
+def elaguer_points_indices(points, distance):
+    # Indices (croissants) des points gardés par elaguer_points
+    if len(points) == 0:
+        return np.array([], dtype=int)
+    coords = np.asarray(points, dtype=float)
+    arbre = cKDTree(coords)
+    rayon = np.nextafter(distance, 0) # query_ball_point inclut la borne, elaguer_enveloppe non
+
+    supprimés = np.zeros(len(coords), dtype=bool)
+    gardés = []
+    for i in range(len(coords)):
+        if not supprimés[i]:
+            gardés.append(i)
+            supprimés[arbre.query_ball_point(coords[i], rayon)] = True
+
+    return np.array(gardés, dtype=int)
+
 def calculer_cap(lat1, lon1, lat2, lon2):
     # Conversion des degrés en radians
     lat1 = math.radians(lat1)
@@ -351,7 +475,21 @@ def calculer_cap(lat1, lon1, lat2, lon2):
 
     return cap
 
+def calculer_cap_vect(lat1, lon1, lat2, lon2):
+    # Version vectorisée de calculer_cap, en degrés entre 0 et 360
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    delta_lon = lon2 - lon1
+    x = np.sin(delta_lon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(delta_lon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
 def farthest_pair(points):
+    points = np.array(points)
+    i, k = farthest_pair_indices(points)
+    return (tuple(points[i]), tuple(points[k]))
+
+def farthest_pair_indices(points):
+    # Indices dans points des deux points les plus éloignés
     points = np.array(points)
     hull = ConvexHull(points)
     hull_points = points[hull.vertices]  # Sommets de l'enveloppe convexe
@@ -371,17 +509,740 @@ def farthest_pair(points):
         dist = distance_2_points(hull_points[i], hull_points[k])
         if dist > max_dist:
             max_dist = dist
-            farthest_pair = (tuple(hull_points[i]), tuple(hull_points[k]))
+            farthest_pair = (int(hull.vertices[i]), int(hull.vertices[k]))
 
     return farthest_pair
 
-def itere_jusqua_dans_enveloppe(points):
-    
-    if p.live: # Préparation du plot (tracé terrestre, couleurs, dimensions, ...)
+def masqué_par_terre(origine, lats, lons, nb_échantillons=16, contexte=None):
+    # Vrai pour les points dont le segment depuis l'origine traverse la terre (par exemple derrière une île)
+    t = np.linspace(0, 1, nb_échantillons + 2)[1:-1]
+    lats_seg = origine[0] + t[None, :] * (np.asarray(lats)[:, None] - origine[0])
+    lons_seg = origine[1] + t[None, :] * (np.asarray(lons)[:, None] - origine[1])
+    return ((contexte or rctx.contexte_modules()).environnement.terre(lats_seg, lons_seg) != 0).any(axis=1)
+
+def extraire_frontière(coords, point1, point2, positions, graines=None, contexte=None, rayon=None):
+    """
+    Extrait la nouvelle frontière (isochrone) du nuage de points candidats coords (n, 2).
+    Renvoie les indices (dans coords) des points de la frontière, dans l'ordre de la boucle.
+    graines : masque des candidats qui sont les points de la frontière précédente (positions)
+    rayon : rayon d'élimination des points proches (contexte.rayon_elemination par défaut)
+
+    contexte.extraction_frontière = 'concave' : enveloppe concave par triangulation de Delaunay
+    contexte.extraction_frontière = 'incrémentale' : enveloppe concave dont la triangulation part de la frontière
+        précédente, les fils restés à l'intérieur de celle-ci sont ignorés
+    contexte.extraction_frontière = 'secteurs' : méthode classique des isochrones, le point le plus éloigné
+        par secteur de relèvement depuis le point de départ de l'étape (ou le centre de l'isochrone précédente)
+    """
+    contexte = contexte or rctx.contexte_modules()
+    rayon = contexte.rayon_elemination if rayon is None else rayon
+    coords = np.asarray(coords, dtype=float)
+    indices = np.arange(len(coords))
+    if contexte.elagage_avant_enveloppe: # Le nuage de fils est éclairci avant l'extraction, ce qui réduit aussi l'entrée de Delaunay
+        indices = elaguer_points_indices(coords, rayon)
+    points = coords[indices]
+
+    if contexte.extraction_frontière == 'secteurs':
+        if contexte.origine_secteurs == 'isochrone':
+            origine = tuple(np.mean(np.asarray(positions, dtype=float), axis=0))
+        else:
+            origine = point1
+        # Avec les contacts terrestres, les points cachés par une île forment une branche à part dans chaque secteur
+        classes = masqué_par_terre(origine, points[:, 0], points[:, 1], contexte=contexte) if contexte.land_contact else None
+        frontière = indices[envconc.enveloppe_secteurs_indices(points, origine, contexte.nb_secteurs, classes)]
+    elif contexte.extraction_frontière == 'incrémentale' and graines is not None:
+        frontière = indices[envconc.enveloppe_concave_incrementale_indices(points, np.asarray(graines)[indices], positions)]
+    else:
+        frontière = indices[envconc.enveloppe_concave_indices(points)]
+
+    if not contexte.land_contact: # Je choisie un type d'enveloppe différent en fonction de si le contact terrestre est activé
+        n1, n2 = farthest_pair_indices(coords[frontière])
+        if n1 > n2:
+            n1, n2 = n2, n1
+        frontière1 = frontière[n1:n2+1]
+        frontière2 = np.concatenate((frontière[n2:], frontière[:n1+1]))
+        m1 = np.mean(distance_2_points_vect(coords[frontière1, 0], coords[frontière1, 1], *point2))
+        m2 = np.mean(distance_2_points_vect(coords[frontière2, 0], coords[frontière2, 1], *point2))
+
+        if m1 <= m2:
+            frontière = frontière1
+        else:
+            frontière = frontière2
+
+    return frontière[elaguer_points_indices(coords[frontière], rayon)]
+
+def écrire_informations_route(arbre, chemin, fichier="Informations_route.txt"):
+    # Les données de chaque branche (vent, cap, vitesse) sont celles gardées dans l'arbre pendant le routage
+    noeuds = arbre.colonnes(chemin)
+    with open(fichier, "w") as f:
+        for i in range(len(chemin) - 1):
+            horaire = float(noeuds['heure'][i])
+            f.write(f"Heure: {horaire}\n")
+            f.write(f"Position : {float(noeuds['lat'][i]), float(noeuds['lon'][i])}\n")
+            f.write(f"Prediction de vent a la position {round(float(noeuds['d_vent'][i+1]), 2)} degre pour {round(float(noeuds['v_vent'][i+1]), 2)} knd\n")
+            f.write(f"Cap : {round(float(noeuds['cap'][i+1]), 2)}\n")
+            f.write(f"Vitesse : {round(float(noeuds['v_bateau'][i+1]), 2)}\n")
+            f.write("-----------------------------------------------------------\n")
+
+def étape_isochrone(arbre, frontière, point1, point2, heure, pas, iteration, pool=None, eta=np.inf, reste=0.0, contexte=None,
+                    rayon=None, arrière=False):
+    """
+    Une itération du routage (de heure à heure + pas) : expansion de la frontière, extraction de la
+    nouvelle frontière et ajout de ses points dans l'arbre. Renvoie la nouvelle frontière (indices de nœuds),
+    les candidats et les fils (pour aller chercher le point d'arrivée parmi eux).
+    eta, reste : ETA de référence au dernier point et distance du parcours après point2, pour l'élagage par borne
+    rayon : rayon d'élimination de l'itération (contexte.rayon_elemination par défaut)
+    arrière : isochrone à rebours (de heure à heure - pas) depuis point1 vers point2, voir Routage_bidirectionnel
+    """
+    contexte = contexte or rctx.contexte_modules()
+    heure_fils = heure - pas if arrière else heure + pas
+    enfants = expansion_frontière(arbre.lat[frontière], arbre.lon[frontière], point2, pas, contexte.pas_angle,
+                                  math.floor(heure_fils if arrière else heure), filtrer_par_distance=True, pool=pool,
+                                  contexte=contexte, arrière=arrière)
+    enfants = filtrer_fils(arbre.lat[frontière], arbre.lon[frontière], enfants, heure_fils, contexte, heure)
+    candidats = candidats_frontière(arbre, frontière, enfants)
+    if len(enfants['lat']) == 0:
+        # Toutes les branches coupent une zone interdite temporaire : la frontière attend sur place
+        return np.asarray(frontière), candidats, enfants
+    positions = np.column_stack((arbre.lat[frontière], arbre.lon[frontière]))
+
+    sélection = extraire_frontière(candidats['coords'], point1, point2, positions, graines=candidats['noeud'] >= 0,
+                                   contexte=contexte, rayon=rayon)
+    if contexte.élagage_borne and np.isfinite(eta):
+        sélection, nb_élagués = élaguer_par_borne(candidats, sélection, point2, heure_fils, reste, eta, contexte)
+        if contexte.print_données:
+            print("Points élagués par la borne :", nb_élagués)
+    sélection = limiter_frontière(candidats, sélection, point1, point2, heure_fils, reste, contexte)
+    nouvelle_frontière = insérer_candidats(arbre, candidats, sélection, frontière, enfants, iteration, heure_fils)
+
+    if contexte.print_données:
+        print("Nombre de points dans enveloppe_concave:", len(nouvelle_frontière), len(candidats['coords']))
+
+    return nouvelle_frontière, candidats, enfants
+
+def distance_parcours(points):
+    # Distance (NM) le long d'une suite de points
+    return sum(distance_2_points(a, b) for a, b in zip(points[:-1], points[1:]))
+
+def vitesse_borne(contexte=None):
+    # Vitesse fond maximale possible : vitesse max de la polaire, plus le courant le plus fort s'il est pris en compte
+    contexte = contexte or rctx.contexte_modules()
+    environnement = contexte.environnement
+    return environnement.polaire.vitesse_max + (environnement.vitesse_max_courant() if contexte.courant else 0)
+
+def temps_restant_estimé(lats, lons, point2, contexte):
+    # Temps restant jusqu'à point2 lu sur la carte de Routage_temps_restant (calculée à la première demande)
+    import Routage_temps_restant as rtr
+    return rtr.carte_temps_restant(point2, contexte).temps_restant(lats, lons)
+
+def eta_référence(lats, lons, point1, point2, reste, heure_départ, heure, contexte=None):
+    """
+    ETA au dernier point servant de borne à l'élagage : contexte.eta_max, l'arrivée d'une route déjà atteinte
+    (routage précédent, niveau plus grossier du routage progressif), infinie si elle n'est pas connue. Un point dont
+    l'arrivée au mieux la dépasse ne peut pas être sur la meilleure route : l'élagage est admissible.
+    Avec contexte.élagage_heuristique, la borne est aussi une estimation multipliée par contexte.marge_élagage :
+    d'après la carte du temps restant (contexte.temps_restant), ou d'après la progression vers point2 depuis le début
+    de l'étape (heure_départ). Ce n'est pas une arrivée atteinte : la meilleure route peut être écartée.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    eta = contexte.eta_max if contexte.eta_max is not None else np.inf
+    if not contexte.élagage_heuristique:
+        return eta
+    if contexte.temps_restant:
+        temps = temps_restant_estimé(lats, lons, point2, contexte).min()
+        return min(eta, heure + contexte.marge_élagage * (temps + reste / vitesse_borne(contexte)))
+    if heure - heure_départ < contexte.délai_élagage:
+        return eta
+    distance_restante = distance_2_points_vect(lats, lons, *point2).min()
+    progression = (distance_2_points(point1, point2) - distance_restante) / (heure - heure_départ)
+    if progression <= 0:
+        return eta
+    return min(eta, heure + contexte.marge_élagage * (distance_restante + reste) / progression)
+
+def élaguer_par_borne(candidats, sélection, point_cible, heure, reste, eta, contexte=None):
+    """
+    Retire de la sélection les points dont la borne inférieure de l'heure d'arrivée au dernier point
+    (heure + distance restante / vitesse fond max) dépasse eta. Avec contexte.temps_restant et contexte.élagage_heuristique,
+    la borne jusqu'à point_cible est le temps de la carte multiplié par contexte.facteur_temps_restant (estimation,
+    pas une borne inférieure). Un parent gardé dans la frontière ne repart
+    qu'à partir de heure, comme les fils : la borne utilise la même heure pour tous les points.
+    Le point de plus petite borne est toujours gardé. Renvoie la sélection et le nombre de points retirés.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    coords = candidats['coords'][sélection]
+    if contexte.temps_restant and contexte.élagage_heuristique:
+        temps = temps_restant_estimé(coords[:, 0], coords[:, 1], point_cible, contexte)
+        borne = heure + contexte.facteur_temps_restant * temps + reste / vitesse_borne(contexte)
+    else:
+        borne = heure + (distance_2_points_vect(coords[:, 0], coords[:, 1], *point_cible) + reste) / vitesse_borne(contexte)
+
+    garde = borne <= eta
+    if len(borne):
+        garde[np.argmin(borne)] = True
+    return sélection[garde], int((~garde).sum())
+
+def score_progression(coords, point1, point2, heure, reste, contexte):
+    # Distance restante jusqu'à la cible
+    return distance_2_points_vect(coords[:, 0], coords[:, 1], *point2)
+
+def score_eta(coords, point1, point2, heure, reste, contexte):
+    # ETA au dernier point à la vitesse max de la polaire pour le vent au point (la force du vent départage les points)
+    environnement = contexte.environnement
+    polaire = environnement.polaire
+    v_vent, _ = environnement.vent_aux_positions(coords[:, 0], coords[:, 1], math.floor(heure))
+    i = np.clip(np.rint(v_vent / polaire.pas_tws).astype(int), 0, len(polaire.tws) - 1)
+    vitesse = np.maximum(polaire.vitesse(v_vent, polaire.angle_vitesse_max[i]), 0.1)
+    return heure + (score_progression(coords, point1, point2, heure, reste, contexte) + reste) / vitesse
+
+def score_temps_restant(coords, point1, point2, heure, reste, contexte):
+    # Heure + temps restant de la carte jusqu'à point2, puis le reste du parcours à la vitesse max
+    return heure + temps_restant_estimé(coords[:, 0], coords[:, 1], point2, contexte) + reste / vitesse_borne(contexte)
+
+def score_diversité(coords, point1, point2, heure, reste, contexte):
+    """
+    Rang du point dans son secteur de relèvement depuis point1 (autant de secteurs que de points gardés),
+    départagé par la distance à la cible : le budget garde d'abord le meilleur point de chaque secteur.
+    """
+    distance = score_progression(coords, point1, point2, heure, reste, contexte)
+    caps = calculer_cap_vect(point1[0], point1[1], coords[:, 0], coords[:, 1])
+    secteurs = np.minimum((caps / 360 * contexte.taille_max_frontière).astype(int), contexte.taille_max_frontière - 1)
+
+    ordre = np.lexsort((distance, secteurs))
+    rangs = np.arange(len(ordre))
+    débuts = np.maximum.accumulate(np.where(np.r_[True, secteurs[ordre][1:] != secteurs[ordre][:-1]], rangs, 0))
+    rang = np.empty(len(ordre), dtype=int)
+    rang[ordre] = rangs - débuts
+    return rang + distance / (distance.max() + 1)
+
+# Scores du budget de la frontière (plus petit = meilleur) ; on peut en ajouter un et le choisir par son nom
+SCORES_FRONTIÈRE = {'progression': score_progression, 'eta': score_eta, 'temps_restant': score_temps_restant,
+                    'diversité': score_diversité}
+
+def limiter_frontière(candidats, sélection, point1, point2, heure, reste, contexte):
+    """
+    Budget de la frontière : si la sélection dépasse contexte.taille_max_frontière points, garde ceux de plus petit
+    score (SCORES_FRONTIÈRE[contexte.score_frontière], fonction (coords, point1, point2, heure, reste, contexte)),
+    dans l'ordre de la frontière. Le nombre de fils de l'itération suivante est ainsi borné.
+    """
+    taille = contexte.taille_max_frontière
+    if not taille or len(sélection) <= taille:
+        return sélection
+    score = SCORES_FRONTIÈRE[contexte.score_frontière]
+    valeurs = score(candidats['coords'][sélection], point1, point2, heure, reste, contexte)
+    return sélection[np.sort(np.argpartition(valeurs, taille - 1)[:taille])]
+
+def rayon_adapté(rayon, taille, contexte):
+    """
+    Rayon d'élimination de l'itération suivante pour ramener la frontière (taille points) vers
+    contexte.taille_cible_frontière : à longueur de frontière égale, le nombre de points varie comme 1 / rayon.
+    Le rayon change au plus d'un facteur 2 par itération et reste à moins d'un facteur 10 de contexte.rayon_elemination.
+    """
+    facteur = np.clip(taille / contexte.taille_cible_frontière, 0.5, 2)
+    return float(np.clip(rayon * facteur, contexte.rayon_elemination / 10, contexte.rayon_elemination * 10))
+
+def noeud_le_plus_proche(arbre, frontière, candidats, enfants, point, iteration, heure):
+    # Le candidat le plus proche de point (fils ou parent) est ajouté à l'arbre s'il n'y est pas déjà
+    coords = candidats['coords']
+    proche = np.argmin(distance_2_points_vect(coords[:, 0], coords[:, 1], *point))
+    return int(insérer_candidats(arbre, candidats, [proche], frontière, enfants, iteration, heure)[0])
+
+def branches_directes(lats, lons, lats2, lons2, heures, contexte=None):
+    """
+    Branches en ligne droite de (lats, lons) à (lats2, lons2), parties à heures, avec le vent au point de départ
+    à l'échéance de son heure : durée (h, infinie si le cap est dans la zone morte de la polaire ou si la branche
+    coupe une zone interdite active), cap, vent et vitesse du bateau (sans le courant).
+    """
+    environnement = (contexte or rctx.contexte_modules()).environnement
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    échéances = np.floor(np.broadcast_to(heures, lats.shape))
+    v_vent, d_vent = np.empty(len(lats)), np.empty(len(lats))
+    for échéance in np.unique(échéances):
+        même = échéances == échéance
+        v_vent[même], d_vent[même] = environnement.vent_aux_positions(lats[même], lons[même], int(échéance))
+    caps = calculer_cap_vect(lats, lons, lats2, lons2)
+    twa = np.abs((d_vent - caps + 180) % 360 - 180)
+    v_bateau = environnement.polaire.vitesse(v_vent, twa)
+    distances = distance_2_points_vect(lats, lons, lats2, lons2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        durées = np.where(distances == 0, 0.0, np.where(v_bateau > 0, distances / v_bateau, np.inf))
+    if environnement.zones is not None:
+        durées[environnement.zones.coupés(lats, lons, lats2, lons2, heures, heures + durées)] = np.inf
+    return {'durée': durées, 'cap': caps, 'v_vent': v_vent, 'd_vent': d_vent, 'twa': twa, 'v_bateau': v_bateau}
+
+def entrée_cercle(lat1, lon1, lat2, lon2, centre, rayon):
+    """
+    Fraction (entre 0 et 1) de chaque segment (lat1, lon1) -> (lat2, lon2) à laquelle il entre dans le cercle
+    de rayon NM autour de centre (0 si le segment part de l'intérieur), NaN s'il n'y entre pas.
+    Calcul en coordonnées planes locales (NM), précis pour des segments courts.
+    """
+    cos_lat = math.cos(math.radians(centre[0]))
+    x1, y1 = (lon1 - centre[1]) * cos_lat * 60, (lat1 - centre[0]) * 60
+    dx, dy = (lon2 - lon1) * cos_lat * 60, (lat2 - lat1) * 60
+    a = dx**2 + dy**2
+    b = 2 * (x1 * dx + y1 * dy)
+    c = x1**2 + y1**2 - rayon**2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = (-b - np.sqrt(b**2 - 4 * a * c)) / (2 * a)
+    fraction = np.where(c <= 0, 0.0, fraction)
+    return np.where((fraction >= 0) & (fraction <= 1), fraction, np.nan)
+
+def noeud_arrivée(arbre, frontière, candidats, enfants, point, iteration, heure, pas, dernière, contexte=None):
+    """
+    Nœud d'arrivée de la dernière itération d'une étape (de heure à heure + pas), à une heure qui n'est pas
+    arrondie au pas temporel :
+        dernière étape : premier point où une branche parent -> fils entre dans le cercle d'arrivée
+            (contexte.tolerance_arrivée NM autour de point), à l'heure de ce point sur la branche
+        étape intermédiaire : le point de passage lui-même, rejoint en ligne droite depuis le parent ou le fils
+            qui l'atteint le plus tôt
+    Sans contexte.arrivée_interpolée (ou si aucune arrivée n'est trouvée) : noeud_le_plus_proche, à heure + pas.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    frontière = np.asarray(frontière)
+    colonnes = ('cap', 'v_vent', 'd_vent', 'twa', 'v_bateau')
+    if contexte.arrivée_interpolée and len(enfants['lat']):
+        idx = enfants['parent']
+        lats_parents, lons_parents = arbre.lat[frontière], arbre.lon[frontière]
+        if dernière:
+            fractions = entrée_cercle(lats_parents[idx], lons_parents[idx], enfants['lat'], enfants['lon'],
+                                      point, contexte.tolerance_arrivée)
+            if np.isfinite(fractions).any():
+                j = int(np.nanargmin(fractions))
+                s = fractions[j]
+                lat = lats_parents[idx[j]] + s * (enfants['lat'][j] - lats_parents[idx[j]])
+                lon = lons_parents[idx[j]] + s * (enfants['lon'][j] - lons_parents[idx[j]])
+                return int(arbre.ajouter(lat, lon, frontière[idx[j]], iteration, heure=heure + s * pas,
+                                         **{nom: enfants[nom][j] for nom in colonnes})[0])
+        else:
+            # Ligne droite vers le point de passage depuis les parents (à heure) et depuis les fils (à heure + pas)
+            lats = np.concatenate((lats_parents, enfants['lat']))
+            lons = np.concatenate((lons_parents, enfants['lon']))
+            départs = np.concatenate((np.full(len(frontière), heure), np.full(len(enfants['lat']), heure + pas)))
+            branches = branches_directes(lats, lons, point[0], point[1], départs, contexte)
+            arrivées = départs + branches['durée']
+            if contexte.land_contact:
+                arrivées[masqué_par_terre(point, lats, lons, contexte=contexte)] = np.inf
+            if np.isfinite(arrivées).any():
+                k = int(np.argmin(arrivées))
+                if k < len(frontière):
+                    parent = frontière[k]
+                else:
+                    j = k - len(frontière)
+                    parent = int(arbre.ajouter(enfants['lat'][j], enfants['lon'][j], frontière[idx[j]], iteration,
+                                               heure=heure + pas, **{nom: enfants[nom][j] for nom in colonnes})[0])
+                return int(arbre.ajouter(point[0], point[1], parent, iteration, heure=arrivées[k],
+                                         **{nom: branches[nom][k] for nom in colonnes})[0])
+    return noeud_le_plus_proche(arbre, frontière, candidats, enfants, point, iteration, heure + pas)
+
+def variation_vent(lats, lons, point_cible, heure, pas, contexte=None):
+    """
+    Variation relative maximale du vent (vecteur) sur la frontière entre le début et la fin d'un pas,
+    au point atteint en allant vers la cible à la vitesse max de la polaire : variation dans le temps et dans l'espace.
+    """
+    environnement = (contexte or rctx.contexte_modules()).environnement
+    caps = calculer_cap_vect(lats, lons, *point_cible)
+    lats2, lons2 = projection_vect(lats, lons, caps, environnement.polaire.vitesse_max * pas)
+
+    v1, d1 = environnement.vent_aux_positions(lats, lons, math.floor(heure))
+    v2, d2 = environnement.vent_aux_positions(lats2, lons2, math.floor(heure + pas))
+    d1, d2 = np.radians(d1), np.radians(d2)
+    écart = np.hypot(v2 * np.sin(d2) - v1 * np.sin(d1), v2 * np.cos(d2) - v1 * np.cos(d1))
+    return float(np.max(écart / np.maximum(v1, 1)))
+
+def pas_adaptatif(lats, lons, point_cible, heure, contexte=None):
+    """
+    Pas temporel de la prochaine itération. contexte.pas_temporel est le pas minimal ; il est doublé tant que
+    (pour toute la frontière) la distance parcourue à la vitesse max reste sous la moitié de la distance
+    à la cible et sous la distance à la terre, et que le vent varie de moins de contexte.variation_vent_max.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    environnement = contexte.environnement
+    pas = contexte.pas_temporel
+    if not contexte.pas_adaptatif:
+        return pas
+
+    distance_cible = distance_2_points_vect(lats, lons, *point_cible).min()
+    distance_terre = environnement.distance_terre(lats, lons).min() if contexte.land_contact else np.inf
+
+    while pas * 2 <= contexte.pas_temporel_max:
+        avance = environnement.polaire.vitesse_max * pas * 2
+        if avance > distance_cible / 2 or avance > distance_terre:
+            break
+        if variation_vent(lats, lons, point_cible, heure, pas * 2, contexte) > contexte.variation_vent_max:
+            break
+        pas *= 2
+    return pas
+
+def frontière_arrivée(arbre, frontière, point, tolérance):
+    # Condition d'arrêt : un point de la frontière est à moins de tolérance du point visé
+    return bool((distance_2_points_vect(arbre.lat[frontière], arbre.lon[frontière], *point) <= tolérance).any())
+
+def arrivée_atteinte(arbre, parents, frontière, enfants, point, tolérance):
+    """
+    Condition d'arrêt d'une étape : un point de la frontière est dans le cercle d'arrivée, ou une branche
+    parent -> fils de la dernière itération y entre. Avec un grand pas temporel, les fils peuvent passer
+    au-delà du cercle sans qu'aucun point de la frontière n'y soit.
+    """
+    if frontière_arrivée(arbre, frontière, point, tolérance):
+        return True
+    if len(enfants['lat']) == 0:
+        return False
+    idx = enfants['parent']
+    fractions = entrée_cercle(arbre.lat[parents][idx], arbre.lon[parents][idx], enfants['lat'], enfants['lon'], point, tolérance)
+    return bool(np.isfinite(fractions).any())
+
+def vérifier_itérations(iteration, iteration_départ, point, contexte):
+    # Garde-fou : une étape qui n'atteint pas son point de passage s'arrête au bout de contexte.itérations_max_étape
+    if iteration - iteration_départ > contexte.itérations_max_étape:
+        raise ÉtapeImpossible(f"Point {point} non atteint après {contexte.itérations_max_étape} itérations")
+
+# Paramètres dont dépend le résultat d'une étape (clé du cache des étapes)
+PARAMÈTRES_ÉTAPE = ('pas_temporel', 'pas_adaptatif', 'pas_temporel_max', 'variation_vent_max', 'élagage_borne', 'eta_max',
+                    'élagage_heuristique', 'marge_élagage', 'délai_élagage', 'pas_angle', 'éventail_adaptatif', 'nb_angles_éventail', 'pas_angle_fin',
+                    'tolerance', 'rayon_elemination', 'elagage_avant_enveloppe', 'extraction_frontière', 'nb_secteurs',
+                    'origine_secteurs', 'tolerance_arrivée', 'land_contact', 'courant', 'cadre_navigation',
+                    'rayon_adaptatif', 'taille_cible_frontière', 'taille_max_frontière', 'score_frontière',
+                    'temps_restant', 'résolution_temps_restant', 'noeuds_temps_restant', 'facteur_temps_restant',
+                    'arrivée_interpolée')
+
+def empreinte_données():
+    """
+    Empreinte (sha256) du vent, de la polaire et du masque terre/mer chargés. Elle n'est recalculée
+    que si l'un de ces tableaux a été remplacé (nouveau GRIB, nouvelle polaire, ...).
+    """
+    return rctx.Environnement.depuis_modules().empreinte()
+
+class CacheÉtapes:
+    """
+    Résultats des étapes déjà calculées (route d'un point de passage au suivant), du plus ancien au plus récent.
+    Une étape est identifiée par son départ (position et heure), sa cible, la distance du parcours restant
+    après la cible (avec l'élagage par borne), les données chargées, les paramètres du routage et les filtres
+    des fils : en déplaçant le point de passage k, les étapes avant k-1 sont relues et seules les suivantes
+    sont recalculées. Le cache peut être partagé par des routages lancés en même temps (threads).
+    """
+
+    def __init__(self, taille_max=64):
+        self.taille_max = taille_max
+        self.étapes = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def __len__(self):
+        return len(self.étapes)
+
+    def clé(self, départ, heure, cible, reste, contexte=None):
+        # Le parcours après la cible ne change l'étape qu'à travers l'élagage par borne
+        contexte = contexte or rctx.contexte_modules()
+        paramètres = tuple(getattr(contexte, nom) for nom in PARAMÈTRES_ÉTAPE)
+        reste = round(reste, 6) if contexte.élagage_borne else None
+        return (round(départ[0], 9), round(départ[1], 9), round(float(heure), 9), round(cible[0], 9), round(cible[1], 9),
+                reste, contexte.environnement.empreinte(), paramètres, tuple(contexte.filtres_fils))
+
+    def lire(self, clé):
+        with self.verrou:
+            étape = self.étapes.get(clé)
+            if étape is not None:
+                self.étapes.move_to_end(clé)
+            return étape
+
+    def enregistrer(self, clé, étape):
+        with self.verrou:
+            self.étapes[clé] = étape
+            self.étapes.move_to_end(clé)
+            while len(self.étapes) > self.taille_max:
+                self.étapes.popitem(last=False)
+
+    def vider(self):
+        with self.verrou:
+            self.étapes.clear()
+
+class RoutageInterrompu(Exception):
+    """Routage arrêté par son jeton d'arrêt (échéance dépassée ou arrêt demandé par l'interface)."""
+
+class ÉtapeImpossible(Exception):
+    """Étape qui ne peut pas atteindre son point de passage (nombre max d'itérations dépassé, frontière bloquée)."""
+
+class JetonArrêt:
+    """
+    Arrêt coopératif d'un routage : la boucle des isochrones le vérifie avant chaque itération.
+    délai : temps de calcul (secondes) après lequel le routage s'arrête, None pour ne pas limiter
+    L'interface (Tk, Streamlit) garde le jeton et appelle arrêter() depuis un autre thread.
+    """
+
+    def __init__(self, délai=None):
+        self.demande = threading.Event()
+        self.échéance = None
+        if délai is not None:
+            self.limiter(délai)
+
+    def limiter(self, délai):
+        # Échéance à délai secondes de maintenant
+        self.échéance = time.monotonic() + délai
+
+    def arrêter(self):
+        self.demande.set()
+
+    def arrêté(self):
+        return self.demande.is_set() or (self.échéance is not None and time.monotonic() >= self.échéance)
+
+    def vérifier(self):
+        if self.arrêté():
+            raise RoutageInterrompu("Routage interrompu : échéance dépassée ou arrêt demandé")
+
+    def restant(self):
+        # Temps (secondes) avant l'échéance, None sans échéance
+        return None if self.échéance is None else max(self.échéance - time.monotonic(), 0.0)
+
+    def sous_jeton(self, délai):
+        # Jeton arrêté avec celui-ci (même demande d'arrêt) ou délai secondes après maintenant si c'est plus tôt
+        jeton = JetonArrêt(délai)
+        jeton.demande = self.demande
+        if self.échéance is not None:
+            jeton.échéance = min(jeton.échéance, self.échéance)
+        return jeton
+
+def extraire_étape(arbre, départ, arrivée):
+    # Colonnes des nœuds de la route entre départ (exclu) et arrivée, itérations comptées depuis le départ
+    chemin = arbre.chemin(arrivée)
+    chemin = chemin[np.flatnonzero(chemin == départ)[0] + 1:]
+    étape = arbre.colonnes(chemin)
+    étape['iteration'] = étape['iteration'] - arbre.données['iteration'][départ]
+    return étape
+
+def insérer_étape(arbre, départ, étape):
+    # Ajoute une étape gardée en cache à la suite du nœud départ et renvoie le nœud d'arrivée
+    n = len(étape['lat'])
+    if n == 0:
+        return départ
+    parents = np.concatenate(([départ], len(arbre) + np.arange(n - 1)))
+    colonnes = {nom: étape[nom] for nom in ('heure', 'cap', 'v_vent', 'd_vent', 'twa', 'v_bateau')}
+    indices = arbre.ajouter(étape['lat'], étape['lon'], parents, étape['iteration'] + arbre.données['iteration'][départ], **colonnes)
+    return int(indices[-1])
+
+def router_étape(arbre, départ, point2, reste, pool=None, affichage=None, sauvegarde=None, reprise=None, contexte=None,
+                 arrêt=None):
+    """
+    Routage d'une étape : isochrones depuis le nœud départ de l'arbre (à son heure) jusqu'à point2.
+    reste : distance du parcours après point2, pour l'élagage par borne (0 pour la dernière étape)
+    affichage : fonction (arbre, frontière, point2, heure) appelée après chaque itération
+    sauvegarde : fonction (arbre, état) appelée avant chaque itération avec l'état de l'étape
+        {'départ', 'frontière', 'heure', 'heure_départ', 'iteration', 'rayon'}
+    reprise : état d'une sauvegarde, pour continuer l'étape là où elle s'est arrêtée
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    arrêt : JetonArrêt vérifié avant chaque itération (RoutageInterrompu si le routage doit s'arrêter)
+    Renvoie le nœud d'arrivée de la dernière itération (noeud_arrivée).
+    """
+    contexte = contexte or rctx.contexte_modules()
+    point1 = arbre.point(départ)
+    if reprise is None:
+        heure = heure_départ = float(arbre.heure[départ])
+        iteration = int(arbre.iteration[départ])
+        frontière = np.array([départ])
+        rayon = contexte.rayon_elemination
+    else:
+        heure, heure_départ = float(reprise['heure']), float(reprise['heure_départ'])
+        iteration = int(reprise['iteration'])
+        frontière = np.asarray(reprise['frontière'])
+        rayon = float(reprise.get('rayon', contexte.rayon_elemination))
+
+    while True:
+        if arrêt is not None:
+            arrêt.vérifier()
+        if sauvegarde is not None:
+            sauvegarde(arbre, {'départ': départ, 'frontière': frontière, 'heure': heure,
+                               'heure_départ': heure_départ, 'iteration': iteration, 'rayon': rayon})
+
+        if contexte.print_données:
+            print(f"Iteration {iteration}:")
+            print('Heure ', heure)
+
+        parents = frontière
+        iteration += 1
+        vérifier_itérations(iteration, int(arbre.iteration[départ]), point2, contexte)
+        pas = pas_adaptatif(arbre.lat[parents], arbre.lon[parents], point2, heure, contexte)
+        if contexte.print_données:
+            print('Pas temporel ', pas)
+        eta = eta_référence(arbre.lat[parents], arbre.lon[parents], point1, point2, reste, heure_départ, heure, contexte) if contexte.élagage_borne else np.inf
+        frontière, candidats, enfants = étape_isochrone(arbre, parents, point1, point2, heure, pas, iteration, pool, eta, reste, contexte,
+                                                        rayon)
+        heure += pas
+        if contexte.rayon_adaptatif:
+            rayon = rayon_adapté(rayon, len(frontière), contexte)
+        print()
+
+        if affichage is not None:
+            affichage(arbre, frontière, point2, heure)
+
+        if contexte.print_données:
+            print("le nombre de points est : ", len(frontière))
+
+        if arrivée_atteinte(arbre, parents, frontière, enfants, point2, contexte.tolerance_arrivée): # Condiction d'arrêt de l'étape
+            # Arrivée interpolée dans la dernière itération (reste nul : dernière étape du parcours)
+            return noeud_arrivée(arbre, parents, candidats, enfants, point2, iteration, heure - pas, pas, reste == 0, contexte)
+
+def router_étapes(points, arbre, pool=None, affichage=None, cache=None, heure=None, sauvegarde=None, reprise=None, contexte=None,
+                  arrêt=None):
+    """
+    Routage entre les points de passage, une étape après l'autre (sans récursion) dans le même arbre :
+    chaque étape part du nœud d'arrivée de la précédente. Les étapes déjà calculées sont relues dans cache.
+    heure : heure de départ (heure_début du contexte par défaut)
+    sauvegarde : fonction (arbre, état) appelée avant chaque itération, état complété par 'étape' et 'points'
+    reprise : état d'une sauvegarde (l'arbre est celui de la sauvegarde) : le routage reprend à cette itération
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    arrêt : JetonArrêt vérifié avant chaque itération
+    Renvoie le nœud d'arrivée au dernier point ; la route complète est arbre.chemin(noeud).
+    """
+    contexte = contexte or rctx.contexte_modules()
+    if reprise is None:
+        noeud, début = arbre.ajouter_racine(points[0], heure=contexte.heure_début if heure is None else heure), 1
+    else:
+        noeud, début = int(reprise['départ']), int(reprise['étape'])
+
+    for k in range(début, len(points)):
+        reste = distance_parcours(points[k:])
+        reprise_étape = reprise if k == début else None
+        sauvegarde_étape = None
+        if sauvegarde is not None:
+            sauvegarde_étape = lambda arbre, état, k=k: sauvegarde(arbre, {**état, 'étape': k, 'points': points})
+
+        clé = cache.clé(arbre.point(noeud), arbre.heure[noeud], points[k], reste, contexte) if cache is not None else None
+        étape = cache.lire(clé) if cache is not None and reprise_étape is None else None
+
+        if étape is not None:
+            noeud = insérer_étape(arbre, noeud, étape)
+            if contexte.print_données:
+                print(f"Étape {k} relue dans le cache ({len(étape['lat'])} nœuds)")
+            if affichage is not None:
+                affichage(arbre, np.array([noeud]), points[k], float(arbre.heure[noeud]))
+        else:
+            départ = noeud
+            noeud = router_étape(arbre, départ, points[k], reste, pool, affichage, sauvegarde_étape, reprise_étape, contexte, arrêt)
+            if cache is not None:
+                cache.enregistrer(clé, extraire_étape(arbre, départ, noeud))
+
+        if k < len(points) - 1:
+            print(f"Le point le plus proche de la position intermédiaire est : {arbre.point(noeud)}")
+
+    return noeud
+
+def router_progressif(points, facteurs, pool=None, affichage=None, cache=None, sauvegarde=None, arrêt=None, contexte=None):
+    """
+    Routage par niveaux de plus en plus fins : pas temporel, pas d'angle et rayon d'élimination du contexte
+    multipliés par chacun des facteurs (du plus grossier au plus fin). Chaque niveau après le premier est limité
+    au corridor (contexte.largeur_corridor) autour de la meilleure route trouvée si contexte.corridor_progressif.
+    Avec une échéance, chaque niveau sauf le dernier n'a qu'une part du temps restant (le temps restant divisé
+    par le nombre de niveaux restants) : un niveau qui n'a pas fini à temps (ou dont une étape est impossible)
+    est abandonné et le niveau suivant est essayé.
+    Avec contexte.élagage_borne, l'arrivée de la meilleure route déjà trouvée borne l'élagage des niveaux suivants (eta_max).
+    Quand arrêt interrompt le routage, la meilleure route complète déjà trouvée est gardée ; sans route complète,
+    la route partielle va jusqu'au nœud le plus proche du dernier point.
+    Renvoie (arbre, noeud, complète) : la route est arbre.chemin(noeud), complète est faux pour une route partielle.
+    """
+    contexte = contexte or rctx.contexte_modules()
+    meilleur = partielle = None
+    for k, facteur in enumerate(facteurs):
+        dernier = k == len(facteurs) - 1
+        filtres = list(contexte.filtres_fils)
+        if meilleur is not None and contexte.corridor_progressif:
+            import Routage_corridor as rcor
+            chemin = meilleur[0].chemin(meilleur[1])
+            filtres.append(rcor.FiltreCorridor(meilleur[0].lat[chemin], meilleur[0].lon[chemin], contexte.largeur_corridor))
+        if facteur == 1 and meilleur is None:
+            niveau = contexte
+        else:
+            paramètres = {**contexte.paramètres, 'pas_temporel': contexte.pas_temporel * facteur,
+                          'pas_angle': max(int(contexte.pas_angle * facteur), 1),
+                          'rayon_elemination': contexte.rayon_elemination * facteur}
+            if meilleur is not None and contexte.élagage_borne:
+                # Arrivée atteinte : aucune route qui ne peut pas la battre n'est à garder
+                arrivée = float(meilleur[0].heure[meilleur[1]])
+                paramètres['eta_max'] = arrivée if contexte.eta_max is None else min(contexte.eta_max, arrivée)
+            niveau = rctx.ContexteRoutage(contexte.environnement, filtres, **paramètres)
+        jeton = arrêt
+        restant = arrêt.restant() if arrêt is not None else None
+        if restant is not None and not dernier:
+            jeton = arrêt.sous_jeton(restant / (len(facteurs) - k))
+        arbre = ra.ArbreIsochrones()
+        try:
+            noeud = router_étapes(points, arbre, pool, affichage, cache, sauvegarde=sauvegarde if dernier else None,
+                                  contexte=niveau, arrêt=jeton)
+        except (RoutageInterrompu, ÉtapeImpossible) as erreur:
+            if isinstance(erreur, ÉtapeImpossible) and dernier and meilleur is None:
+                raise
+            if contexte.print_données:
+                print(f"Niveau {k + 1}/{len(facteurs)} (pas temporel {niveau.pas_temporel}) abandonné : {erreur}")
+            # Route partielle jusqu'au nœud le plus proche du dernier point, la plus proche de tous les niveaux
+            distances = distance_2_points_vect(arbre.lat, arbre.lon, *points[-1])
+            proche = int(np.argmin(distances))
+            if partielle is None or distances[proche] < partielle[2]:
+                partielle = (arbre, proche, float(distances[proche]))
+            if arrêt is not None and arrêt.arrêté():
+                break
+            continue
+
+        if contexte.print_données:
+            print(f"Niveau {k + 1}/{len(facteurs)} (pas temporel {niveau.pas_temporel}) : "
+                  f"arrivée à {round(float(arbre.heure[noeud]), 2)}")
+        if meilleur is None or arbre.heure[noeud] <= meilleur[0].heure[meilleur[1]]:
+            meilleur = (arbre, noeud)
+    if meilleur is None:
+        return partielle[0], partielle[1], False
+    return meilleur[0], meilleur[1], True
+
+def préparer_arrêt(délai, arrêt, contexte):
+    # Jeton d'arrêt avec l'échéance du délai, et facteurs des niveaux du routage (progressif seulement avec un délai)
+    délai = contexte.délai_routage if délai is None else délai
+    if délai is None:
+        return arrêt, (1,)
+    arrêt = arrêt or JetonArrêt()
+    arrêt.limiter(délai)
+    return arrêt, contexte.facteurs_progressifs
+
+def router_itere(points, affichage, délai, arrêt, contexte):
+    """
+    Routage de itere_jusqua_dans_enveloppe et de sa variante Tk : relu dans le cache des résultats s'il y est,
+    sinon calculé (router_progressif) puis mis en cache s'il est complet et n'est pas limité par un délai.
+    Renvoie (arbre, noeud, complète) comme router_progressif.
+    """
+    arrêt, facteurs = préparer_arrêt(délai, arrêt, contexte)
+    résultats = rcache.CacheRésultats.depuis_contexte(contexte) if contexte.cache_résultats else None
+    clé = résultats.clé(points, contexte) if résultats is not None else None
+    lu = résultats.lire(clé) if clé is not None else None
+    if lu is not None:
+        if contexte.print_données:
+            print(f"Routage relu dans le cache des résultats ({len(lu[0])} nœuds)")
+        return (*lu, True)
+
+    # Pool de processus conservé pendant tout le routage (toutes les étapes)
+    pool = rpar.PoolExpansion(contexte.nb_processus, contexte=contexte) if contexte.expansion_parallèle else None
+    sauvegarde = rsauv.Sauvegarde() if contexte.sauvegarde_routage else None
+    terminé = False
+    try:
+        arbre, noeud, terminé = router_progressif(points, facteurs, pool, affichage, cache_étapes if contexte.cache_étapes else None,
+                                                  sauvegarde, arrêt, contexte)
+    finally:
+        if sauvegarde is not None:
+            sauvegarde.fermer(supprimer=terminé)
+        if pool is not None:
+            pool.fermer()
+
+    # Le résultat d'un routage progressif dépend du temps de calcul : seuls les routages complets sans délai sont gardés
+    if clé is not None and terminé and tuple(facteurs) == (1,):
+        résultats.enregistrer(clé, arbre, noeud)
+    return arbre, noeud, terminé
+
+def itere_jusqua_dans_enveloppe(points, contexte=None, délai=None, arrêt=None):
+    """
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    délai : temps de calcul max en secondes (contexte.délai_routage par défaut). Avec un délai, le routage est
+        progressif (router_progressif, facteurs contexte.facteurs_progressifs) et renvoie la meilleure route
+        trouvée à l'échéance.
+    arrêt : JetonArrêt de l'interface pour arrêter le routage ; la meilleure route trouvée est renvoyée
+    """
+    contexte = contexte or rctx.contexte_modules()
+
+    if contexte.live: # Préparation du plot (tracé terrestre, couleurs, dimensions, ...)
         fig, ax = plt.subplots(figsize=(20, 16), subplot_kw={'projection': ccrs.PlateCarree()})
         # fig, ax = plt.subplots(figsize=(20, 16), subplot_kw={'projection': ccrs.Mollweide()})
 
-        ax.set_extent(p.loc_nav, crs=ccrs.PlateCarree())
+        ax.set_extent(contexte.loc_nav, crs=ccrs.PlateCarree())
         ax.add_feature(cfeature.COASTLINE.with_scale('10m'), linewidth=1)
         ax.add_feature(cfeature.BORDERS.with_scale('10m'), linestyle=':')
         ax.add_feature(cfeature.LAND, facecolor='lightgray')
@@ -390,248 +1251,82 @@ def itere_jusqua_dans_enveloppe(points):
         plt.grid(True)
         # plt.legend()
         plt.tight_layout()
-        
-    def itération(point1, point2, heure, parent_map ,points = points, route = []):
-        
-        positions = [point1]
-        iter_count = 0
-        
-        while True:
-            if p.print_données:  
-                print(f"Iteration {iter_count}:")
-                print('Heure ', heure)
-
-            liste_parents_enfants = prochains_points_liste_parent_enfants(positions, point2, p.pas_temporel, p.pas_angle, math.floor(heure), filtrer_par_distance=True)
-            heure += p.pas_temporel
-            print()
-            points_aplatis = applatissement_liste(liste_parents_enfants) # Applitessement de la liste de listes pour appliquer la fonction enveloppe_concave
-                       
-            enveloppe_concave = envconc.enveloppe_concave(np.array((points_aplatis)))
-            
-            if not p.land_contact: # Je choisie un type d'enveloppe différent en fonction de si le contact terrestre est activé
-                (p1, p2) = farthest_pair(enveloppe_concave)
-
-                n1 = enveloppe_concave.index(p1)
-                n2 = enveloppe_concave.index(p2)
-                if n1 > n2:
-                    n1, n2 = n2, n1
-                enveloppe_concave1 = enveloppe_concave[n1:n2+1]
-                enveloppe_concave2 = enveloppe_concave[n2:] + enveloppe_concave[:n1+1]
-                m1 = 1/len(enveloppe_concave1) * sum(distance_2_points(enveloppe_concave1[i], point2) for i in range(len(enveloppe_concave1)))
-                m2 = 1/len(enveloppe_concave2) * sum(distance_2_points(enveloppe_concave2[i], point2) for i in range(len(enveloppe_concave2)))
-                
-                if m1 <= m2:
-                    enveloppe_concave = enveloppe_concave1
-                else:
-                    enveloppe_concave = enveloppe_concave2
-            
-            enveloppe_concave = elaguer_enveloppe(enveloppe_concave, p.rayon_elemination)
-                        
-            if p.print_données:
-                print("Nombre de points dans enveloppe_concave:", len(enveloppe_concave), len(points_aplatis))
-
-            # On attribut à chaque point son parent pour pouvoir remonter l'arbre formé et déterminer les points de la route idéale
-            for parent, enfants in liste_parents_enfants:
-                for enfant in enfants:
-                    if enfant not in parent_map:
-                        parent_map[enfant] = parent
-
-            if p.live: # Affichage live
-                plot_points_live(ax, enveloppe_concave, parent_map, point1, point2, route, step_index=heure, loc=p.loc_nav)
-                if p.enregistrement_live:
-                    plot_filename = f"{"route_ideale"}/route_ideale_vent_heure_{heure}.png"
-                    plt.savefig(plot_filename)
-                    print(f"Plot enregistré sous : {plot_filename}")  
-                      
-            positions = enveloppe_concave
-            
-            if p.print_données:
-                print("le nombre de points est : ", len(positions))
-            
-            if dist_bateau_point(positions, point2, p.tolerance_arrivée): # Condiction d'arrêt de routage
-                last_point = points.pop(0)
-                
-                if len(points) == 0:
-                    print("La position finale est maintenant dans l'enveloppe concave.")
-                    
-                    # Détermination du point le plus proche de la position finale
-                    closest_point = min(points_aplatis, key=lambda point: distance_2_points(point, last_point))
-                    print(f"Le point le plus proche de la position finale est : {closest_point}")
-                    
-                    # Tracer le chemin idéal en remontant les relations parent-enfant
-                    chemin_ideal = []
-                    current_point = closest_point
-                    while current_point is not None:
-                        chemin_ideal.append(current_point)
-                        current_point = parent_map[current_point]
-                    
-                    chemin_ideal.reverse()  # Inverser pour avoir le chemin de l'origine à la destination
-                    chemin_ideal = route + chemin_ideal
-                    if chemin_ideal:
-                        chemin_lat, chemin_lon = zip(*chemin_ideal)
-                    else:
-                        print("⚠️ Aucun chemin trouvé, retour d'une liste vide.")
-                        chemin_lat, chemin_lon = [], []
-
-                    chemin_lat, chemin_lon = zip(*chemin_ideal)
-                    if p.data_route:
-                        with open("Informations_route.txt", "w") as fichier:
-                            n = len(chemin_lon)
-                            for i in range(n-1):
-                                horaire = p.heure_début + i*p.pas_temporel
-                                val_vent = rv.get_wind_at_position(chemin_lat[i], chemin_lon[i], horaire) 
-                                fichier.write(f"Heure: {horaire}\n")
-                                fichier.write(f"Position : {chemin_lat[i], chemin_lon[i]}\n")
-                                cap = calculer_cap(chemin_lat[i], chemin_lon[i], chemin_lat[i+1], chemin_lon[i+1])
-                                fichier.write(f"Prediction de vent a la position {val_vent[1]} degre pour {val_vent[0]} knd\n")
-                                fichier.write(f"Cap : {round(cap, 2)}\n")
-                                fichier.write(f"Vitesse : {round(recup_vitesse_fast(polaire(val_vent[0]), val_vent[1] - cap), 2)}\n")
-                                fichier.write("-----------------------------------------------------------\n")
-                            
-                    if not p.live: #and not p.streamlit:
-                        rv.plot_grib(heure = [heure], route={'lon': chemin_lon, 'lat': chemin_lat})
-
-                    if p.live:      
-                    #     plt.plot(chemin_lon, chemin_lat, color="black", linestyle='-', linewidth=2, label='Chemin Idéal')
-                    #     plt.scatter(chemin_lon, chemin_lat, color='black', s=50)
-                        plt.show()
-                    break
 
-                else:
-                    if points:
-                        closest_point = min(points_aplatis, key=lambda point: distance_2_points(point, last_point))
-                        print(f"Le point le plus proche de la position intermédiaire est : {closest_point}")
-                        
-                        # Tracer le chemin idéal en remontant les relations parent-enfant
-                        chemin_ideal = []
-                        current_point = closest_point
-                        while current_point is not None:
-                            chemin_ideal.append(current_point)
-                            current_point = parent_map[current_point]
-                        
-                        chemin_ideal.reverse()
-                        route = route + chemin_ideal
-                        iter_count += 1
-                        itération(closest_point, points[0], heure, {closest_point: None}, copy(points), route)
-                    else:
-                        print("🎯 Destination atteinte. Fin du routage.")
-                    
-                break
-        
-        if p.enregistrement:
-            lien_dossier = "route_ideale" 
-            rv.enregistrement_route(chemin_lon, chemin_lat, p.pas_temporel, output_dir=lien_dossier)
-        
-        return {'lon': chemin_lon, 'lat': chemin_lat}
-    
-    point_départ = points.pop(0)
-    point_suivant = points[0]
-    dict_chemin = itération(point_départ, point_suivant, p.heure_début, {point_départ: None}, points, route = [])
-    return dict_chemin
+    def affichage(arbre, frontière, point2, heure): # Affichage live
+        plot_points_live(ax, arbre, frontière, point2, step_index=heure, loc=contexte.loc_nav, points=points, contexte=contexte)
+        if contexte.enregistrement_live:
+            plot_filename = f"{"route_ideale"}/route_ideale_vent_heure_{heure}.png"
+            plt.savefig(plot_filename)
+            print(f"Plot enregistré sous : {plot_filename}")
 
-def itere_jusqua_dans_enveloppe_tk(points, ax, canvas):
-    """Effectue le routage et affiche en temps réel dans la fenêtre Tkinter"""
-    
-    def itération(point1, point2, heure, parent_map, points=points, route=[]):
-        
-        positions = [point1]
-        iter_count = 0
-        
-        while True:
-            if p.print_données:  
-                print(f"Iteration {iter_count}:")
-                print('Heure ', heure)
-
-            liste_parents_enfants = prochains_points_liste_parent_enfants(positions, point2, p.pas_temporel, p.pas_angle, math.floor(heure), filtrer_par_distance=True)
-            heure += p.pas_temporel
-            points_aplatis = applatissement_liste(liste_parents_enfants)
-            
-            enveloppe_concave = envconc.enveloppe_concave(np.array((points_aplatis)))
-            if not p.land_contact:
-                (p1, p2) = farthest_pair(enveloppe_concave)
-
-                n1 = enveloppe_concave.index(p1)
-                n2 = enveloppe_concave.index(p2)
-                if n1 > n2:
-                    n1, n2 = n2, n1
-                enveloppe_concave1 = enveloppe_concave[n1:n2+1]
-                enveloppe_concave2 = enveloppe_concave[n2:] + enveloppe_concave[:n1+1]
-                m1 = 1/len(enveloppe_concave1) * sum(distance_2_points(enveloppe_concave1[i], point2) for i in range(len(enveloppe_concave1)))
-                m2 = 1/len(enveloppe_concave2) * sum(distance_2_points(enveloppe_concave2[i], point2) for i in range(len(enveloppe_concave2)))
-                
-                if m1 <= m2:
-                    enveloppe_concave = enveloppe_concave1
-                else:
-                    enveloppe_concave = enveloppe_concave2
-            
-            enveloppe_concave = elaguer_enveloppe(enveloppe_concave, p.rayon_elemination)
-            
-            if p.print_données:
-                print("Nombre de points dans enveloppe_concave:", len(enveloppe_concave), len(points_aplatis))
-
-            for parent, enfants in liste_parents_enfants:
-                for enfant in enfants:
-                    if enfant not in parent_map:
-                        parent_map[enfant] = parent
-            
-            # Mise à jour en temps réel avec Tkinter
-            plot_points_live_tk(ax, canvas, enveloppe_concave, parent_map, point1, point2, route, step_index=heure, loc=p.loc_nav)
-
-            positions = enveloppe_concave
-            if p.print_données:
-                print("le nombre de points est : ", len(positions))
-            
-            if dist_bateau_point(positions, point2, p.tolerance_arrivée):
-                last_point = points.pop(0)
-
-                if len(points) == 0:
-                    print("La position finale est maintenant dans l'enveloppe concave.")
-                    
-                    closest_point = min(points_aplatis, key=lambda point: distance_2_points(point, last_point))
-                    print(f"Le point le plus proche de la position finale est : {closest_point}")
-                    
-                    chemin_ideal = []
-                    current_point = closest_point
-                    while current_point is not None:
-                        chemin_ideal.append(current_point)
-                        current_point = parent_map[current_point]
-                    
-                    chemin_ideal.reverse()
-                    chemin_ideal = route + chemin_ideal
-                    chemin_lat, chemin_lon = zip(*chemin_ideal)
-
-                    if p.data_route:
-                        with open("Informations_route.txt", "w") as fichier:
-                            for i in range(len(chemin_lon) - 1):
-                                horaire = p.heure_début + i * p.pas_temporel
-                                val_vent = rv.get_wind_at_position(chemin_lat[i], chemin_lon[i], horaire) 
-                                fichier.write(f"Heure: {horaire}\n")
-                                fichier.write(f"Position : {chemin_lat[i], chemin_lon[i]}\n")
-                                cap = calculer_cap(chemin_lat[i], chemin_lon[i], chemin_lat[i+1], chemin_lon[i+1])
-                                fichier.write(f"Prediction de vent à {val_vent[1]}° pour {val_vent[0]} knd\n")
-                                fichier.write(f"Cap : {round(cap, 2)}\n")
-                                fichier.write(f"Vitesse : {round(recup_vitesse_fast(polaire(val_vent[0]), val_vent[1] - cap), 2)}\n")
-                                fichier.write("-----------------------------------------------------------\n")
-                            
-                    if p.live:
-                        canvas.draw_idle()  # 🔥 Met à jour l'affichage dans Tkinter
-                    break
+    arbre, noeud, terminé = router_itere(points, affichage if contexte.live else None, délai, arrêt, contexte)
 
-                else:
-                    closest_point = min(points_aplatis, key=lambda point: distance_2_points(point, last_point))
-                    itération(closest_point, points[0], heure, {closest_point: None}, copy(points), route)   
-                break
-        
-        return {'lon': chemin_lon, 'lat': chemin_lat}
-    
-    point_départ = points.pop(0)
-    point_suivant = points[0]
-    dict_chemin = itération(point_départ, point_suivant, p.heure_début, {point_départ: None}, points, route=[])
-    return dict_chemin
+    if terminé:
+        print("La position finale est maintenant dans l'enveloppe concave.")
+    else:
+        print("Routage interrompu avant la première route complète : route partielle.")
+    print(f"Le point le plus proche de la position finale est : {arbre.point(noeud)}")
+
+    # Chemin idéal en remontant les indices de parents dans l'arbre
+    chemin = arbre.chemin(noeud)
+    chemin_lat, chemin_lon = tuple(arbre.lat[chemin].tolist()), tuple(arbre.lon[chemin].tolist())
+    chemin_heure = arbre.heure[chemin].tolist()
+
+    if contexte.data_route:
+        écrire_informations_route(arbre, chemin)
+
+    if not contexte.live: #and not contexte.streamlit:
+        # Vent du contexte : celui sur lequel la route a été calculée (membre d'un ensemble, autre GRIB, ...)
+        rv.plot_grib(heure = [chemin_heure[-1]], route={'lon': chemin_lon, 'lat': chemin_lat}, vent=contexte.environnement.vent)
+
+    if contexte.live:
+        plt.show()
+
+    if contexte.enregistrement:
+        lien_dossier = "route_ideale"
+        rv.enregistrement_route(chemin_lon, chemin_lat, contexte.pas_temporel, output_dir=lien_dossier, heures=chemin_heure)
+
+    return {'lon': chemin_lon, 'lat': chemin_lat, 'complète': terminé}
+
+def itere_jusqua_dans_enveloppe_tk(points, ax, canvas, contexte=None, délai=None, arrêt=None):
+    """Effectue le routage et affiche en temps réel dans la fenêtre Tkinter (délai, arrêt : voir itere_jusqua_dans_enveloppe)"""
+    contexte = contexte or rctx.contexte_modules()
+
+    def affichage(arbre, frontière, point2, heure): # Mise à jour en temps réel avec Tkinter
+        plot_points_live_tk(ax, canvas, arbre, frontière, point2, step_index=heure, loc=contexte.loc_nav, points=points,
+                            contexte=contexte)
+
+    arbre, noeud, terminé = router_itere(points, affichage, délai, arrêt, contexte)
+
+    if terminé:
+        print("La position finale est maintenant dans l'enveloppe concave.")
+    else:
+        print("Routage interrompu avant la première route complète : route partielle.")
+    print(f"Le point le plus proche de la position finale est : {arbre.point(noeud)}")
+
+    chemin = arbre.chemin(noeud)
+    chemin_lat, chemin_lon = tuple(arbre.lat[chemin].tolist()), tuple(arbre.lon[chemin].tolist())
+
+    if contexte.data_route:
+        écrire_informations_route(arbre, chemin)
+
+    if contexte.live:
+        canvas.draw_idle()  # 🔥 Met à jour l'affichage dans Tkinter
+
+    return {'lon': chemin_lon, 'lat': chemin_lat, 'complète': terminé}
 
 #Avant dans la fonction polaire, mais je le sors pour le calculer une fois
-polaire_df = pd.read_csv(p.polaire, delimiter=p.delimeter, index_col=0)
+polaire_df = rpol.charger_polaire(p.polaire, p.delimeter)
 liste_angle = polaire_df.index
 
+# Polaire compilée une seule fois sur une grille régulière, utilisée par tous les calculs de vitesse
+polaire_compilée = rpol.PolaireCompilée(polaire_df)
+
+# Étapes déjà calculées, gardées entre deux routages (interface Tk : déplacement d'un point de passage)
+cache_étapes = CacheÉtapes(p.taille_cache_étapes)
+
+# Filtres appliqués aux fils de chaque expansion (voir filtrer_fils), par exemple le corridor de Routage_corridor
+filtres_fils = []
+
 if __name__ == '__main__':
     pass
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Contexte d'un routage : environnement (vent, masque terre/mer, courants, polaire, zones interdites) et paramètres du routage.
+
+Les fonctions de routage de Routage_calcul lisent les paramètres et les données dans le contexte qu'on leur passe,
+et non plus dans les modules (Routage_Paramètres, Routage_Vent, Routage_Coastline, ...) : plusieurs routages
+peuvent tourner en même temps dans un processus (un par utilisateur de l'interface Streamlit, un par membre
+d'un ensemble, ...), chacun avec ses paramètres et son vent.
+
+Un Environnement ne fait que référencer les tableaux, il ne les copie pas : les contextes qui partagent le même
+environnement partagent les mêmes tableaux. Sans contexte, les fonctions utilisent contexte_modules(),
+qui lit les paramètres et les données des modules à chaque accès, comme avant.
+"""
+
+import hashlib
+import threading
+import numpy as np
+from copy import copy
+
+import Routage_Paramètres as p
+import Routage_Vent as rv
+import Routage_Coastline as rcoast
+import Routage_courant as rcourant
+import Routage_Polaire as rpol
+import Routage_parallèle as rpar
+import Routage_zones as rzones
+
+class Environnement:
+    """
+    Données d'un routage, en lecture seule :
+        vent : vent au format de Routage_Vent.charger_vent
+        masque, transformation : masque terre/mer (1 = terre) et sa transformation affine
+        courants : courants au format de Routage_courant.courants_actuels
+        polaire : Routage_Polaire.PolaireCompilée
+        zones : Routage_zones.ZonesExclusion, None sans zones interdites
+    """
+
+    _modules = (None, None) # Environnement des modules, refait seulement si un tableau a été remplacé
+
+    def __init__(self, vent, masque, transformation, courants, polaire, zones=None):
+        self.vent = vent
+        self.masque, self.transformation = masque, transformation
+        self.courants = courants
+        self.polaire = polaire
+        self.zones = zones
+        self._verrou = threading.Lock()
+        self._carte_distance = None
+        self._empreinte = None
+        self._empreinte_courants = None
+
+    @classmethod
+    def depuis_modules(cls):
+        # Données chargées par Routage_Vent, Routage_Coastline, Routage_courant, Routage_zones et la polaire de Routage_calcul
+        import Routage_calcul as rc
+        vent, courants, zones = rv.vent_actuel(), rcourant.courants_actuels(), rzones.zones_actuelles()
+        tableaux = (vent['u10_values'], vent['v10_values'], vent['latitudes'], vent['longitudes'], rcoast.mask,
+                    rcoast.transform, courants['arbre'], courants['vive_eau'], rc.polaire_compilée, zones)
+        identité = tuple(id(t) for t in tableaux)
+        if cls._modules[0] != identité:
+            cls._modules = (identité, cls(vent, rcoast.mask, rcoast.transform, courants, rc.polaire_compilée, zones))
+        return cls._modules[1]
+
+    @classmethod
+    def charger(cls, fichier_vent=None, fichier_polaire=None):
+        """
+        Environnement des modules avec un autre GRIB et/ou une autre polaire ; le reste est partagé.
+        """
+        vent = rv.charger_vent(fichier_vent) if fichier_vent else None
+        polaire = rpol.PolaireCompilée(rpol.charger_polaire(fichier_polaire, p.delimeter)) if fichier_polaire else None
+        return cls.depuis_modules().avec(vent=vent, polaire=polaire)
+
+    def avec(self, vent=None, polaire=None, zones=None):
+        # Nouvel environnement qui remplace le vent, la polaire et/ou les zones interdites et partage les autres données
+        return Environnement(vent if vent is not None else self.vent, self.masque, self.transformation,
+                             self.courants, polaire if polaire is not None else self.polaire,
+                             zones if zones is not None else self.zones)
+
+    def vent_aux_positions(self, lats, lons, heure):
+        return rv.vent_aux_positions(self.vent, lats, lons, heure)
+
+    def terre(self, lats, lons):
+        # Valeur du masque (0 = mer), 1 hors du masque
+        return rcoast.lire_raster(self.masque, self.transformation, lats, lons, 1)
+
+    def distance_terre(self, lats, lons):
+        # Distance (NM) à la terre la plus proche, la carte des distances est calculée à la première demande
+        with self._verrou:
+            if self._carte_distance is None:
+                self._carte_distance = rcoast.carte_distance(self.masque, self.transformation)
+        return rcoast.lire_raster(self._carte_distance, self.transformation, lats, lons, 0)
+
+    def courant_aux_positions(self, lats, lons, heure, type_maree="vive_eau"):
+        return rcourant.courant_aux_positions(self.courants, lats, lons, heure, type_maree)
+
+    def vitesse_max_courant(self):
+        return rcourant.vitesse_max_courant(self.courants)
+
+    def empreinte(self):
+        """
+        Empreinte (sha256) du vent, de la polaire, du masque terre/mer (avec sa transformation) et des zones interdites,
+        calculée une seule fois.
+        """
+        with self._verrou:
+            if self._empreinte is None:
+                tableaux = (self.vent['u10_values'], self.vent['v10_values'], self.vent['latitudes'],
+                            self.vent['longitudes'], self.polaire.grille, self.masque,
+                            np.array(tuple(self.transformation), dtype=float))
+                h = hashlib.sha256(p.type.encode())
+                for tableau in tableaux:
+                    h.update(np.ascontiguousarray(np.asarray(tableau)).tobytes())
+                if self.zones is not None:
+                    h.update(self.zones.empreinte().encode())
+                self._empreinte = h.hexdigest()
+        return self._empreinte
+
+    def empreinte_courants(self):
+        """Empreinte (sha256) de l'atlas des courants, calculée une seule fois."""
+        with self._verrou:
+            if self._empreinte_courants is None:
+                h = hashlib.sha256()
+                arbre = self.courants['arbre']
+                for tableau in (getattr(arbre, 'data', None), self.courants['vive_eau'], self.courants['morte_eau']):
+                    if tableau is not None:
+                        h.update(np.ascontiguousarray(np.asarray(tableau)).tobytes())
+                self._empreinte_courants = h.hexdigest()
+        return self._empreinte_courants
+
+class ContexteRoutage:
+    """
+    Environnement et paramètres d'un routage. Les paramètres se lisent comme ceux de Routage_Paramètres
+    (contexte.pas_temporel, ...) : ce sont ceux du module au moment de la création du contexte, remplacés
+    par ceux donnés. Le contexte ne change plus ensuite, même si le module est modifié.
+
+    environnement : Environnement (celui des modules par défaut)
+    filtres_fils : filtres des fils de chaque expansion (voir Routage_calcul.filtrer_fils)
+    """
+
+    def __init__(self, environnement=None, filtres_fils=(), **paramètres):
+        self.environnement = environnement or Environnement.depuis_modules()
+        self.filtres_fils = list(filtres_fils)
+        self.paramètres = {nom: copy(valeur) for nom, valeur in {**rpar.paramètres_routage(), **paramètres}.items()}
+
+    def __getattr__(self, nom):
+        # Appelée seulement pour les attributs absents de l'objet : les paramètres
+        try:
+            return self.__dict__['paramètres'][nom]
+        except KeyError:
+            raise AttributeError(f"Paramètre inconnu : {nom}") from None
+
+    def avec(self, environnement=None, filtres_fils=None, **paramètres):
+        # Copie du contexte avec d'autres données, filtres ou paramètres
+        return ContexteRoutage(environnement or self.environnement,
+                               self.filtres_fils if filtres_fils is None else filtres_fils,
+                               **{**self.paramètres, **paramètres})
+
+class _ContexteModules:
+    """Contexte qui lit les paramètres et les données des modules à chaque accès (routage sans contexte)."""
+
+    @property
+    def environnement(self):
+        return Environnement.depuis_modules()
+
+    @property
+    def filtres_fils(self):
+        import Routage_calcul as rc
+        return rc.filtres_fils
+
+    @property
+    def paramètres(self):
+        return rpar.paramètres_routage()
+
+    def __getattr__(self, nom):
+        return getattr(p, nom)
+
+_contexte_modules = _ContexteModules()
+
+def contexte_modules():
+    return _contexte_modules
@@ -0,0 +1,69 @@
+"""
+Routage en deux passes : un routage grossier (pas temporel et pas d'angle larges) donne une route approchée,
+puis le routage fin (p.pas_temporel, p.pas_angle) est limité à un corridor autour de cette route.
+Les fils hors du corridor sont retirés avant l'extraction de la frontière (filtre des fils du contexte du routage).
+"""
+
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+import Routage_calcul as rc
+import Routage_contexte as rctx
+
+NM_PAR_DEGRÉ = 60
+
+class FiltreCorridor:
+    """
+    Filtre des fils : garde ceux à moins de largeur NM de la route (lat, lon).
+    La route est densifiée (un point au moins tous les largeur / 2 NM) et rangée dans un cKDTree,
+    en coordonnées planes locales (lat, lon * cos(latitude moyenne)).
+    """
+
+    def __init__(self, lat, lon, largeur):
+        self.largeur = largeur
+        self.cos_lat = math.cos(math.radians(float(np.mean(lat))))
+
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        longueurs = rc.distance_2_points_vect(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        morceaux_lat, morceaux_lon = [lat[:1]], [lon[:1]]
+        for i, longueur in enumerate(longueurs):
+            t = np.linspace(0, 1, max(int(math.ceil(2 * longueur / largeur)), 1) + 1)[1:]
+            morceaux_lat.append(lat[i] + t * (lat[i+1] - lat[i]))
+            morceaux_lon.append(lon[i] + t * (lon[i+1] - lon[i]))
+        self.lat, self.lon = np.concatenate(morceaux_lat), np.concatenate(morceaux_lon)
+        self.arbre = cKDTree(np.column_stack((self.lat, self.lon * self.cos_lat)))
+
+    def __call__(self, lat_parent, lon_parent, lat_fils, lon_fils, heure):
+        distances, _ = self.arbre.query(np.column_stack((lat_fils, lon_fils * self.cos_lat)),
+                                        distance_upper_bound=self.largeur / NM_PAR_DEGRÉ)
+        return np.isfinite(distances)
+
+def router(points, paramètres=None, filtre=None, contexte=None):
+    # Routage sans affichage dans un contexte aux paramètres remplacés, avec un filtre des fils en plus
+    contexte = contexte or rctx.contexte_modules()
+    contexte = rctx.ContexteRoutage(contexte.environnement, [*contexte.filtres_fils, *([filtre] if filtre else [])],
+                                    **{**contexte.paramètres, **(paramètres or {})})
+    arbre = rc.ra.ArbreIsochrones()
+    chemin = arbre.chemin(rc.router_étapes(points, arbre, contexte=contexte))
+    return {'lat': arbre.lat[chemin].tolist(), 'lon': arbre.lon[chemin].tolist(), 'heure': arbre.heure[chemin].tolist()}
+
+def routage_corridor(points, largeur=None, contexte=None):
+    """
+    Routage grossier (p.pas_temporel_grossier, p.pas_angle_grossier) puis routage fin dans un corridor
+    de largeur NM (p.largeur_corridor) de part et d'autre de la route grossière.
+    Renvoie {'lat', 'lon', 'heure'} de la route fine et la route grossière sous 'grossière'.
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    """
+    contexte = contexte or rctx.contexte_modules()
+    points = [tuple(point) for point in points]
+    largeur = largeur or contexte.largeur_corridor
+
+    grossière = router(points, {'pas_temporel': contexte.pas_temporel_grossier, 'pas_angle': contexte.pas_angle_grossier},
+                       contexte=contexte)
+    route = router(points, filtre=FiltreCorridor(grossière['lat'], grossière['lon'], largeur), contexte=contexte)
+
+    if contexte.print_données:
+        print(f"Route grossière : {round(grossière['heure'][-1] - grossière['heure'][0], 2)} h, "
+              f"route fine dans le corridor : {round(route['heure'][-1] - route['heure'][0], 2)} h")
+    return {**route, 'grossière': grossière}
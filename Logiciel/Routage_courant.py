@@ -5,9 +5,12 @@ import matplotlib.pyplot as plt
 from cartopy import crs as ccrs, feature as cfeature
 from matplotlib.animation import FuncAnimation
 from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
 import cartopy.crs as ccrs
 import math
 
+import Routage_Paramètres as p
+
 R = 6371.0 # KM
 file_path = r'Logiciel\QUIBERON_558'
 
@@ -282,6 +285,64 @@ def position_courant(pos, u_courant, v_courant, pas_temporel):
     
     return projection(pos, angle, distance)
 
+def blocs_en_tableaux(blocks):
+    """
+    Convertit les blocs en tableaux NumPy pour les calculs vectorisés.
+
+    Retour : (coords (nb, 2), vive_eau (nb, 13, 2), morte_eau (nb, 13, 2))
+    """
+    coords = np.array([b["coords"] for b in blocks], dtype=float)
+    vive_eau = np.array([b["vive_eau"] for b in blocks], dtype=float)
+    morte_eau = np.array([b["morte_eau"] for b in blocks], dtype=float)
+    return coords, vive_eau, morte_eau
+
+def courants_actuels():
+    # Courants chargés dans le module : {'arbre', 'vive_eau', 'morte_eau'} (arbre des blocs et tableaux de blocs_en_tableaux)
+    return {'arbre': arbre_blocs, 'vive_eau': vive_eau_blocs, 'morte_eau': morte_eau_blocs}
+
+def courant_aux_positions(courants, lats, lons, heure, type_maree="vive_eau"):
+    # Version vectorisée de récupérer_courant pour des courants donnés (format de courants_actuels) ;
+    # le bloc le plus proche est cherché avec un arbre (même distance que récupérer_courant)
+    if not (-6 <= heure <= 6):
+        raise ValueError("Heure hors de l'intervalle +/-6h autour de la pleine mer")
+
+    h_inf = int(np.floor(heure)) + 6
+    h_sup = min(h_inf + 1, 12)
+    alpha = heure - np.floor(heure)
+
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    _, idx = courants['arbre'].query(np.column_stack((lats.ravel(), lons.ravel())))
+
+    data = courants['vive_eau'] if type_maree == "vive_eau" else courants['morte_eau']
+    u = (1 - alpha) * data[idx, h_inf, 0] + alpha * data[idx, h_sup, 0]
+    v = (1 - alpha) * data[idx, h_inf, 1] + alpha * data[idx, h_sup, 1]
+
+    return u.reshape(lats.shape), v.reshape(lats.shape)
+
+def vitesse_max_courant(courants=None):
+    # Courant le plus fort (nœuds) sur toute la zone et toute la marée (la vive-eau majore la morte-eau)
+    vive_eau = vive_eau_blocs if courants is None else courants['vive_eau']
+    return float(np.hypot(vive_eau[..., 0], vive_eau[..., 1]).max())
+
+def position_courant_vect(lats, lons, u_courant, v_courant, pas_temporel):
+    """
+    Version vectorisée de position_courant.
+    """
+    angle = np.degrees(np.arctan2(v_courant, u_courant))
+    distance = pas_temporel * np.sqrt(u_courant**2 + v_courant**2)
+
+    distance_ratio = distance * 1.852 / R
+    lat_rad = np.radians(lats)
+    cap_rad = np.radians(angle)
+
+    new_lat_rad = np.arcsin(np.sin(lat_rad) * np.cos(distance_ratio) +
+                            np.cos(lat_rad) * np.sin(distance_ratio) * np.cos(cap_rad))
+    new_lon_rad = np.radians(lons) + np.arctan2(np.sin(cap_rad) * np.sin(distance_ratio) * np.cos(lat_rad),
+                                                np.cos(distance_ratio) - np.sin(lat_rad) * np.sin(new_lat_rad))
+
+    return np.degrees(new_lat_rad), np.degrees(new_lon_rad)
+
 def vérification_position_courant(
     pos_depart,
     heure_depart,
@@ -356,7 +417,14 @@ def vérification_position_courant(
         plt.pause(0.3)
     plt.show()
 
-blocks = ouverture_fichier_courant(file_path)
+if p.environnement_partagé():
+    # Processus de calcul : les courants sont rattachés depuis la mémoire partagée (Routage_mémoire_partagée)
+    blocks = []
+    coords_blocs = vive_eau_blocs = morte_eau_blocs = arbre_blocs = None
+else:
+    blocks = ouverture_fichier_courant(file_path)
+    coords_blocs, vive_eau_blocs, morte_eau_blocs = blocs_en_tableaux(blocks)
+    arbre_blocs = cKDTree(coords_blocs)
 
 if __name__ == "__main__":
     # print(blocks)
@@ -0,0 +1,147 @@
+"""
+Fenêtre de départ : routage d'un même parcours pour plusieurs heures de départ sur l'horizon du GRIB.
+
+Le vent, le masque terre/mer et les courants sont publiés une seule fois en mémoire partagée pour le pool ;
+chaque processus route une heure de départ complète. Une heure de départ qui ne peut pas battre la meilleure
+route déjà trouvée (même à la vitesse max sur la distance orthodromique) n'est pas calculée.
+
+Exemple : python Routage_départs.py --départ 47.51 -3.28 --arrivée 47.33 -2.9 --début 0 --fin 24 --pas 1
+"""
+
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# Routage_calcul et Routage_graphe (qui chargent le vent, la terre et les courants) sont importés dans les fonctions :
+# un processus du pool qui réimporte ce script ne charge rien avant de se rattacher à la mémoire partagée
+import Routage_Paramètres as p
+import Routage_parallèle as rpar
+import Routage_mémoire_partagée as rmp
+
+def router_départ(points, heure_départ, contexte=None):
+    """
+    Routage sans affichage des points de passage pour une heure de départ.
+    contexte : contexte du routage (Routage_contexte), celui des modules par défaut
+    Renvoie {'lat', 'lon', 'heure'} de la route.
+    """
+    import Routage_calcul as rc
+    arbre = rc.ra.ArbreIsochrones()
+    noeud = rc.router_étapes(points, arbre, heure=heure_départ, contexte=contexte)
+    chemin = arbre.chemin(noeud)
+    return {'lat': arbre.lat[chemin].tolist(), 'lon': arbre.lon[chemin].tolist(), 'heure': arbre.heure[chemin].tolist()}
+
+def _router_départ_travailleur(points, heure_départ):
+    p.disable_prints()
+    return router_départ(points, heure_départ)
+
+def heures_départ_défaut(pas=1):
+    # De p.heure_début jusqu'à la dernière échéance du vent chargé
+    import Routage_graphe as rg
+    return np.arange(p.heure_début, max(rg.nb_échéances_vent(), p.heure_début + 1), pas).tolist()
+
+def date_départ(heure):
+    # Date réelle d'une heure (comptée depuis l'heure du GRIB), si le nom du GRIB la donne
+    if getattr(p, 'date_heure_grib', None) is None:
+        return None
+    return p.date_heure_grib + timedelta(hours=float(heure))
+
+def borne_inférieure(heure_départ, distance):
+    """Plus petites ETA et durée possibles : la distance orthodromique du parcours à la vitesse fond max."""
+    import Routage_calcul as rc
+    durée = distance / rc.vitesse_borne()
+    return heure_départ + durée, durée
+
+def fenêtre_départ(points, heures_départ=None, nb_processus=None, critère=None):
+    """
+    Route points pour chaque heure de départ et renvoie (tableau, routes).
+
+    critère : 'eta' (arrivée la plus tôt) ou 'durée' (traversée la plus courte), p.critère_départ par défaut.
+        Une heure de départ est ignorée si sa borne inférieure (distance / vitesse max) ne bat pas
+        la meilleure route déjà calculée.
+    tableau : DataFrame (une ligne par heure de départ) : heure_départ, date_départ, eta, durée, statut
+    routes : {heure_départ: {'lat', 'lon', 'heure'}} des routes calculées
+    """
+    import Routage_calcul as rc
+    points = [tuple(point) for point in points]
+    heures_départ = sorted(heures_départ_défaut() if heures_départ is None else heures_départ)
+    nb_processus = nb_processus or p.nb_processus
+    critère = critère or p.critère_départ
+    distance = rc.distance_parcours(points)
+
+    lignes = {h: {'heure_départ': h, 'date_départ': date_départ(h), 'eta': np.nan, 'durée': np.nan,
+                  'statut': 'ignorée'} for h in heures_départ}
+    routes = {}
+    meilleur = {'eta': np.inf, 'durée': np.inf}
+
+    def à_calculer(h):
+        # Faux si l'heure de départ ne peut pas battre la meilleure route déjà calculée
+        eta_min, durée_min = borne_inférieure(h, distance)
+        return eta_min < meilleur['eta'] if critère == 'eta' else durée_min < meilleur['durée']
+
+    def enregistrer(h, route):
+        routes[h] = route
+        eta = route['heure'][-1]
+        lignes[h].update(eta=eta, durée=eta - h, statut='calculée')
+        meilleur['eta'] = min(meilleur['eta'], eta)
+        meilleur['durée'] = min(meilleur['durée'], eta - h)
+
+    if nb_processus <= 1:
+        for h in heures_départ:
+            if à_calculer(h):
+                enregistrer(h, router_départ(points, h))
+    else:
+        # Vent, terre et courants en mémoire partagée ; au plus nb_processus départs en cours, lancés dans l'ordre
+        # pour que chaque nouveau départ profite de la meilleure route déjà trouvée
+        environnement = rmp.EnvironnementPartagé.depuis_modules() if p.mémoire_partagée else None
+        paramètres = {**rpar.paramètres_routage(), 'live': False, 'data_route': False, 'enregistrement': False}
+        try:
+            with rpar.pool_processus(nb_processus, paramètres, environnement.description if environnement else None) as executor:
+                en_cours = {}
+                à_lancer = list(heures_départ)
+                while à_lancer or en_cours:
+                    while à_lancer and len(en_cours) < nb_processus:
+                        h = à_lancer.pop(0)
+                        if à_calculer(h):
+                            en_cours[executor.submit(_router_départ_travailleur, points, h)] = h
+                    if not en_cours:
+                        break
+                    finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                    for futur in finis:
+                        enregistrer(en_cours.pop(futur), futur.result())
+        finally:
+            if environnement:
+                environnement.fermer()
+
+    tableau = pd.DataFrame(list(lignes.values()))
+    if p.print_données:
+        print(tableau.to_string(index=False))
+    return tableau, routes
+
+def main():
+    parser = argparse.ArgumentParser(description="Routage pour plusieurs heures de départ sur l'horizon du GRIB")
+    parser.add_argument('--départ', nargs=2, type=float, metavar=('LAT', 'LON'), default=p.points[0])
+    parser.add_argument('--arrivée', nargs=2, type=float, metavar=('LAT', 'LON'), default=p.points[-1])
+    parser.add_argument('--début', type=float, default=p.heure_début, help="Première heure de départ (heures depuis le GRIB)")
+    parser.add_argument('--fin', type=float, default=None, help="Dernière heure de départ (dernière échéance par défaut)")
+    parser.add_argument('--pas', type=float, default=1, help="Écart entre deux heures de départ (h)")
+    parser.add_argument('--processus', type=int, default=p.nb_processus)
+    parser.add_argument('--critère', choices=('eta', 'durée'), default=p.critère_départ)
+    parser.add_argument('--sortie', default=None, help="Fichier CSV du tableau des départs")
+    args = parser.parse_args()
+
+    import Routage_graphe as rg
+    fin = rg.nb_échéances_vent() - 1 if args.fin is None else args.fin
+    heures = np.arange(args.début, fin + 1e-9, args.pas).tolist()
+    tableau, _ = fenêtre_départ([tuple(args.départ), tuple(args.arrivée)], heures, args.processus, args.critère)
+    if args.sortie:
+        tableau.to_csv(args.sortie, index=False)
+    meilleure = tableau.loc[tableau['statut'] == 'calculée']
+    if len(meilleure):
+        ligne = meilleure.loc[meilleure[args.critère].idxmin()]
+        print(f"Meilleur départ : {ligne['heure_départ']} h (ETA {round(ligne['eta'], 2)} h, durée {round(ligne['durée'], 2)} h)")
+
+# Protection nécessaire pour le pool de processus : les processus réimportent ce script
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Routage d'ensemble : le même parcours routé sur plusieurs runs GRIB (par exemple les runs METEOCONSULT
+successifs d'une même zone dans Données_vent), un membre par processus.
+
+La polaire est chargée à l'import par chaque processus et le masque terre/mer et les courants sont partagés
+en mémoire partagée. Le vent d'un membre n'est chargé qu'au moment de router ce membre, dans un contexte
+(Routage_contexte) qui partage le reste de l'environnement, et il est libéré dès que le membre est fini :
+au plus nb_processus cubes de vent sont en mémoire en même temps.
+"""
+
+import gc
+import glob
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+
+# Les modules qui chargent le vent, la terre et les courants (Routage_Vent, Routage_calcul, Routage_contexte) sont
+# importés dans les fonctions : un processus du pool qui réimporte ce script ne charge rien avant la mémoire partagée
+import Routage_Paramètres as p
+import Routage_départs as rd
+import Routage_parallèle as rpar
+import Routage_mémoire_partagée as rmp
+
+def heure_départ_membre(fichier):
+    # Même date de départ pour tous les membres, comptée depuis le run de chaque GRIB
+    import Routage_Vent as rv
+    date = rv.date_grib(fichier)
+    if date is None or getattr(p, 'date_heure_initiale', None) is None:
+        return p.heure_début
+    return (p.date_heure_initiale - date).total_seconds() / 3600
+
+def router_membre(fichier, points):
+    """
+    Charge le vent de fichier, route points et libère le vent.
+    Renvoie {'lat', 'lon', 'heure'} de la route (heures comptées depuis le run du GRIB).
+    """
+    import Routage_Vent as rv
+    import Routage_contexte as rctx
+    vent = rv.charger_vent(fichier)
+    contexte = rctx.ContexteRoutage(rctx.Environnement.depuis_modules().avec(vent=vent))
+    try:
+        return rd.router_départ(points, heure_départ_membre(fichier), contexte)
+    finally:
+        del contexte
+        vent['ds'].close()
+        del vent
+        gc.collect()
+
+def _router_membre_travailleur(fichier, points):
+    p.disable_prints()
+    return router_membre(fichier, points)
+
+def corridor_consensus(routes, pas=None):
+    """
+    Corridor des routes de l'ensemble : à chaque instant depuis le départ (tous les pas heures), position médiane
+    des membres et largeur du corridor (distance en NM du membre le plus éloigné de la médiane).
+    Un membre déjà arrivé reste à son point d'arrivée.
+    """
+    import Routage_calcul as rc
+    pas = pas or p.pas_temporel
+    temps_routes = [np.asarray(route['heure']) - route['heure'][0] for route in routes]
+    temps = np.arange(0, max(t[-1] for t in temps_routes) + pas, pas)
+
+    lats = np.array([np.interp(temps, t, route['lat']) for t, route in zip(temps_routes, routes)])
+    lons = np.array([np.interp(temps, t, route['lon']) for t, route in zip(temps_routes, routes)])
+    lat_médiane, lon_médiane = np.median(lats, axis=0), np.median(lons, axis=0)
+    largeur = rc.distance_2_points_vect(lats, lons, lat_médiane, lon_médiane).max(axis=0)
+    return {'temps': temps, 'lat': lat_médiane, 'lon': lon_médiane, 'largeur': largeur}
+
+def routage_ensemble(points, fichiers=None, nb_processus=None):
+    """
+    Route points sur chaque GRIB de fichiers (p.fichiers_ensemble par défaut, motif glob).
+
+    Renvoie un dictionnaire :
+        'membres' : DataFrame (un membre par ligne) : fichier, date_grib, heure_départ, durée, date_arrivée
+        'routes' : {fichier: {'lat', 'lon', 'heure'}}
+        'dispersion' : durée min, max, moyenne et écart-type (h) et étendue des arrivées (h)
+        'corridor' : corridor_consensus des routes
+    """
+    import Routage_Vent as rv
+    if fichiers is None:
+        fichiers = sorted(glob.glob(p.fichiers_ensemble))
+    if not fichiers:
+        raise ValueError("Aucun fichier GRIB pour l'ensemble.")
+    points = [tuple(point) for point in points]
+    nb_processus = min(nb_processus or p.nb_processus, len(fichiers))
+
+    if nb_processus <= 1:
+        routes = [router_membre(fichier, points) for fichier in fichiers]
+    else:
+        # Terre et courants en mémoire partagée, le vent est chargé par chaque membre
+        environnement = rmp.EnvironnementPartagé.depuis_modules(vent=False) if p.mémoire_partagée else None
+        paramètres = {**rpar.paramètres_routage(), 'live': False, 'data_route': False, 'enregistrement': False}
+        try:
+            with rpar.pool_processus(nb_processus, paramètres, environnement.description if environnement else None) as executor:
+                routes = list(executor.map(_router_membre_travailleur, fichiers, [points] * len(fichiers)))
+        finally:
+            if environnement:
+                environnement.fermer()
+
+    lignes = []
+    for fichier, route in zip(fichiers, routes):
+        date = rv.date_grib(fichier)
+        lignes.append({'fichier': fichier, 'date_grib': date, 'heure_départ': route['heure'][0],
+                       'durée': route['heure'][-1] - route['heure'][0],
+                       'date_arrivée': date + timedelta(hours=route['heure'][-1]) if date is not None else None})
+    membres = pd.DataFrame(lignes)
+
+    durées = membres['durée'].to_numpy()
+    dispersion = {'durée_min': durées.min(), 'durée_max': durées.max(), 'durée_moyenne': durées.mean(),
+                  'écart_type': durées.std(), 'étendue': durées.max() - durées.min()}
+
+    if p.print_données:
+        print(membres.to_string(index=False))
+        print(f"Durée : {round(dispersion['durée_moyenne'], 2)} h ± {round(dispersion['écart_type'], 2)} h "
+              f"(de {round(dispersion['durée_min'], 2)} h à {round(dispersion['durée_max'], 2)} h)")
+
+    return {'membres': membres, 'routes': dict(zip(fichiers, routes)), 'dispersion': dispersion,
+            'corridor': corridor_consensus(routes)}
+
+# Protection nécessaire pour le pool de processus : les processus réimportent ce script
+if __name__ == '__main__':
+    routage_ensemble(p.points)
@@ -0,0 +1,226 @@
+import os
+import math
+import heapq
+import hashlib
+import numpy as np
+from scipy.spatial import cKDTree
+
+import Routage_Paramètres as p
+import Routage_Vent as rv
+import Routage_Coastline as rcoast
+import Routage_calcul as rc
+
+# Déplacements sur la grille (dlat, dlon) : 16 directions (voisins directs, diagonales et sauts de cavalier)
+DÉPLACEMENTS = np.array([(di, dj) for di in range(-2, 3) for dj in range(-2, 3)
+                         if (di, dj) != (0, 0) and math.gcd(abs(di), abs(dj)) == 1])
+
+VERSION_GRAPHE = 1 # À incrémenter si le contenu du fichier de cache change
+
+def nb_échéances_vent():
+    # Nombre d'échéances du vent chargé (une seule pour un fichier Excel)
+    return len(rv.u10_values) if p.type == 'grib' else 1
+
+def indice_échéance(heure, nb_échéances):
+    # Même règle que get_wind_at_positions : échéance floor(heure), la dernière si on sort du GRIB
+    t = math.floor(heure)
+    if not -nb_échéances <= t < nb_échéances:
+        t = -1
+    return t % nb_échéances
+
+def clé_graphe(résolution):
+    """
+    Empreinte du contenu qui définit le graphe : vent, polaire, masque terre/mer, cadre et résolution.
+    On hache les données chargées (et pas le nom du fichier) : un GRIB relu depuis les pickles donne la même clé.
+    """
+    h = hashlib.sha256()
+    h.update(f"{VERSION_GRAPHE}|{p.type}|{résolution}|{p.cadre_navigation}|{rc.empreinte_données()}".encode())
+    return h.hexdigest()
+
+class GrapheRoutage:
+    """
+    Graphe du cadre de navigation discrétisé en grille lat/lon, avec les temps de parcours précalculés
+    de chaque arête pour chaque échéance du vent (d'après la polaire et le vent au nœud de départ).
+
+    Une fois construit (ou relu depuis le cache), chaque requête départ/arrivée/heure de départ est un A*
+    dépendant du temps : le coût d'une arête est lu à l'échéance de l'heure à laquelle on la parcourt.
+    Les courants ne sont pas pris en compte dans le graphe.
+
+    lat, lon : coordonnées des nœuds (grille complète, terre comprise)
+    voisins : (n_noeuds, 16) indice du nœud voisin, -1 si l'arête est impossible (terre, hors cadre)
+    distances : (n_noeuds, 16) longueur des arêtes en NM
+    temps : (n_échéances, n_noeuds, 16) temps de parcours en heures (inf si le bateau n'avance pas)
+    """
+
+    def __init__(self, lat, lon, voisins, distances, temps, résolution, clé=None):
+        self.lat = lat
+        self.lon = lon
+        self.voisins = voisins
+        self.distances = distances
+        self.temps = temps
+        self.résolution = résolution
+        self.clé = clé
+
+        eau = np.flatnonzero((voisins >= 0).any(axis=1))
+        self.noeuds_eau = eau
+        self.arbre_eau = cKDTree(np.column_stack((lat[eau], lon[eau] * math.cos(math.radians(np.mean(lat))))))
+
+    @classmethod
+    def construire(cls, résolution=None):
+        résolution = résolution or p.résolution_graphe
+        _, _, lat, lon, voisins, distances, caps = grille_navigation(résolution, p.cadre_navigation, rcoast.get_points_values)
+        valides = voisins >= 0
+        n = len(lat)
+
+        nb_échéances = nb_échéances_vent()
+        temps = np.full((nb_échéances, n, len(DÉPLACEMENTS)), np.inf, dtype=np.float32)
+        for t in range(nb_échéances):
+            v_vent, d_vent = rv.get_wind_at_positions(lat, lon, t)
+            twa = np.abs((d_vent[:, None] - caps + 180) % 360 - 180)
+            v_bateau = rc.polaire_compilée.vitesse(np.broadcast_to(v_vent[:, None], twa.shape), twa)
+            with np.errstate(divide='ignore'):
+                temps[t] = np.where(valides & (v_bateau > 0), distances / v_bateau, np.inf)
+
+        return cls(lat, lon, voisins, distances.astype(np.float32), temps, résolution, clé_graphe(résolution))
+
+    @classmethod
+    def charger_ou_construire(cls, résolution=None, dossier=None):
+        # Le graphe est gardé sur disque par (vent, polaire, résolution) : seule la première requête le construit
+        résolution = résolution or p.résolution_graphe
+        dossier = dossier or p.dossier_graphe
+        clé = clé_graphe(résolution)
+        fichier = os.path.join(dossier, f"graphe_{clé[:20]}.npz")
+
+        if os.path.exists(fichier):
+            with np.load(fichier) as données:
+                if str(données['clé']) == clé:
+                    return cls(données['lat'], données['lon'], données['voisins'], données['distances'],
+                               données['temps'], résolution, clé)
+
+        graphe = cls.construire(résolution)
+        graphe.enregistrer(fichier)
+        return graphe
+
+    def enregistrer(self, fichier):
+        os.makedirs(os.path.dirname(fichier) or '.', exist_ok=True)
+        np.savez(fichier, lat=self.lat, lon=self.lon, voisins=self.voisins, distances=self.distances,
+                 temps=self.temps, clé=np.array(self.clé))
+
+    def noeud_proche(self, point):
+        # Nœud sur l'eau le plus proche du point (lat, lon)
+        _, k = self.arbre_eau.query((point[0], point[1] * math.cos(math.radians(np.mean(self.lat)))))
+        return int(self.noeuds_eau[k])
+
+    def route(self, départ, arrivée, heure_départ):
+        """
+        A* dépendant du temps entre les nœuds les plus proches de départ et arrivée.
+        L'heuristique (distance orthodromique / vitesse max de la polaire) ne surestime jamais le temps restant.
+
+        Retour : dictionnaire {'lat', 'lon', 'heure'} des nœuds de la route, ou None si l'arrivée est inaccessible
+        """
+        source, but = self.noeud_proche(départ), self.noeud_proche(arrivée)
+        vitesse_max = float(rc.polaire_compilée.vitesse_max)
+        heuristique = rc.distance_2_points_vect(self.lat, self.lon, self.lat[but], self.lon[but]) / vitesse_max
+
+        nb_échéances = len(self.temps)
+        heures = np.full(len(self.lat), np.inf)
+        parents = np.full(len(self.lat), -1, dtype=np.int64)
+        fermés = np.zeros(len(self.lat), dtype=bool)
+
+        heures[source] = heure_départ
+        tas = [(heure_départ + heuristique[source], heure_départ, source)]
+        while tas:
+            _, heure, u = heapq.heappop(tas)
+            if fermés[u]:
+                continue
+            fermés[u] = True
+            if u == but:
+                break
+
+            durées = self.temps[indice_échéance(heure, nb_échéances), u].tolist()
+            for v, durée in zip(self.voisins[u].tolist(), durées):
+                if v < 0 or fermés[v]:
+                    continue
+                arrivée_v = heure + durée
+                if arrivée_v < heures[v]:
+                    heures[v] = arrivée_v
+                    parents[v] = u
+                    heapq.heappush(tas, (arrivée_v + heuristique[v], arrivée_v, v))
+
+        if not fermés[but]:
+            return None
+
+        chemin = [but]
+        while chemin[-1] != source:
+            chemin.append(int(parents[chemin[-1]]))
+        chemin = np.array(chemin[::-1])
+        return {'lat': self.lat[chemin], 'lon': self.lon[chemin], 'heure': heures[chemin]}
+
+def grille_navigation(résolution, cadre, terre=None):
+    """
+    Grille lat/lon du cadre au pas résolution (degrés) et ses arêtes vers les voisins de DÉPLACEMENTS.
+    terre : fonction (lats, lons) -> valeurs du masque terre/mer (0 = mer), None pour ignorer la terre
+
+    Retour : lats_grille, lons_grille, lat, lon (nœuds à plat, ligne par ligne), voisins (n_noeuds, 16) (-1 si
+    l'arête est impossible), distances (n_noeuds, 16) en NM et caps (n_noeuds, 16) des arêtes
+    """
+    (lat_min, lon_min), (lat_max, lon_max) = cadre
+    lats_grille = np.arange(lat_min, lat_max + 1e-12, résolution)
+    lons_grille = np.arange(lon_min, lon_max + 1e-12, résolution)
+    n_lat, n_lon = len(lats_grille), len(lons_grille)
+
+    lat, lon = (a.ravel() for a in np.meshgrid(lats_grille, lons_grille, indexing='ij'))
+    n = len(lat)
+    i, j = np.divmod(np.arange(n), n_lon)
+
+    # Voisins : dans la grille, les deux extrémités et le segment entre elles sur l'eau
+    vi = i[:, None] + DÉPLACEMENTS[None, :, 0]
+    vj = j[:, None] + DÉPLACEMENTS[None, :, 1]
+    dans_grille = (vi >= 0) & (vi < n_lat) & (vj >= 0) & (vj < n_lon)
+    voisins = np.where(dans_grille, vi * n_lon + vj, -1)
+
+    valides = dans_grille
+    if terre is not None:
+        eau = terre(lat, lon) == 0
+        valides = dans_grille & eau[:, None] & eau[np.where(dans_grille, voisins, 0)]
+        départs, directions = np.nonzero(valides)
+        arrivées = voisins[départs, directions]
+        masqués = segments_sur_terre(lat[départs], lon[départs], lat[arrivées], lon[arrivées], terre=terre)
+        valides[départs[masqués], directions[masqués]] = False
+    voisins = np.where(valides, voisins, -1).astype(np.int32)
+
+    # Caps et longueurs des arêtes (en NM) depuis chaque nœud
+    cible = np.where(valides, voisins, 0)
+    distances = rc.distance_2_points_vect(lat[:, None], lon[:, None], lat[cible], lon[cible])
+    caps = rc.calculer_cap_vect(lat[:, None], lon[:, None], lat[cible], lon[cible])
+    return lats_grille, lons_grille, lat, lon, voisins, distances, caps
+
+def segments_sur_terre(lat1, lon1, lat2, lon2, nb_échantillons=4, terre=None):
+    # Vrai pour les segments dont un point intermédiaire est sur la terre
+    terre = terre or rcoast.get_points_values
+    t = np.linspace(0, 1, nb_échantillons + 2)[1:-1]
+    lats = lat1[:, None] + t[None, :] * (lat2 - lat1)[:, None]
+    lons = lon1[:, None] + t[None, :] * (lon2 - lon1)[:, None]
+    return (terre(lats, lons) != 0).any(axis=1)
+
+def routage_graphe(points, heure_départ=None, graphe=None):
+    """
+    Routage sur le graphe précalculé, étape par étape entre les points (comme itere_jusqua_dans_enveloppe).
+    Retour : {'lon', 'lat', 'heure'} de la route complète
+    """
+    graphe = graphe or GrapheRoutage.charger_ou_construire()
+    heure = p.heure_début if heure_départ is None else heure_départ
+
+    route = {'lat': [], 'lon': [], 'heure': []}
+    for départ, arrivée in zip(points[:-1], points[1:]):
+        étape = graphe.route(départ, arrivée, heure)
+        if étape is None:
+            print(f"Aucune route sur le graphe entre {départ} et {arrivée}.")
+            return None
+        début = 1 if route['lat'] else 0 # Le premier nœud d'une étape est le dernier de la précédente
+        for clé in route:
+            route[clé].extend(étape[clé][début:].tolist())
+        heure = étape['heure'][-1]
+
+    if p.print_données:
+        print(f"Durée de la route sur le graphe : {round(route['heure'][-1] - route['heure'][0], 2)} h")
+    return route
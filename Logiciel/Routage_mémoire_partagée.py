@@ -0,0 +1,152 @@
+import os
+import threading
+import contextlib
+import numpy as np
+import multiprocessing
+from multiprocessing import context, shared_memory
+from scipy.spatial import cKDTree
+
+import Routage_Paramètres as p
+
+VARIABLE_ENV = "ROUTAGE_ENV_PARTAGE" # Lue par p.environnement_partagé()
+
+# Segments rattachés dans un processus de calcul : gardés ici pour que les vues NumPy restent valides
+_segments_attachés = []
+
+class EnvironnementPartagé:
+    """
+    Publie une seule fois le vent, le masque terre/mer et les courants en mémoire partagée.
+
+    Seule la description (nom du segment, forme, type) est envoyée aux processus, qui s'y
+    rattachent sans copie : la mémoire reste la même quel que soit le nombre de processus.
+    """
+
+    def __init__(self, tableaux, extra=None):
+        self.segments = []
+        self.description = {'tableaux': {}, 'extra': extra or {}}
+
+        for nom, tableau in tableaux.items():
+            tableau = np.ascontiguousarray(tableau)
+            shm = shared_memory.SharedMemory(create=True, size=max(tableau.nbytes, 1))
+            np.ndarray(tableau.shape, dtype=tableau.dtype, buffer=shm.buf)[...] = tableau
+            self.segments.append(shm)
+            self.description['tableaux'][nom] = (shm.name, tableau.shape, tableau.dtype.str)
+
+    @classmethod
+    def depuis_modules(cls, vent=True):
+        # Rassemble les données déjà chargées par Routage_Vent, Routage_Coastline et Routage_courant
+        # vent=False : seuls la terre et les courants sont partagés (chaque processus charge son propre GRIB)
+        import Routage_contexte as rctx
+        return cls.depuis_environnement(rctx.Environnement.depuis_modules(), vent)
+
+    @classmethod
+    def depuis_environnement(cls, environnement, vent=True):
+        # Données d'un Environnement (Routage_contexte) ; la polaire, petite, est envoyée avec la description
+        tableaux = {}
+        if vent:
+            tableaux.update({
+                'u10': np.stack(environnement.vent['u10_values']),
+                'v10': np.stack(environnement.vent['v10_values']),
+                'latitudes': environnement.vent['latitudes'],
+                'longitudes': environnement.vent['longitudes'],
+            })
+
+        tableaux.update({
+            'mask': environnement.masque,
+            'coords_blocs': environnement.courants['arbre'].data,
+            'vive_eau_blocs': environnement.courants['vive_eau'],
+            'morte_eau_blocs': environnement.courants['morte_eau'],
+        })
+        return cls(tableaux, extra={'transform': environnement.transformation, 'polaire': environnement.polaire})
+
+    def fermer(self):
+        for shm in self.segments:
+            shm.close()
+            shm.unlink()
+        self.segments = []
+
+def attacher(description):
+    """Renvoie des vues NumPy sur les segments décrits, sans copie."""
+    tableaux = {}
+    for nom, (nom_segment, forme, dtype) in description['tableaux'].items():
+        try:
+            shm = shared_memory.SharedMemory(name=nom_segment, track=False)
+        except TypeError: # Python < 3.13
+            shm = shared_memory.SharedMemory(name=nom_segment)
+        _segments_attachés.append(shm)
+        tableaux[nom] = np.ndarray(forme, dtype=np.dtype(dtype), buffer=shm.buf)
+    return tableaux
+
+def installer_environnement(description):
+    # Dans un processus de calcul : les modules lisent le vent, la terre et les courants dans la mémoire partagée
+    marquer_processus_de_calcul()
+    import Routage_Vent as rv
+    import Routage_Coastline as rc
+    import Routage_courant as rcourant
+
+    t = attacher(description)
+
+    if 'u10' in t:
+        if p.type == 'grib':
+            rv.u10_values, rv.v10_values = t['u10'], t['v10']
+        else:
+            rv.u_xl, rv.v_xl = t['u10'], t['v10']
+            rv.lat_xl, rv.lon_xl = t['latitudes'], t['longitudes']
+        rv.latitudes_grille, rv.longitudes_grille = t['latitudes'], t['longitudes']
+
+    rc.mask = t['mask']
+    rc.transform = description['extra']['transform']
+
+    rcourant.coords_blocs = t['coords_blocs']
+    rcourant.vive_eau_blocs = t['vive_eau_blocs']
+    rcourant.morte_eau_blocs = t['morte_eau_blocs']
+    rcourant.arbre_blocs = cKDTree(rcourant.coords_blocs)
+
+    if 'polaire' in description['extra']:
+        import Routage_calcul as rcalc
+        rcalc.polaire_compilée = description['extra']['polaire']
+
+def marquer_processus_de_calcul():
+    # Dans un processus de calcul seulement (jamais dans le processus principal) : les modules de données
+    # importés ensuite ne chargent pas le vent, le masque et les courants, rattachés depuis la mémoire partagée
+    os.environ[VARIABLE_ENV] = "1"
+
+_verrou_env = threading.Lock()
+
+@contextlib.contextmanager
+def lancement_processus_de_calcul():
+    """
+    Marque l'environnement le temps de lancer un processus de calcul, puis remet la valeur précédente.
+    Avec spawn, le processus réimporte le script principal (et donc Routage_calcul, Routage_Vent, ...) avant
+    l'initialiseur du pool : la variable doit déjà être dans son environnement pour que ces imports ne chargent rien.
+    """
+    with _verrou_env:
+        précédente = os.environ.get(VARIABLE_ENV)
+        os.environ[VARIABLE_ENV] = "1"
+        try:
+            yield
+        finally:
+            if précédente is None:
+                os.environ.pop(VARIABLE_ENV, None)
+            else:
+                os.environ[VARIABLE_ENV] = précédente
+
+class ProcessusSpawn(context.SpawnProcess):
+    # Processus spawn lancé avec l'environnement marqué (aussi ceux que le pool relance plus tard)
+    def start(self):
+        with lancement_processus_de_calcul():
+            super().start()
+
+class ContexteSpawn(context.SpawnContext):
+    Process = ProcessusSpawn
+
+def contexte_multiprocessing():
+    """
+    Contexte multiprocessing des pools qui utilisent la mémoire partagée.
+    fork : les processus héritent des modules déjà chargés, sans rien recharger.
+    spawn et forkserver : processus spawn lancés avec l'environnement marqué (le serveur forkserver, lancé une seule
+    fois, ne verrait pas la variable).
+    """
+    if multiprocessing.get_start_method() == 'fork':
+        return multiprocessing.get_context('fork')
+    return ContexteSpawn()
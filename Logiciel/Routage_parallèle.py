@@ -0,0 +1,114 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+import Routage_Paramètres as p
+import Routage_mémoire_partagée as rmp
+
+def paramètres_routage():
+    # Copie des paramètres simples du module de paramètres (ceux que l'interface Tk peut modifier)
+    return {nom: valeur for nom, valeur in vars(p).items()
+            if not nom.startswith('_') and isinstance(valeur, (bool, int, float, str, tuple, list, type(None)))}
+
+def _init_travailleur(paramètres, description_environnement=None):
+    # Chaque processus reprend les paramètres du processus principal au moment du lancement du routage
+    for nom, valeur in paramètres.items():
+        setattr(p, nom, valeur)
+    if description_environnement is not None:
+        rmp.installer_environnement(description_environnement)
+
+def pool_processus(nb_processus, paramètres, description_environnement=None):
+    """
+    ProcessPoolExecutor dont les processus reprennent les paramètres, et l'environnement en mémoire partagée s'il est
+    décrit : ses processus sont alors lancés marqués (Routage_mémoire_partagée) et aucun ne recharge les données.
+    """
+    contexte_mp = rmp.contexte_multiprocessing() if description_environnement is not None else None
+    return ProcessPoolExecutor(max_workers=nb_processus, mp_context=contexte_mp, initializer=_init_travailleur,
+                               initargs=(paramètres, description_environnement))
+
+def _expansion_morceau(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance, contexte=None, arrière=False,
+                       paramètres=None):
+    # paramètres : dans un processus de calcul, paramètres du routage s'ils diffèrent de ceux reçus au lancement
+    import Routage_calcul as rc
+    if paramètres is not None:
+        import Routage_contexte as rctx
+        contexte = rctx.ContexteRoutage(**paramètres)
+    return rc.prochains_points_vect(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance, contexte, arrière)
+
+class PoolExpansion:
+    """
+    Pool de processus conservé pendant tout un routage pour l'expansion de la frontière.
+
+    La frontière est découpée en autant de morceaux que de processus ; chaque processus applique
+    le noyau vectorisé prochains_points_vect à son morceau et les résultats sont recollés avec
+    les indices de parents ramenés à la frontière complète.
+    contexte : contexte du routage (Routage_contexte) : les processus reprennent ses paramètres, et ses données
+        avec la mémoire partagée
+    Une expansion dans un autre contexte est envoyée aux processus avec ses paramètres si ses données sont celles
+    des processus, et calculée dans ce processus sinon (autre vent, autre polaire, ...).
+    """
+
+    def __init__(self, nb_processus=None, taille_min_morceau=64, mémoire_partagée=None, contexte=None):
+        self.nb_processus = nb_processus or os.cpu_count()
+        self.taille_min_morceau = taille_min_morceau
+        self.contexte = contexte
+        self.paramètres = paramètres_routage() if contexte is None else contexte.paramètres
+
+        # Le vent, la terre et les courants sont publiés une fois en mémoire partagée au lieu d'être rechargés par chaque processus
+        if mémoire_partagée is None:
+            mémoire_partagée = p.mémoire_partagée
+        if not mémoire_partagée:
+            self.environnement = None
+        elif contexte is None:
+            self.environnement = rmp.EnvironnementPartagé.depuis_modules()
+        else:
+            self.environnement = rmp.EnvironnementPartagé.depuis_environnement(contexte.environnement)
+        description = self.environnement.description if self.environnement else None
+        # Données avec lesquelles calculent les processus : celles du contexte en mémoire partagée, sinon celles
+        # des modules, que chaque processus charge lui-même
+        import Routage_contexte as rctx
+        self.environnement_processus = (contexte.environnement if contexte is not None and self.environnement
+                                        else rctx.Environnement.depuis_modules())
+
+        self.executor = pool_processus(self.nb_processus, self.paramètres, description)
+
+    def expansion(self, lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance=True, arrière=False,
+                  contexte=None):
+        # contexte : contexte de cette expansion, celui des modules par défaut
+        import Routage_contexte as rctx
+        contexte = contexte or rctx.contexte_modules()
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+
+        # Petite frontière : l'envoi aux processus coûterait plus cher que le calcul
+        # Données différentes de celles des processus : ils ne peuvent pas faire le calcul
+        nb_morceaux = min(self.nb_processus, len(lats) // self.taille_min_morceau)
+        if nb_morceaux <= 1 or contexte.environnement is not self.environnement_processus:
+            return _expansion_morceau(lats, lons, point_suivant, pas_temporel, pas_angle, heure, filtrer_par_distance, contexte,
+                                      arrière)
+
+        paramètres = contexte.paramètres
+        paramètres = None if paramètres == self.paramètres else paramètres
+        débuts = np.linspace(0, len(lats), nb_morceaux + 1).astype(int)
+        futures = [self.executor.submit(_expansion_morceau, lats[d:f], lons[d:f], point_suivant,
+                                        pas_temporel, pas_angle, heure, filtrer_par_distance, arrière=arrière,
+                                        paramètres=paramètres)
+                   for d, f in zip(débuts[:-1], débuts[1:])]
+        morceaux = [f.result() for f in futures]
+
+        for d, morceau in zip(débuts[:-1], morceaux):
+            morceau['parent'] = morceau['parent'] + d
+
+        return {clé: np.concatenate([m[clé] for m in morceaux]) for clé in morceaux[0]}
+
+    def fermer(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.environnement:
+            self.environnement.fermer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+        return False
@@ -0,0 +1,126 @@
+"""
+Sauvegardes régulières d'un routage en cours et reprise depuis la dernière sauvegarde.
+
+L'état sauvegardé est celui du début d'une itération : arbre des isochrones (colonnes), frontière, heure,
+itération, rayon d'élimination, étape en cours et points de passage. Il est écrit au format .npz compressé par un thread
+d'écriture : la boucle de routage ne fait que copier les colonnes de l'arbre.
+"""
+
+import os
+import queue
+import threading
+import numpy as np
+
+import Routage_Paramètres as p
+import Routage_arbre as ra
+
+class Sauvegarde:
+    """
+    Fonction de sauvegarde pour router_étapes : un état sur tous_les est envoyé au thread d'écriture.
+    Si le thread n'a pas fini d'écrire l'état précédent, celui-ci est remplacé par le plus récent.
+    """
+
+    def __init__(self, fichier=None, tous_les=None):
+        self.fichier = fichier or p.fichier_sauvegarde
+        self.tous_les = tous_les or p.sauvegarde_tous_les
+        self.compteur = 0
+        self.file = queue.Queue(maxsize=1)
+        self.erreur = None
+        self.thread = threading.Thread(target=self._écrire_en_continu, daemon=True)
+        self.thread.start()
+
+    def __call__(self, arbre, état):
+        self.compteur += 1
+        if self.compteur % self.tous_les:
+            return
+        instantané = {f"arbre_{nom}": colonne[:len(arbre)].copy() for nom, colonne in arbre.données.items()}
+        instantané.update({
+            'frontière': np.array(état['frontière'], dtype=np.int64),
+            'points': np.array(état['points'], dtype=float),
+            'étape': état['étape'],
+            'départ': état['départ'],
+            'heure': état['heure'],
+            'heure_départ': état['heure_départ'],
+            'iteration': état['iteration'],
+            'rayon': état['rayon'],
+            'empreinte': empreinte_routage(),
+        })
+        try:
+            self.file.get_nowait() # L'état pas encore écrit est remplacé par le plus récent
+        except queue.Empty:
+            pass
+        self.file.put(instantané)
+
+    def _écrire_en_continu(self):
+        while True:
+            instantané = self.file.get()
+            if instantané is None:
+                return
+            try:
+                # Écriture dans un fichier temporaire puis remplacement : la sauvegarde précédente reste lisible
+                temporaire = self.fichier + ".tmp"
+                with open(temporaire, "wb") as f:
+                    np.savez_compressed(f, **instantané)
+                os.replace(temporaire, self.fichier)
+            except OSError as e:
+                self.erreur = e
+                print(f"Erreur d'écriture de la sauvegarde : {e}")
+
+    def fermer(self, supprimer=False):
+        """Attend la fin de l'écriture en cours. supprimer : routage terminé, la sauvegarde n'est plus utile."""
+        self.file.put(None)
+        self.thread.join()
+        if supprimer and os.path.exists(self.fichier):
+            os.remove(self.fichier)
+
+def empreinte_routage():
+    # Vent, polaire, terre et paramètres du routage : une reprise avec d'autres données ne continuerait pas le même calcul
+    import Routage_calcul as rc
+    paramètres = tuple(getattr(p, nom) for nom in rc.PARAMÈTRES_ÉTAPE)
+    return f"{rc.empreinte_données()}|{paramètres!r}"
+
+def charger(fichier=None):
+    """Relit une sauvegarde : renvoie (arbre, état) pour router_étapes(..., reprise=état)."""
+    fichier = fichier or p.fichier_sauvegarde
+    with np.load(fichier) as données:
+        arbre = ra.ArbreIsochrones.depuis_colonnes({nom: données[f"arbre_{nom}"] for nom in ra.ArbreIsochrones.COLONNES})
+        état = {
+            'frontière': données['frontière'],
+            'points': [tuple(point) for point in données['points'].tolist()],
+            'étape': int(données['étape']),
+            'départ': int(données['départ']),
+            'heure': float(données['heure']),
+            'heure_départ': float(données['heure_départ']),
+            'iteration': int(données['iteration']),
+            'rayon': float(données['rayon']),
+            'empreinte': str(données['empreinte']),
+        }
+    return arbre, état
+
+def reprendre(fichier=None, affichage=None):
+    """
+    Reprend le routage sauvegardé dans fichier (p.fichier_sauvegarde par défaut) là où il s'est arrêté,
+    en continuant à sauvegarder. Renvoie {'lat', 'lon', 'heure'} de la route complète.
+    """
+    import Routage_calcul as rc
+    import Routage_parallèle as rpar
+
+    fichier = fichier or p.fichier_sauvegarde
+    arbre, état = charger(fichier)
+    if état['empreinte'] != empreinte_routage():
+        print("Attention : le vent, la polaire ou les paramètres ont changé depuis la sauvegarde.")
+    print(f"Reprise à l'étape {état['étape']}, itération {état['iteration']} (heure {état['heure']})")
+
+    sauvegarde = Sauvegarde(fichier)
+    pool = rpar.PoolExpansion(p.nb_processus) if p.expansion_parallèle else None
+    terminé = False
+    try:
+        noeud = rc.router_étapes(état['points'], arbre, pool, affichage, sauvegarde=sauvegarde, reprise=état)
+        terminé = True
+    finally:
+        sauvegarde.fermer(supprimer=terminé)
+        if pool is not None:
+            pool.fermer()
+
+    chemin = arbre.chemin(noeud)
+    return {'lat': arbre.lat[chemin].tolist(), 'lon': arbre.lon[chemin].tolist(), 'heure': arbre.heure[chemin].tolist()}
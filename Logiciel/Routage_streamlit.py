@@ -8,6 +8,7 @@ import matplotlib.colors as mcolors
 import numpy as np
 import xarray as xr
 import Routage_calcul as rc
+import Routage_contexte as rctx
 import Routage_Paramètres as p
 
 
@@ -79,15 +80,19 @@ def afficher_visualisation():
     st.title("Visualisation de la route idéale")
     st.write("Cette application exécute le routage et affiche la route idéale avec les vents.")
 
+    # Temps de calcul max : à l'échéance, la meilleure route trouvée par le routage progressif est affichée
+    délai = st.number_input("Temps de calcul max (s, 0 = illimité)", min_value=0.0, value=float(p.délai_routage or 0), step=5.0)
+
     if st.button("Démarrer le routage"):
         st.write("**Calcul en cours...**")
 
-        # Exécuter le routage
-        result = rc.itere_jusqua_dans_enveloppe(
-            p.position_initiale, p.position_finale,
-            p.pas_temporel, p.pas_angle, p.tolerance_arrivée,
-            p.loc_nav, live=False, enregistrement=False, streamlit=True
-        )
+        # Exécuter le routage dans un contexte propre à la session : plusieurs utilisateurs peuvent router en même temps
+        points = [st.session_state.get("position_initiale", p.position_initiale),
+                  st.session_state.get("position_finale", p.position_finale)]
+        contexte = rctx.ContexteRoutage(live=False, enregistrement=False, data_route=False)
+        result = rc.itere_jusqua_dans_enveloppe(points, contexte, délai=délai or None)
+        if result and not result.get('complète', True):
+            st.warning("Temps de calcul dépassé avant la première route complète : route partielle.")
 
         if result and 'lon' in result and 'lat' in result:
             chemin_lon = result['lon']
@@ -0,0 +1,124 @@
+"""
+Carte du temps restant jusqu'à une cible, pour classer et élaguer la frontière des isochrones.
+
+La carte est calculée avant le routage par un Dijkstra en arrière depuis la cible (scipy.sparse.csgraph) sur une
+grille grossière du cadre de navigation (les arêtes de Routage_graphe), avec la polaire et le vent moyen sur tout
+l'horizon du GRIB. Sans pas imposé (p.résolution_temps_restant = None), le pas de la grille est déduit du cadre
+pour avoir environ p.noeuds_temps_restant nœuds : le calcul reste petit devant le routage, quel que soit le cadre.
+Contrairement à la distance orthodromique / vitesse max, elle tient compte du vent : remonter au près vers
+la cible coûte plus cher que d'y aller au portant. Ce n'est qu'une estimation (vent moyen, grille grossière) :
+l'élagage la multiplie par p.facteur_temps_restant.
+
+Les cartes sont gardées en mémoire par (vent, polaire, masque, cible, grille).
+"""
+
+import threading
+import numpy as np
+from collections import OrderedDict
+from scipy import ndimage
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+import Routage_Vent as rv
+import Routage_calcul as rc
+import Routage_graphe as rg
+
+class CarteTempsRestant:
+    """
+    Temps restant (h) jusqu'à la cible depuis chaque nœud d'une grille régulière.
+    lats_grille, lons_grille : axes de la grille
+    temps : (n_lat, n_lon) temps restant ; une case sans route (terre) prend la valeur de la case d'eau la plus proche
+    """
+
+    def __init__(self, lats_grille, lons_grille, temps):
+        self.lats_grille = lats_grille
+        self.lons_grille = lons_grille
+        self.temps = temps
+        self.résolution = float(lats_grille[1] - lats_grille[0]) if len(lats_grille) > 1 else 1.0
+
+    @classmethod
+    def construire(cls, cible, résolution, cadre, environnement, terre=True):
+        """
+        Dijkstra en arrière depuis le nœud le plus proche de cible. Le temps d'une arête est celui du bateau
+        avec le vent moyen au nœud de départ de l'arête. terre : les arêtes qui traversent la terre sont retirées.
+        """
+        lats_grille, lons_grille, lat, lon, voisins, distances, caps = rg.grille_navigation(
+            résolution, cadre, environnement.terre if terre else None)
+
+        # Vent moyen (moyenne des composantes) sur toutes les échéances
+        vent = environnement.vent
+        vent_moyen = {**vent, 'u10_values': [np.mean(np.asarray(vent['u10_values'], dtype=float), axis=0)],
+                      'v10_values': [np.mean(np.asarray(vent['v10_values'], dtype=float), axis=0)]}
+        v_vent, d_vent = rv.vent_aux_positions(vent_moyen, lat, lon, 0)
+        twa = np.abs((d_vent[:, None] - caps + 180) % 360 - 180)
+        v_bateau = environnement.polaire.vitesse(np.broadcast_to(v_vent[:, None], twa.shape), twa)
+        with np.errstate(divide='ignore'):
+            durées = np.where((voisins >= 0) & (v_bateau > 0), distances / v_bateau, np.inf)
+
+        # Nœud de départ du balayage : le nœud d'eau (qui a au moins une arête) le plus proche de la cible
+        eau = np.flatnonzero((voisins >= 0).any(axis=1))
+        if len(eau) == 0:
+            eau = np.arange(len(lat))
+        but = int(eau[np.argmin((lat[eau] - cible[0])**2 + (lon[eau] - cible[1])**2)])
+        # Graphe inversé (l'arête u -> v devient v -> u) : un seul Dijkstra depuis le but donne le temps de chaque nœud
+        départs, directions = np.nonzero(np.isfinite(durées))
+        graphe = csr_matrix((durées[départs, directions], (voisins[départs, directions], départs)),
+                            shape=(len(lat), len(lat)))
+        temps = dijkstra(graphe, directed=True, indices=but)
+
+        temps = temps.reshape(len(lats_grille), len(lons_grille))
+        inconnus = ~np.isfinite(temps)
+        if inconnus.all():
+            # Aucune route sur la grille : distance orthodromique à la vitesse max
+            temps = (rc.distance_2_points_vect(lat, lon, *cible) / environnement.polaire.vitesse_max).reshape(temps.shape)
+        elif inconnus.any():
+            _, (ii, jj) = ndimage.distance_transform_edt(inconnus, return_indices=True)
+            temps = temps[ii, jj]
+        return cls(lats_grille, lons_grille, temps)
+
+    def temps_restant(self, lats, lons):
+        # Temps restant au nœud le plus proche de chaque position
+        i = np.clip(np.rint((np.asarray(lats, dtype=float) - self.lats_grille[0]) / self.résolution).astype(int),
+                    0, len(self.lats_grille) - 1)
+        j = np.clip(np.rint((np.asarray(lons, dtype=float) - self.lons_grille[0]) / self.résolution).astype(int),
+                    0, len(self.lons_grille) - 1)
+        return self.temps[i, j]
+
+class CacheCartes:
+    """Cartes déjà calculées, de la plus ancienne à la plus récente (partagé entre routages et threads)."""
+
+    def __init__(self, taille_max=16):
+        self.taille_max = taille_max
+        self.cartes = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def carte(self, cible, contexte):
+        résolution = résolution_carte(contexte)
+        clé = (contexte.environnement.empreinte(), round(cible[0], 9), round(cible[1], 9),
+               résolution, tuple(map(tuple, contexte.cadre_navigation)), contexte.land_contact)
+        with self.verrou:
+            carte = self.cartes.get(clé)
+            if carte is not None:
+                self.cartes.move_to_end(clé)
+                return carte
+        carte = CarteTempsRestant.construire(cible, résolution, contexte.cadre_navigation,
+                                             contexte.environnement, contexte.land_contact)
+        with self.verrou:
+            self.cartes[clé] = carte
+            while len(self.cartes) > self.taille_max:
+                self.cartes.popitem(last=False)
+        return carte
+
+def résolution_carte(contexte):
+    # Pas de la grille : contexte.résolution_temps_restant, sinon celui qui donne environ contexte.noeuds_temps_restant
+    # nœuds sur le cadre de navigation
+    if contexte.résolution_temps_restant:
+        return contexte.résolution_temps_restant
+    (lat_min, lon_min), (lat_max, lon_max) = contexte.cadre_navigation
+    return round(float(np.sqrt(abs(lat_max - lat_min) * abs(lon_max - lon_min) / contexte.noeuds_temps_restant)), 6)
+
+cache_cartes = CacheCartes()
+
+def carte_temps_restant(cible, contexte):
+    """Carte du temps restant jusqu'à cible pour le contexte du routage, calculée à la première demande."""
+    return cache_cartes.carte(cible, contexte)
@@ -8,6 +8,7 @@ import cartopy.crs as ccrs
 import cartopy.feature as cfeature
 import Routage_Paramètres as p
 import Routage_calcul as rc
+import Routage_contexte as rctx
 import threading
 import geocoder
 
@@ -22,6 +23,7 @@ class RoutageApp:
         self.root.geometry("1200x800")
         self.is_fullscreen = False
         self.routing_thread = None
+        self.arrêt = None # Jeton d'arrêt du routage en cours
 
         self.position_visible = BooleanVar(value=False)
         self.affichage_vent_couleur = BooleanVar(value=False)
@@ -55,6 +57,7 @@ class RoutageApp:
         
         self.zoom_factor = 1.2
         self.drag_start = None
+        self.point_déplacé = None # Indice du point de passage déplacé à la souris
         
         self.initialize_map()
         self.update_computer_position()
@@ -62,8 +65,8 @@ class RoutageApp:
         # Buttons
         self.create_sidebar_buttons()
         
-        # User Points
-        p.points = []
+        # Points de passage de cette fenêtre (et non p.points : chaque routage reçoit sa copie)
+        self.points = []
         self.point_selection_enabled = False
         
         self.canvas.mpl_connect("scroll_event", self.zoom)
@@ -129,6 +132,7 @@ class RoutageApp:
         self.selection_button.pack(pady=10, padx=20)
 
         tk.Button(self.sidebar, text="Lancer Routage", command=self.execute_routing, **button_config).pack(pady=10, padx=20)
+        tk.Button(self.sidebar, text="Arrêter Routage", command=self.stop_routing, **button_config).pack(pady=10, padx=20)
         tk.Button(self.sidebar, text="Réinitialiser", command=self.reset_points, **button_config).pack(pady=10, padx=20)
         tk.Button(self.sidebar, text="Quitter", command=self.root.quit, **{**button_config, "bg": "#E74C3C"}).pack(pady=10, padx=20)
 
@@ -198,11 +202,32 @@ class RoutageApp:
         if event.key == "control":
             self.ctrl_pressed = False
 
+    def point_sous_souris(self, event, rayon=10):
+        # Indice du point de passage à moins de rayon pixels du clic, None sinon
+        if not self.points:
+            return None
+        pixels = self.ax.transData.transform([(lon, lat) for lat, lon in self.points])
+        distances = np.hypot(pixels[:, 0] - event.x, pixels[:, 1] - event.y)
+        k = int(np.argmin(distances))
+        return k if distances[k] <= rayon else None
+
     def on_left_press(self, event):
         if event.button == 1 :#and self.ctrl_pressed:
+            # Un clic sur un point de passage le déplace au lieu de déplacer la carte
+            self.point_déplacé = self.point_sous_souris(event)
+            if self.point_déplacé is not None:
+                return
             self.drag_start = (event.x, event.y, list(self.ax.get_xlim()), list(self.ax.get_ylim()))
 
     def on_left_drag(self, event):
+        if self.point_déplacé is not None:
+            lon, lat = self.ax.transData.inverted().transform((event.x, event.y))
+            self.points[self.point_déplacé] = (lat, lon)
+            if self.point_déplacé < len(getattr(self, "selection_artists", [])):
+                self.selection_artists[self.point_déplacé].set_offsets([(lon, lat)])
+            self.canvas.draw_idle()
+            return
+
         if self.drag_start is None : #or not self.ctrl_pressed:
             return
 
@@ -216,6 +241,23 @@ class RoutageApp:
 
     def on_release(self, event):
         self.drag_start = None
+        if self.point_déplacé is not None:
+            self.point_déplacé = None
+            # Nouveau routage : les étapes avant le point déplacé sont relues dans le cache des étapes
+            if len(self.points) >= 2 and (self.routing_thread is None or not self.routing_thread.is_alive()):
+                self.clear_dynamic_elements()
+                self.draw_selected_points()
+                self.routing_thread = threading.Thread(target=self.run_routing, daemon=True)
+                self.routing_thread.start()
+
+    def draw_selected_points(self):
+        # Redessine les points de passage (départ en vert, arrivée en rouge, intermédiaires en noir)
+        self.selection_artists = []
+        for k, (lat, lon) in enumerate(self.points):
+            color = "green" if k == 0 else "red" if k == 1 else "black"
+            self.selection_artists.append(self.ax.scatter(lon, lat, color=color, marker="x", s=100, transform=ccrs.PlateCarree(),
+                                                          label="Point sélectionné"))
+        self.canvas.draw_idle()
 
     def toggle_wind_display(self):
         if not self.wind_display_enabled:
@@ -307,9 +349,9 @@ class RoutageApp:
             self.ax.set_ylim(current_ylim)
 
             # (Optionnel) Redessiner les points sélectionnés
-            for pt in p.points:
+            for pt in self.points:
                 lat, lon = pt
-                color = "green" if p.points.index(pt) == 0 else "red" if p.points.index(pt) == 1 else "black"
+                color = "green" if self.points.index(pt) == 0 else "red" if self.points.index(pt) == 1 else "black"
                 self.ax.scatter(lon, lat, color=color, marker="x", s=100, transform=ccrs.PlateCarree())
 
             # Utiliser le cache pour éviter de recalculer
@@ -348,9 +390,9 @@ class RoutageApp:
             del self.wind_barbs
 
         # Optionnel : vous pouvez redessiner les points ou autres éléments statiques
-        for pt in p.points:
+        for pt in self.points:
             lat, lon = pt
-            color = "green" if p.points.index(pt) == 0 else "red" if p.points.index(pt) == 1 else "black"
+            color = "green" if self.points.index(pt) == 0 else "red" if self.points.index(pt) == 1 else "black"
             self.ax.scatter(lon, lat, color=color, marker="x", s=100, transform=ccrs.PlateCarree())
 
         self.canvas.draw_idle()
@@ -391,7 +433,7 @@ class RoutageApp:
     def reset_points(self):
         if messagebox.askyesno("Confirmation", "Réinitialiser tous les points ?"):
             # Réinitialiser la liste des points
-            p.points = []
+            self.points = []
 
             # Sauvegarder l'étendue actuelle (dimensions de la vue)
             current_extent = self.ax.get_extent(crs=ccrs.PlateCarree())
@@ -408,13 +450,13 @@ class RoutageApp:
             self.canvas.draw_idle()
 
     def on_click(self, event):
-        if not self.point_selection_enabled:
+        if not self.point_selection_enabled or self.point_déplacé is not None:
             return
         data_coord = self.ax.transData.inverted().transform((event.x, event.y))
         lon, lat = data_coord
-        p.points.append((lat, lon))
+        self.points.append((lat, lon))
         artist = self.ax.scatter(lon, lat,
-                                color="green" if len(p.points) == 1 else "red" if len(p.points) == 2 else "black",
+                                color="green" if len(self.points) == 1 else "red" if len(self.points) == 2 else "black",
                                 marker="x", s=100, transform=ccrs.PlateCarree(),
                                 label="Point sélectionné")
         # Initialiser la liste si nécessaire et enregistrer l'objet
@@ -426,17 +468,25 @@ class RoutageApp:
     def execute_routing(self):
         if self.point_selection_enabled:
             self.toggle_point_selection()
-        if len(p.points) < 2:
+        if len(self.points) < 2:
             messagebox.showwarning("Erreur", "Veuillez sélectionner au moins deux points.")
             return
         # Désactiver la sélection de points en déconnectant le binding
         self.point_selection_enabled = False
         if hasattr(self, "click_id"):
             self.canvas.mpl_disconnect(self.click_id)
-        threading.Thread(target=self.run_routing, daemon=True).start()
+        self.routing_thread = threading.Thread(target=self.run_routing, daemon=True)
+        self.routing_thread.start()
+
+    def stop_routing(self):
+        # Arrêt coopératif : le routage s'arrête à la prochaine itération et affiche la meilleure route trouvée
+        if self.arrêt is not None:
+            self.arrêt.arrêter()
 
     def run_routing(self):
-        rc.itere_jusqua_dans_enveloppe_tk(p.points, self.ax, self.canvas)
+        # Paramètres figés au lancement : les modifier pendant le calcul ne change pas le routage en cours
+        self.arrêt = rc.JetonArrêt()
+        rc.itere_jusqua_dans_enveloppe_tk(list(self.points), self.ax, self.canvas, rctx.ContexteRoutage(), arrêt=self.arrêt)
         self.canvas.draw_idle()
         self.root.update_idletasks()  # Remplace self.controller.root.update_idletasks()
 
@@ -451,6 +501,7 @@ class RoutageApp:
             "pas_angle": p.pas_angle, 
             "rayon élimination points": p.rayon_elemination,
             "Tolérance arrivée": p.tolerance_arrivée,
+            "Temps de calcul max (s, 0 = illimité)": p.délai_routage or 0,
             "affichage des enveloppes": p.enveloppe,
             "Contact terrestre": p.land_contact
         }
@@ -486,6 +537,8 @@ class RoutageApp:
                 value = widget.get()
                 if param == "pas_angle":
                     setattr(p, param, int(float(value)))
+                elif param == "Temps de calcul max (s, 0 = illimité)":
+                    p.délai_routage = float(value) or None
                 else:
                     setattr(p, param, float(value))
             # Pour les paramètres booléens
@@ -29,6 +29,173 @@ def vérification_projection(latitudes = [10, 30, 50, 70], longitude = -3.0):
 
     plt.show()
 
+def benchmark_polaire(n=20000):
+    """
+    Compare le coût d'une lecture de vitesse entre l'ancien balayage linéaire de polaire_df
+    (polaire() puis recup_vitesse_fast()) et la polaire compilée, en scalaire et en tableau.
+    """
+    import numpy as np
+
+    polaire_df = rc.polaire_df
+    liste_angle = polaire_df.index
+
+    # Ancienne méthode : balayage des colonnes et des angles à chaque appel
+    def polaire_balayage(vitesse_vent):
+        liste_vitesse = polaire_df.columns
+        i = 0
+        while i < len(liste_vitesse):
+            vitesse = float(liste_vitesse[i])
+            if vitesse == vitesse_vent:
+                return polaire_df[liste_vitesse[i]]
+            elif vitesse > vitesse_vent:
+                inf, sup = i - 1, i
+                t = (vitesse_vent - float(liste_vitesse[inf])) / (float(liste_vitesse[sup]) - float(liste_vitesse[inf]))
+                return t * polaire_df[liste_vitesse[inf]] + (1 - t) * polaire_df[liste_vitesse[sup]]
+            i += 1
+
+    def vitesse_balayage(pol_v_vent, angle):
+        angle = abs(angle)
+        if angle > 180:
+            angle = 360 - angle
+        i = 0
+        while i < len(pol_v_vent):
+            angle_vent = float(liste_angle[i])
+            if angle == angle_vent:
+                return pol_v_vent[liste_angle[i]]
+            elif angle_vent > angle:
+                inf, sup = i - 1, i
+                t = (angle - float(liste_angle[inf])) / (float(liste_angle[sup]) - float(liste_angle[inf]))
+                return t * pol_v_vent[liste_angle[inf]] + (1 - t) * pol_v_vent[liste_angle[sup]]
+            i += 1
+
+    rng = np.random.default_rng(0)
+    tws = rng.uniform(1, 30, n)
+    twa = rng.uniform(0, 360, n)
+    n_ancien = min(n, 2000)  # L'ancienne méthode est trop lente pour être mesurée sur tout l'échantillon
+
+    debut = time.perf_counter()
+    for v, a in zip(tws[:n_ancien], twa[:n_ancien]):
+        vitesse_balayage(polaire_balayage(v), a)
+    t_ancien = (time.perf_counter() - debut) / n_ancien
+
+    debut = time.perf_counter()
+    for v, a in zip(tws, twa):
+        rc.polaire_compilée.vitesse(v, a)
+    t_scalaire = (time.perf_counter() - debut) / n
+
+    debut = time.perf_counter()
+    rc.polaire_compilée.vitesse(tws, twa)
+    t_tableau = (time.perf_counter() - debut) / n
+
+    print(f"Balayage polaire_df    : {t_ancien * 1e6:8.2f} µs / lecture")
+    print(f"Polaire compilée       : {t_scalaire * 1e6:8.2f} µs / lecture (x{t_ancien / t_scalaire:.0f})")
+    print(f"Polaire compilée (n={n}): {t_tableau * 1e6:8.3f} µs / lecture (x{t_ancien / t_tableau:.0f})")
+
+    return t_ancien, t_scalaire, t_tableau
+
+def benchmark_elagage(tailles=(1_000, 10_000, 100_000), rayon=0.01, max_ancien=10_000):
+    """
+    Compare elaguer_enveloppe (quadratique) et elaguer_points (cKDTree) sur des nuages de
+    points aléatoires dans une zone de 1° x 1°. Au-delà de max_ancien points, l'ancienne
+    méthode n'est pas mesurée mais extrapolée à partir de la plus grande taille mesurée.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    référence = None
+    résultats = []
+
+    for n in tailles:
+        points = [tuple(pt) for pt in rng.uniform(0, 1, (n, 2)) + (47, -3)]
+
+        debut = time.perf_counter()
+        nouveaux = rc.elaguer_points(points, rayon)
+        t_nouveau = time.perf_counter() - debut
+
+        if n <= max_ancien:
+            debut = time.perf_counter()
+            anciens = rc.elaguer_enveloppe(points, rayon)
+            t_ancien = time.perf_counter() - debut
+            assert anciens == nouveaux, "Les deux élagages doivent garder les mêmes points"
+            référence = (n * len(nouveaux), t_ancien)
+            texte_ancien = f"{t_ancien:9.3f} s"
+        else:
+            coût_ref, t_ref = référence
+            t_ancien = t_ref * n * len(nouveaux) / coût_ref # Coût proportionnel à n x (nombre de points gardés)
+            texte_ancien = f"{t_ancien:9.3f} s (estimé)"
+
+        print(f"{n:>7} points -> {len(nouveaux):>6} gardés | elaguer_enveloppe : {texte_ancien} | elaguer_points : {t_nouveau:7.3f} s")
+        résultats.append((n, t_ancien, t_nouveau))
+
+    return résultats
+
+def vérification_délai_routage(points=((47.51, -3.28), (47.33, -2.9)), délai=10):
+    """
+    Routage progressif d'une étape courte avec un délai (sans cache des résultats) : chaque niveau n'a qu'une part
+    du délai, la route doit être complète et trouvée avant l'échéance.
+    """
+    import Routage_contexte as rctx
+
+    contexte = rctx.ContexteRoutage(cache_résultats=False, live=False, data_route=False, print_données=False)
+    debut = time.perf_counter()
+    arbre, noeud, complète = rc.router_itere([tuple(point) for point in points], None, délai, None, contexte)
+    durée = time.perf_counter() - debut
+    print(f"Routage avec un délai de {délai} s : {'complet' if complète else 'partiel'} en {durée:.2f} s, "
+          f"arrivée à {round(float(arbre.heure[noeud]), 2)}")
+    assert complète, "Une étape courte doit être routée complètement dans le délai"
+    assert durée <= délai + 1, "Le routage doit s'arrêter à l'échéance"
+    return durée
+
+def benchmark_temps_restant(cible=None, noeuds=(10_000, 50_000, 200_000)):
+    """
+    Temps de construction de la carte du temps restant (Routage_temps_restant) sur le cadre de navigation, pour
+    plusieurs nombres de nœuds visés (pas de grille déduit du cadre).
+    """
+    import Routage_Paramètres as p
+    import Routage_contexte as rctx
+    import Routage_temps_restant as rtr
+
+    cible = cible or p.points[-1]
+    résultats = []
+    for n in noeuds:
+        contexte = rctx.ContexteRoutage(résolution_temps_restant=None, noeuds_temps_restant=n)
+        résolution = rtr.résolution_carte(contexte)
+        debut = time.perf_counter()
+        carte = rtr.CarteTempsRestant.construire(cible, résolution, contexte.cadre_navigation, contexte.environnement,
+                                                 contexte.land_contact)
+        durée = time.perf_counter() - debut
+        print(f"{n:>7} nœuds visés : pas {résolution:.4f}°, {carte.temps.size:>7} nœuds, construite en {durée:.2f} s")
+        résultats.append((carte.temps.size, durée))
+    return résultats
+
+def _données_chargées_à_l_import():
+    # Dans un processus du pool : le vent et les courants ont-ils été lus à l'import des modules ?
+    import Routage_Vent as rv
+    return hasattr(rv, 'vent_initial') or len(rcourant.blocks) > 0
+
+def vérification_processus_spawn(nb_processus=2):
+    """
+    Pool en spawn avec la mémoire partagée : chaque processus réimporte Routage_calcul (et les modules de données)
+    avant de se rattacher à la mémoire partagée, ces imports ne doivent charger ni le vent ni les courants.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    import Routage_parallèle as rpar
+    import Routage_mémoire_partagée as rmp
+
+    environnement = rmp.EnvironnementPartagé.depuis_modules()
+    try:
+        debut = time.perf_counter()
+        # Spawn même là où le pool utiliserait fork (Linux) : c'est le cas de Windows et macOS
+        with ProcessPoolExecutor(max_workers=nb_processus, mp_context=rmp.ContexteSpawn(), initializer=rpar._init_travailleur,
+                                 initargs=(rpar.paramètres_routage(), environnement.description)) as executor:
+            chargés = [f.result() for f in [executor.submit(_données_chargées_à_l_import) for _ in range(nb_processus)]]
+        durée = time.perf_counter() - debut
+    finally:
+        environnement.fermer()
+    print(f"{nb_processus} processus spawn lancés en {durée:.2f} s, données chargées à l'import : {chargés}")
+    assert not any(chargés), "Un processus spawn ne doit pas charger les données avant la mémoire partagée"
+    return durée
+
 import matplotlib.pyplot as plt
 from datetime import timedelta
 import time
@@ -0,0 +1,118 @@
+"""
+Zones interdites à la navigation : dispositifs de séparation du trafic (DST d'Ouessant, ...), zones militaires,
+portes des glaces, ... lues dans un fichier GeoJSON (polygones, ou lignes à ne pas couper, en lon/lat).
+
+Chaque zone peut n'être active que sur une plage horaire, donnée par les propriétés optionnelles 'début' et 'fin' :
+heure (même échelle que heure_début : heures depuis le début du GRIB) ou date "MMJJ HH:MM" (comme date_initiale).
+Sans 'début' ou sans 'fin', la zone est active depuis toujours ou pour toujours.
+
+Les zones sont rangées dans un STRtree (shapely) : la recherche des segments parent -> fils qui coupent une zone
+se fait en une requête vectorisée, et son coût dépend du nombre de zones proches des segments, pas du nombre de zones.
+"""
+
+import json
+import hashlib
+import threading
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from datetime import datetime
+
+import Routage_Paramètres as p
+
+def heure_routage(valeur, défaut):
+    # Heure (échelle de heure_début) d'une propriété 'début' ou 'fin', défaut si elle est absente
+    if valeur is None:
+        return défaut
+    if isinstance(valeur, str):
+        return (datetime.strptime(valeur, "%m%d %H:%M") - p.date_heure_grib).total_seconds() / 3600
+    return float(valeur)
+
+class ZonesExclusion:
+    """
+    Zones interdites et leurs plages d'activité.
+    géométries : géométries shapely (lon, lat)
+    débuts, fins : heures de début et de fin d'activité de chaque zone (-inf / inf : toujours active)
+    noms : noms des zones (affichage)
+    """
+
+    def __init__(self, géométries, débuts=None, fins=None, noms=None):
+        self.géométries = np.asarray(géométries, dtype=object)
+        n = len(self.géométries)
+        self.débuts = np.full(n, -np.inf) if débuts is None else np.asarray(débuts, dtype=float)
+        self.fins = np.full(n, np.inf) if fins is None else np.asarray(fins, dtype=float)
+        self.noms = list(noms) if noms is not None else [f"zone {i}" for i in range(n)]
+        self.arbre = shapely.STRtree(self.géométries)
+        self._empreinte = None
+
+    @classmethod
+    def charger(cls, fichier):
+        """Zones d'un fichier GeoJSON (FeatureCollection, propriétés optionnelles 'nom', 'début', 'fin')."""
+        with open(fichier, encoding="utf-8") as f:
+            collection = json.load(f)
+        géométries, débuts, fins, noms = [], [], [], []
+        for i, entité in enumerate(collection.get('features', [])):
+            propriétés = entité.get('properties') or {}
+            géométries.append(shape(entité['geometry']))
+            débuts.append(heure_routage(propriétés.get('début'), -np.inf))
+            fins.append(heure_routage(propriétés.get('fin'), np.inf))
+            noms.append(propriétés.get('nom', f"zone {i}"))
+        return cls(géométries, débuts, fins, noms)
+
+    def __len__(self):
+        return len(self.géométries)
+
+    def _couples(self, lats1, lons1, lats2, lons2):
+        # Couples (segment, zone) qui se touchent, trouvés par l'arbre en une requête
+        lats1, lons1 = np.asarray(lats1, dtype=float), np.asarray(lons1, dtype=float)
+        lats2, lons2 = np.broadcast_to(lats2, lats1.shape), np.broadcast_to(lons2, lons1.shape)
+        if len(lats1) == 0 or len(self) == 0:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        coords = np.stack((np.column_stack((lons1, lats1)), np.column_stack((lons2, lats2))), axis=1)
+        return self.arbre.query(shapely.linestrings(coords), predicate='intersects')
+
+    def coupés(self, lats1, lons1, lats2, lons2, début, fin=None):
+        """
+        Masque des segments (lats1, lons1) -> (lats2, lons2), parcourus de début à fin (heures, une par segment
+        ou une seule pour tous ; fin = début par défaut), qui touchent une zone active à un moment du parcours.
+        """
+        coupés = np.zeros(len(np.atleast_1d(lats1)), dtype=bool)
+        segments, zones = self._couples(lats1, lons1, lats2, lons2)
+        if len(segments):
+            # Plage d'activité vérifiée seulement pour les couples trouvés par l'arbre
+            début = np.broadcast_to(np.asarray(début, dtype=float), coupés.shape)[segments]
+            fin = début if fin is None else np.broadcast_to(np.asarray(fin, dtype=float), coupés.shape)[segments]
+            actives = (self.débuts[zones] <= np.maximum(début, fin)) & (np.minimum(début, fin) <= self.fins[zones])
+            coupés[segments[actives]] = True
+        return coupés
+
+    def bloqués(self, lats1, lons1, lats2, lons2, heure):
+        # Masque des segments qui touchent une zone active à heure et jusqu'à la fin (attendre ne sert à rien)
+        bloqués = np.zeros(len(np.atleast_1d(lats1)), dtype=bool)
+        segments, zones = self._couples(lats1, lons1, lats2, lons2)
+        permanentes = (self.débuts[zones] <= heure) & np.isinf(self.fins[zones])
+        bloqués[segments[permanentes]] = True
+        return bloqués
+
+    def empreinte(self):
+        """Empreinte (sha256) des géométries et des plages d'activité, calculée une seule fois."""
+        if self._empreinte is None:
+            h = hashlib.sha256(b"".join(shapely.to_wkb(self.géométries)))
+            h.update(self.débuts.tobytes())
+            h.update(self.fins.tobytes())
+            self._empreinte = h.hexdigest()
+        return self._empreinte
+
+_zones = (None, None) # (fichier, zones chargées)
+_verrou = threading.Lock()
+
+def zones_actuelles():
+    """Zones de p.fichier_zones, lues une seule fois par fichier ; None sans fichier de zones."""
+    global _zones
+    fichier = p.fichier_zones
+    if not fichier:
+        return None
+    with _verrou:
+        if _zones[0] != fichier:
+            _zones = (fichier, ZonesExclusion.charger(fichier))
+        return _zones[1]